@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+G-code emission benchmark.
+
+Emits polylines with a growing number of points once through the per-point
+draw_to_point() loop PolyLine.get_gcode used and once through the bulk
+GCodeContext.draw_points(), checks that both write the same G-code and
+prints the time per point of each.
+
+    python benchmarks/bench_emit.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy  # noqa: E402
+from unicorn.context import GCodeContext  # noqa: E402
+
+
+def make_points(count, seed=1):
+    rng = numpy.random.default_rng(seed)
+    points = numpy.cumsum(rng.uniform(-0.5, 0.5, (count, 2)), axis=0) + 300.0
+    # a few repeated points, which both paths drop
+    points[1::97] = points[0::97][:len(points[1::97])]
+    return points
+
+
+def make_context():
+    return GCodeContext(3000, 3000, 0.1, 0.1, 'M5', 'M3', 45, 10, 5, 'bench')
+
+
+def emit_scalar(points):
+    context = make_context()
+    context.go_to_point(*points[0].tolist())
+    context.start(1)
+    for x, y in points[1:].tolist():
+        context.draw_to_point(x, y)
+    context.stop()
+    return context
+
+
+def emit_bulk(points):
+    context = make_context()
+    context.go_to_point(*points[0].tolist())
+    context.start(1)
+    context.draw_points(points[1:])
+    context.stop()
+    return context
+
+
+def best_of(function, points, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        context = function(points)
+        times.append(time.perf_counter() - start)
+        body = list(context.codes)
+        context.close()
+    return min(times), body
+
+
+def main():
+    print('%10s %12s %12s %14s %14s %8s' % ('points', 'scalar s', 'bulk s', 'scalar ns/pt', 'bulk ns/pt', 'speedup'))
+    for count in (1000, 10000, 100000, 1000000):
+        points = make_points(count)
+        scalar, expected = best_of(emit_scalar, points)
+        bulk, body = best_of(emit_bulk, points)
+        if body != expected:
+            raise SystemExit('bulk output differs from the scalar output at %d points' % count)
+        print('%10d %12.4f %12.4f %14.0f %14.0f %7.1fx' % (count, scalar, bulk, 1e9 * scalar / count,
+                                                          1e9 * bulk / count, scalar / bulk))
+
+
+if __name__ == '__main__':
+    main()
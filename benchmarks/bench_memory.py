@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Geometry memory benchmark.
+
+Parses a corpus preset and measures the memory held by the entities and
+their flattened points, as stored (one float64 array per subpath, entities
+with __slots__) and after converting the same points to lists of (x, y)
+tuples, the representation used before.  Both figures come from
+tracemalloc, relative to the document already being loaded.
+
+    python benchmarks/bench_memory.py mixed curves
+"""
+import gc
+import io
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import inkex  # noqa: E402
+import corpus  # noqa: E402
+from unicorn.svg_parser import SvgParser  # noqa: E402
+
+
+def measure(name):
+    root = inkex.load_svg(io.BytesIO(corpus.preset(name).encode('utf-8'))).getroot()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        parser = SvgParser(root)
+        parser.parse()
+        gc.collect()
+        arrays = tracemalloc.get_traced_memory()[0] - base
+
+        points = 0
+        tuples = []
+        for entity in parser.entities:
+            segments = getattr(entity, 'segments', None) or []
+            points += sum(len(p) for p in segments)
+            tuples.append([list(map(tuple, p.tolist())) for p in segments])
+        gc.collect()
+        as_tuples = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    # the tuple lists were added on top of the arrays
+    return len(parser.entities), points, arrays, as_tuples - arrays
+
+
+def main(args):
+    print('%-8s %8s %9s %12s %12s %8s' % ('case', 'entities', 'points', 'arrays MB', 'tuples MB', 'bytes/pt'))
+    for name in args or ('curves', 'mixed'):
+        entities, points, arrays, tuples = measure(name)
+        print('%-8s %8d %9d %12.1f %12.1f %4.0f/%.0f' % (
+            name, entities, points, arrays / 1e6, tuples / 1e6, arrays / points, tuples / points))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
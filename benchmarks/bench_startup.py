@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Start-up benchmark of the two ways to run a conversion.
+
+Converts a small and a large corpus document with the Inkscape extension
+script (unicorn.py, through inkex.Effect), with python -m unicorn and with
+python -m unicorn --lean, each in a fresh interpreter, and reports the best
+wall time and the peak resident memory of each.  The first column is
+"python -c pass" plus the imports each path makes before it reads the
+document.
+
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import corpus  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# runs a command and prints its peak resident memory in kB
+RSS = "import resource, subprocess, sys; subprocess.run(sys.argv[1:], stdout=subprocess.DEVNULL, check=True); " \
+      "print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)"
+
+IMPORTS = {
+    'effect': 'import inkex, unicorn.pipeline, unicorn.options',
+    'cli': 'import unicorn.cli, unicorn.pipeline, unicorn.svg_parser, lxml.etree',
+}
+
+PATHS = (
+    ('effect', lambda svg: [sys.executable, 'unicorn.py', svg]),
+    ('cli', lambda svg: [sys.executable, '-m', 'unicorn', svg]),
+    ('cli --lean', lambda svg: [sys.executable, '-m', 'unicorn', '--lean', svg]),
+)
+
+
+def best_time(command, repeat):
+    best = None
+    rss = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', RSS] + command, cwd=ROOT, check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        rss = max(rss, int(result.stdout))
+    return best, rss
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('cases', nargs='*', default=['small', 'mixed'])
+    parser.add_argument('--repeat', type=int, default=3)
+    options = parser.parse_args(args)
+
+    interpreter, _ = best_time([sys.executable, '-c', 'pass'], options.repeat)
+    for name, statement in sorted(IMPORTS.items()):
+        seconds, _ = best_time([sys.executable, '-c', statement], options.repeat)
+        print('imports %-11s %.3f s' % (name, seconds - interpreter))
+
+    with tempfile.TemporaryDirectory() as temp:
+        for case in options.cases:
+            svg = os.path.join(temp, case + '.svg')
+            with open(svg, 'w') as f:
+                f.write(corpus.preset(case))
+            for name, command in PATHS:
+                seconds, rss = best_time(command(svg), options.repeat)
+                print('%-8s %-11s %.3f s %7.1f MB' % (case, name, seconds, rss / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
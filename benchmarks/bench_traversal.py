@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Traversal scaling benchmark.
+
+Builds documents with a growing number of nodes and <use> clones and times
+SvgParser.parse on each, next to the cost of resolving every clone with the
+per-use '//*[@id="..."]' XPath query the recursive traversal used.  The
+XPath column grows with nodes x clones while the parse time per node stays
+flat, because ids are resolved through a single index built on first use.
+
+    python benchmarks/bench_traversal.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lxml import etree  # noqa: E402
+from unicorn.svg_parser import SvgParser  # noqa: E402
+
+SVG = 'http://www.w3.org/2000/svg'
+XLINK = 'http://www.w3.org/1999/xlink'
+
+
+def make_document(nodes, clones, depth=8):
+    root = etree.Element('{%s}svg' % SVG, nsmap={None: SVG, 'xlink': XLINK})
+    root.set('width', '1000mm')
+    root.set('height', '1000mm')
+    parent = root
+    for level in range(depth):
+        parent = etree.SubElement(parent, '{%s}g' % SVG, id='g%d' % level,
+                                  transform='translate(%d,0)' % level)
+    for i in range(nodes):
+        etree.SubElement(parent, '{%s}path' % SVG, id='p%d' % i, style='stroke:#000000',
+                         d='M %d,%d l 5,0 l 0,5' % (i % 100 * 10, i // 100 * 10))
+    for i in range(clones):
+        etree.SubElement(root, '{%s}use' % SVG, x='1', y='1',
+                         attrib={'{%s}href' % XLINK: '#p%d' % (i * 7 % nodes)})
+    return root
+
+
+def time_parse(root):
+    start = time.perf_counter()
+    parser = SvgParser(root)
+    parser.parse()
+    return time.perf_counter() - start, len(parser.entities)
+
+
+def time_xpath_lookups(root):
+    uses = list(root.iter('{%s}use' % SVG))
+    start = time.perf_counter()
+    for use in uses:
+        use.xpath('//*[@id="%s"]' % use.get('{%s}href' % XLINK)[1:])
+    return time.perf_counter() - start
+
+
+def main():
+    print('%8s %8s %10s %14s %14s' % ('nodes', 'clones', 'parse s', 'us per entity', 'xpath uses s'))
+    for nodes, clones in ((1000, 100), (2500, 250), (5000, 500), (10000, 1000)):
+        root = make_document(nodes, clones)
+        elapsed, count = time_parse(root)
+        print('%8d %8d %10.3f %14.1f %14.3f' % (nodes, clones, elapsed, 1e6 * elapsed / count,
+                                                 time_xpath_lookups(root)))
+
+
+if __name__ == '__main__':
+    main()
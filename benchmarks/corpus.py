@@ -0,0 +1,86 @@
+"""
+Deterministic synthetic SVG documents for benchmarks.
+
+Every document is generated from a seed, so the same preset always produces
+byte-identical SVG.  Documents mix curve-dense paths, deeply nested groups
+with transforms, <use> clones, rects/ellipses/circles/polylines and the
+three stroke colours that select the cut style.
+
+    python benchmarks/corpus.py curves > curves.svg
+"""
+import random
+import sys
+
+STROKES = ('#000000', '#ff0000', '#0000ff')
+
+# name: (paths, curves per path, nesting depth, clones, shapes)
+PRESETS = {
+    'small': (200, 4, 2, 20, 50),
+    'curves': (2000, 24, 1, 0, 0),
+    'nested': (1000, 4, 40, 0, 200),
+    'clones': (100, 8, 2, 2000, 0),
+    'shapes': (100, 2, 2, 0, 3000),
+    'mixed': (3000, 8, 8, 500, 1000),
+}
+
+
+def curve_path(rng, x, y, curves):
+    d = ['M %.3f,%.3f' % (x, y)]
+    for _ in range(curves):
+        d.append('c %.3f,%.3f %.3f,%.3f %.3f,%.3f' % (
+            rng.uniform(-20, 20), rng.uniform(-20, 20), rng.uniform(-20, 20), rng.uniform(-20, 20),
+            rng.uniform(-15, 15), rng.uniform(-15, 15)))
+    if rng.random() < 0.5:
+        d.append('z')
+    return ' '.join(d)
+
+
+def shape(rng, index, x, y, stroke):
+    kind = index % 4
+    style = 'fill:none;stroke:%s' % stroke
+    if kind == 0:
+        return '<rect id="s%d" style="%s" x="%.3f" y="%.3f" width="%.3f" height="%.3f"/>' % (
+            index, style, x, y, rng.uniform(2, 30), rng.uniform(2, 30))
+    if kind == 1:
+        return '<ellipse id="s%d" style="%s" cx="%.3f" cy="%.3f" rx="%.3f" ry="%.3f"/>' % (
+            index, style, x, y, rng.uniform(2, 20), rng.uniform(2, 20))
+    if kind == 2:
+        return '<circle id="s%d" style="%s" cx="%.3f" cy="%.3f" r="%.3f"/>' % (
+            index, style, x, y, rng.uniform(1, 15))
+    points = ' '.join('%.3f,%.3f' % (x + rng.uniform(0, 40), y + rng.uniform(0, 40)) for _ in range(12))
+    return '<polyline id="s%d" style="%s" points="%s"/>' % (index, style, points)
+
+
+def generate(paths=200, curves=4, depth=2, clones=20, shapes=50, seed=1, size=1000.0):
+    """Return an SVG document as a string."""
+    rng = random.Random(seed)
+    out = ['<?xml version="1.0" encoding="UTF-8"?>',
+           '<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+           'xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape" '
+           'width="%gmm" height="%gmm" viewBox="0 0 %g %g">' % (size, size, size, size),
+           '<g inkscape:groupmode="layer" inkscape:label="Layer 1" id="layer1">']
+    for level in range(depth):
+        out.append('<g id="g%d" transform="translate(%.3f,%.3f) rotate(%.3f)">' % (
+            level, rng.uniform(-2, 2), rng.uniform(-2, 2), rng.uniform(-1, 1)))
+    for i in range(paths):
+        out.append('<path id="p%d" style="fill:none;stroke:%s" d="%s"/>' % (
+            i, rng.choice(STROKES), curve_path(rng, rng.uniform(0, size), rng.uniform(0, size), curves)))
+    for i in range(shapes):
+        out.append(shape(rng, i, rng.uniform(0, size), rng.uniform(0, size), rng.choice(STROKES)))
+    out.extend(['</g>'] * depth)
+    out.append('</g>')
+    for i in range(clones):
+        out.append('<use xlink:href="#p%d" transform="translate(%.3f,%.3f) scale(%.3f)"/>' % (
+            rng.randrange(paths), rng.uniform(-size / 2, size / 2), rng.uniform(-size / 2, size / 2),
+            rng.choice((0.5, 1.0, 1.0, 2.0))))
+    out.append('</svg>')
+    return '\n'.join(out)
+
+
+def preset(name, seed=1):
+    paths, curves, depth, clones, shapes = PRESETS[name]
+    return generate(paths, curves, depth, clones, shapes, seed)
+
+
+if __name__ == '__main__':
+    sys.stdout.write(preset(sys.argv[1] if len(sys.argv) > 1 else 'small'))
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+Per-phase benchmark of the SVG to G-code pipeline.
+
+Each corpus preset is converted with default settings.  Traversal
+(SvgParser.traverse), flattening (SvgParser.load_pending), emission
+(entity.get_gcode) and output (GCodeContext.generate) are timed separately
+as the best of --repeat runs, then one more run under tracemalloc records
+the peak memory of each phase.
+
+    python benchmarks/run.py --save results.json
+    python benchmarks/run.py --baseline results.json --threshold 0.25
+
+With --baseline the run fails (exit status 1) when any phase is more than
+threshold slower than the stored result.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import inkex  # noqa: E402
+import corpus  # noqa: E402
+from unicorn.context import GCodeContext  # noqa: E402
+from unicorn.svg_parser import SvgParser  # noqa: E402
+
+PHASES = ('traverse', 'flatten', 'emit', 'generate')
+
+# phases faster than this are too noisy to flag as regressions
+MIN_SECONDS = 0.005
+
+
+def make_context():
+    return GCodeContext(3500.0, 7000.0, 1.0, 1.0, 'M5', 'M3', 90.0, 45.0, 10.0, 'benchmark')
+
+
+def run_phases(document, measure):
+    """Run the pipeline once, calling measure(phase, action) around each phase."""
+    root = inkex.load_svg(io.BytesIO(document)).getroot()
+    parser = SvgParser(root)
+    context = make_context()
+    measure('traverse', parser.traverse)
+    measure('flatten', parser.load_pending)
+
+    def emit():
+        for entity in parser.entities:
+            entity.get_gcode(context)
+
+    measure('emit', emit)
+    with open(os.devnull, 'w') as out:
+        measure('generate', lambda: context.generate(out))
+    context.close()
+    return len(parser.entities), len(context.codes)
+
+
+def time_case(document, repeat):
+    best = {}
+    result = None
+    for _ in range(repeat):
+        def measure(phase, action):
+            start = time.perf_counter()
+            action()
+            elapsed = time.perf_counter() - start
+            best[phase] = min(best.get(phase, elapsed), elapsed)
+
+        result = run_phases(document, measure)
+
+    peaks = {}
+
+    def measure_memory(phase, action):
+        tracemalloc.reset_peak()
+        action()
+        peaks[phase] = tracemalloc.get_traced_memory()[1]
+
+    tracemalloc.start()
+    try:
+        run_phases(document, measure_memory)
+    finally:
+        tracemalloc.stop()
+
+    entities, lines = result
+    return {
+        'seconds': {phase: round(best[phase], 6) for phase in PHASES},
+        'total_seconds': round(sum(best.values()), 6),
+        'peak_memory_bytes': peaks,
+        'entities': entities,
+        'lines': lines,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regression messages."""
+    failures = []
+    for name, case in results['cases'].items():
+        old = baseline.get('cases', {}).get(name)
+        if old is None:
+            continue
+        for phase in PHASES:
+            before = old['seconds'].get(phase)
+            after = case['seconds'][phase]
+            if before is None or max(before, after) < MIN_SECONDS:
+                continue
+            if after > before * (1 + threshold):
+                failures.append('%s %s: %.4f s -> %.4f s (+%.0f%%)' % (
+                    name, phase, before, after, 100 * (after / before - 1)))
+    return failures
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('cases', nargs='*', help="presets to run (default: all of %s)" % ', '.join(corpus.PRESETS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help="write results as JSON to this file")
+    parser.add_argument('--baseline', help="compare against results saved earlier")
+    parser.add_argument('--threshold', type=float, default=0.2, help="allowed slowdown as a fraction")
+    options = parser.parse_args(args)
+
+    results = {'python': sys.version.split()[0], 'cases': {}}
+    for name in options.cases or corpus.PRESETS:
+        document = corpus.preset(name).encode('utf-8')
+        case = time_case(document, options.repeat)
+        results['cases'][name] = case
+        print('%-8s %6d entities %8d body lines  ' % (name, case['entities'], case['lines']) +
+              '  '.join('%s %.3fs %.1fMB' % (phase, case['seconds'][phase],
+                                            case['peak_memory_bytes'][phase] / 1e6) for phase in PHASES))
+
+    if options.save:
+        with open(options.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if options.baseline:
+        with open(options.baseline) as f:
+            failures = compare(results, json.load(f), options.threshold)
+        for failure in failures:
+            print('REGRESSION ' + failure)
+        if failures:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
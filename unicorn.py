@@ -17,8 +17,8 @@ along with this program; if not, write to the Free Software
 Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
 """
 import inkex
-from unicorn.context import GCodeContext
-from unicorn.svg_parser import SvgParser
+from unicorn import instrument, pipeline
+from unicorn.options import add_arguments
 
 
 class TimSavGCodeGenerator(inkex.Effect):
@@ -26,71 +26,25 @@ class TimSavGCodeGenerator(inkex.Effect):
         inkex.Effect.__init__(self)
         self.setup()
         self.context = None
+        self.profiler = None
 
     def setup(self):
-        self.arg_parser.add_argument("--pen-up-cmd",
-                                     action="store", type=str,
-                                     dest="pen_up_cmd", default="M5",
-                                     help="Pen Up Command")
-        self.arg_parser.add_argument("--pen-down-cmd",
-                                     action="store", type=str,
-                                     dest="pen_down_cmd", default="M3",
-                                     help="Pen Down Command")
-        self.arg_parser.add_argument("--pen-down-angle",
-                                     action="store", type=float,
-                                     dest="pen_down_angle", default="90.0",
-                                     help="Pen Down Angle")
-        self.arg_parser.add_argument("--pen-score-angle",
-                                     action="store", type=float,
-                                     dest="pen_score_angle", default="45.0",
-                                     help="Pen Score Angle")
-        self.arg_parser.add_argument("--pen-draw-angle",
-                                     action="store", type=float,
-                                     dest="pen_mark_angle", default="10.0",
-                                     help="Pen Mark Angle")
-        self.arg_parser.add_argument("--start-delay",
-                                     action="store", type=float,
-                                     dest="start_delay", default="1",
-                                     help="Delay after pen down command before movement in seconds")
-        self.arg_parser.add_argument("--stop-delay",
-                                     action="store", type=float,
-                                     dest="stop_delay", default="1.0",
-                                     help="Delay after pen up command before movement in seconds")
-        self.arg_parser.add_argument("--xy-feedrate",
-                                     action="store", type=float,
-                                     dest="xy_feedrate", default="3500.0",
-                                     help="XY axes feedrate in mm/min")
-        self.arg_parser.add_argument("--xy-travelrate",
-                                     action="store", type=float,
-                                     dest="xy_travelrate", default="7000.0",
-                                     help="XY axes travelrate in mm/min")
-        self.arg_parser.add_argument("--z-feedrate",
-                                     action="store", type=float,
-                                     dest="z_feedrate", default="150.0",
-                                     help="Z axis feedrate in mm/min")
-        self.arg_parser.add_argument("--z-height",
-                                     action="store", type=float,
-                                     dest="z_height", default="0.0",
-                                     help="Z axis print height in mm")
-        self.arg_parser.add_argument("--tab",
-                                     action="store", type=str,
-                                     dest="tab")
+        add_arguments(self.arg_parser)
+
+    def load_raw(self):
+        self.profiler = pipeline.start_profile(self.options)
+        with instrument.current.phase('load'):
+            inkex.Effect.load_raw(self)
 
     def save_raw(self, ret):
-        self.context.generate()
+        pipeline.write(self.options, self.context)
+        output = self.options.output
+        pipeline.finish_profile(self.options, self.profiler, output if isinstance(output, str) else None)
 
     def effect(self):
-        self.context = GCodeContext(self.options.xy_feedrate, self.options.xy_travelrate,
-                                    self.options.start_delay, self.options.stop_delay,
-                                    self.options.pen_up_cmd,
-                                    self.options.pen_down_cmd,
-                                    self.options.pen_down_angle, self.options.pen_score_angle,
-                                    self.options.pen_mark_angle,
-                                    self.options.input_file)
-        parser = SvgParser(self.document.getroot())
-        parser.parse()
-        for entity in parser.entities:
-            entity.get_gcode(self.context)
+        self.context = pipeline.create_context(self.options, self.options.input_file)
+        parser = pipeline.parse_document(self.document.getroot(), self.options, pipeline.open_cache(self.options))
+        pipeline.convert(parser, self.options, self.context)
 
 
 if __name__ == '__main__':  # pragma: no cover
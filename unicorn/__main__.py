@@ -0,0 +1,5 @@
+import sys
+
+from unicorn.cli import main
+
+sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+Single pass G-code analysis and run time estimate.
+
+GCodeAnalyzer is a write-only file-like object: GCodeContext.generate() can
+write straight into it, or a finished .gcode file can be fed to it line by
+line.  Motion is timed with a GRBL-like planner: trapezoidal acceleration,
+junction deviation cornering and a short lookahead buffer that always plans
+to stop at its end.  Pen commands and dwells empty the buffer, as they do on
+the controller.
+
+    python -m unicorn.analyze job.gcode --json job.json
+"""
+import argparse
+import json
+import math
+import re
+import sys
+
+WORD = re.compile(r'([A-Z])\s*([-+]?(?:\d+\.?\d*|\.\d+))')
+COMMENT = re.compile(r'\([^)]*\)|;.*')
+
+DEFAULT_ACCELERATION = 500.0
+DEFAULT_JUNCTION_DEVIATION = 0.01
+PLANNER_BLOCKS = 16
+
+
+class Block:
+    """One straight (or arc) move waiting in the planner."""
+
+    def __init__(self, length, rate, start_dir, end_dir):
+        self.length = length
+        self.rate = rate
+        self.start_dir = start_dir
+        self.end_dir = end_dir
+        self.max_entry = 0.0
+        self.entry = 0.0
+        self.exit = 0.0
+
+
+def trapezoid_time(length, entry, exit, rate, acceleration):
+    """Time to cover length starting at entry speed and ending at exit speed, cruising at most at rate."""
+    accelerate = (rate * rate - entry * entry) / (2 * acceleration)
+    decelerate = (rate * rate - exit * exit) / (2 * acceleration)
+    if accelerate + decelerate <= length:
+        return (rate - entry) / acceleration + (rate - exit) / acceleration + \
+            (length - accelerate - decelerate) / rate
+    peak = math.sqrt(max((2 * acceleration * length + entry * entry + exit * exit) / 2, 0.0))
+    return max(peak - entry, 0.0) / acceleration + max(peak - exit, 0.0) / acceleration
+
+
+class GCodeAnalyzer:
+    def __init__(self, xy_feedrate=3500.0, xy_travelrate=7000.0, pen_up_cmd='M5', pen_down_cmd='M3',
+                 acceleration=DEFAULT_ACCELERATION, junction_deviation=DEFAULT_JUNCTION_DEVIATION):
+        self.xy_feedrate = xy_feedrate
+        self.xy_travelrate = xy_travelrate
+        self.pen_up_cmd = pen_up_cmd
+        self.pen_down_cmd = pen_down_cmd
+        self.acceleration = acceleration
+        self.junction_deviation = junction_deviation
+
+        self.lines = 0
+        self.bytes = 0
+        self.cut_distance = 0.0
+        self.travel_distance = 0.0
+        self.pen_cycles = 0
+        self.dwells = 0
+        self.dwell_time = 0.0
+        self.motion_time = 0.0
+        self.moves = 0
+
+        self.position = [0.0, 0.0, 0.0]
+        self.absolute = True
+        self.motion = 0
+        self.feed = xy_feedrate
+        self.pen_down = False
+        self.blocks = []
+        self.speed = 0.0
+        self.partial = ''
+
+    # file-like interface so generate() can write straight into the analyzer
+    def write(self, text):
+        text = self.partial + text
+        lines = text.split('\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self.feed_line(line)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.partial:
+            self.feed_line(self.partial)
+            self.partial = ''
+        self.flush_planner()
+
+    def feed_line(self, line):
+        self.lines += 1
+        self.bytes += len(line) + 1
+        code = COMMENT.sub('', line).strip().upper()
+        if not code:
+            return
+        if self.is_command(code, self.pen_down_cmd):
+            self.flush_planner()
+            if not self.pen_down:
+                self.pen_cycles += 1
+            self.pen_down = True
+            return
+        if self.is_command(code, self.pen_up_cmd):
+            self.flush_planner()
+            self.pen_down = False
+            return
+
+        words = WORD.findall(code)
+        values = {}
+        motion = None
+        for letter, number in words:
+            if letter == 'G':
+                g = float(number)
+                if g in (0, 1, 2, 3):
+                    motion = int(g)
+                elif g == 4:
+                    motion = 4
+                elif g == 90:
+                    self.absolute = True
+                elif g == 91:
+                    self.absolute = False
+                elif g == 92:
+                    motion = 92
+            else:
+                values[letter] = float(number)
+
+        if motion == 4:
+            self.flush_planner()
+            self.dwells += 1
+            self.dwell_time += values.get('P', 0.0)
+            return
+        if motion == 92:
+            for axis, letter in enumerate('XYZ'):
+                if letter in values:
+                    self.position[axis] = values[letter]
+            return
+        if motion is not None:
+            self.motion = motion
+        if 'F' in values:
+            self.feed = values['F']
+        if not any(letter in values for letter in 'XYZ'):
+            return
+
+        target = list(self.position)
+        for axis, letter in enumerate('XYZ'):
+            if letter in values:
+                target[axis] = values[letter] if self.absolute else self.position[axis] + values[letter]
+        if self.motion in (2, 3) and ('I' in values or 'J' in values):
+            self.arc(target, values.get('I', 0.0), values.get('J', 0.0), self.motion == 2)
+        else:
+            self.line(target)
+
+    @staticmethod
+    def is_command(code, command):
+        """True when the line starts with command, with or without a space after it (M3 S90, M3S90, not M30)."""
+        command = command.upper()
+        return code.startswith(command) and not code[len(command):len(command) + 1].isdigit()
+
+    def line(self, target):
+        delta = [t - p for t, p in zip(target, self.position)]
+        length = math.sqrt(sum(d * d for d in delta))
+        self.position = target
+        if length == 0:
+            return
+        direction = [d / length for d in delta]
+        self.add_block(length, self.motion == 0, direction, direction)
+
+    def arc(self, target, i, j, clockwise):
+        cx, cy = self.position[0] + i, self.position[1] + j
+        start = math.atan2(self.position[1] - cy, self.position[0] - cx)
+        end = math.atan2(target[1] - cy, target[0] - cx)
+        radius = math.hypot(i, j)
+        sweep = end - start
+        if clockwise and sweep >= 0:
+            sweep -= 2 * math.pi
+        elif not clockwise and sweep <= 0:
+            sweep += 2 * math.pi
+        length = abs(sweep) * radius
+        self.position = target
+        if length == 0:
+            return
+        turn = -1 if clockwise else 1
+        start_dir = [-math.sin(start) * turn, math.cos(start) * turn, 0.0]
+        end_dir = [-math.sin(end) * turn, math.cos(end) * turn, 0.0]
+        self.add_block(length, False, start_dir, end_dir)
+
+    def add_block(self, length, rapid, start_dir, end_dir):
+        self.moves += 1
+        if rapid:
+            self.travel_distance += length
+            rate = self.xy_travelrate / 60.0
+        else:
+            self.cut_distance += length
+            rate = self.feed / 60.0
+        block = Block(length, rate, start_dir, end_dir)
+        if self.blocks:
+            block.max_entry = min(self.junction_speed(self.blocks[-1].end_dir, start_dir),
+                                  rate, self.blocks[-1].rate)
+        self.blocks.append(block)
+        if len(self.blocks) > PLANNER_BLOCKS:
+            self.plan()
+            self.execute(self.blocks.pop(0))
+
+    def junction_speed(self, previous, current):
+        """GRBL's junction deviation limit for the corner between two unit directions."""
+        cos_theta = -sum(a * b for a, b in zip(previous, current))
+        if cos_theta > 0.999999:
+            return 0.0
+        if cos_theta < -0.999999:
+            return float('inf')
+        sin_half = math.sqrt(0.5 * (1.0 - cos_theta))
+        return math.sqrt(self.acceleration * self.junction_deviation * sin_half / (1.0 - sin_half))
+
+    def plan(self):
+        """Backward then forward pass over the buffer, assuming a stop after the last block."""
+        blocks = self.blocks
+        a = self.acceleration
+        exit_speed = 0.0
+        for block in reversed(blocks):
+            block.exit = exit_speed
+            block.entry = min(block.max_entry, math.sqrt(exit_speed * exit_speed + 2 * a * block.length))
+            exit_speed = block.entry
+        entry = self.speed
+        for block in blocks:
+            block.entry = min(block.entry, entry)
+            block.exit = min(block.exit, math.sqrt(block.entry * block.entry + 2 * a * block.length))
+            entry = block.exit
+
+    def execute(self, block):
+        self.motion_time += trapezoid_time(block.length, block.entry, block.exit, block.rate, self.acceleration)
+        self.speed = block.exit
+
+    def flush_planner(self):
+        if self.blocks:
+            self.plan()
+            for block in self.blocks:
+                self.execute(block)
+            self.blocks = []
+        self.speed = 0.0
+
+    @property
+    def estimated_time(self):
+        return self.motion_time + self.dwell_time
+
+    def report(self):
+        return {
+            'lines': self.lines,
+            'bytes': self.bytes,
+            'moves': self.moves,
+            'cut_distance_mm': round(self.cut_distance, 3),
+            'travel_distance_mm': round(self.travel_distance, 3),
+            'pen_cycles': self.pen_cycles,
+            'dwells': self.dwells,
+            'dwell_time_s': round(self.dwell_time, 3),
+            'motion_time_s': round(self.motion_time, 3),
+            'estimated_time_s': round(self.estimated_time, 3),
+            'xy_feedrate': self.xy_feedrate,
+            'xy_travelrate': self.xy_travelrate,
+            'acceleration': self.acceleration,
+            'junction_deviation': self.junction_deviation,
+        }
+
+    def summary(self):
+        """Report lines for the comment block at the top of the output."""
+        seconds = int(round(self.estimated_time))
+        return [
+            "Estimated run time %d:%02d:%02d (motion %.1f s, dwell %.1f s)" % (
+                seconds // 3600, seconds // 60 % 60, seconds % 60, self.motion_time, self.dwell_time),
+            "Cut distance %.2f mm, travel distance %.2f mm" % (self.cut_distance, self.travel_distance),
+            "Pen cycles %d, dwells %d" % (self.pen_cycles, self.dwells),
+        ]
+
+
+def analyze_file(path, **settings):
+    analyzer = GCodeAnalyzer(**settings)
+    with open(path) as f:
+        for line in f:
+            analyzer.feed_line(line.rstrip('\r\n'))
+    analyzer.close()
+    return analyzer
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('gcode', help="G-code file to analyze")
+    parser.add_argument('--xy-feedrate', type=float, default=3500.0)
+    parser.add_argument('--xy-travelrate', type=float, default=7000.0)
+    parser.add_argument('--pen-up-cmd', default='M5')
+    parser.add_argument('--pen-down-cmd', default='M3')
+    parser.add_argument('--acceleration', type=float, default=DEFAULT_ACCELERATION, help="mm/s^2")
+    parser.add_argument('--junction-deviation', type=float, default=DEFAULT_JUNCTION_DEVIATION, help="mm")
+    parser.add_argument('--json', help="write the report to this file instead of stdout")
+    options = parser.parse_args(args)
+    analyzer = analyze_file(options.gcode, xy_feedrate=options.xy_feedrate, xy_travelrate=options.xy_travelrate,
+                            pen_up_cmd=options.pen_up_cmd, pen_down_cmd=options.pen_down_cmd,
+                            acceleration=options.acceleration, junction_deviation=options.junction_deviation)
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump(analyzer.report(), f, indent=2)
+        for line in analyzer.summary():
+            print(line)
+    else:
+        json.dump(analyzer.report(), sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+import math
+
+import numpy
+
+# arcs flatter than this are sent as lines; tighter than MIN_RADIUS are not worth it
+MAX_RADIUS = 5000.0
+MIN_RADIUS = 0.05
+# keep well away from full circles, where the end point equals the start point
+MAX_SWEEP = 1.5 * math.pi
+# an arc has to replace at least this many line moves
+MIN_MOVES = 3
+
+
+def circle_through(a, b, c):
+    """Return (cx, cy, r) of the circle through three points, or None if they are collinear."""
+    ax, ay = a
+    bx, by = b
+    cx, cy = c
+    d = 2.0 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+    if abs(d) < 1e-12:
+        return None
+    a2 = ax * ax + ay * ay
+    b2 = bx * bx + by * by
+    c2 = cx * cx + cy * cy
+    ux = (a2 * (by - cy) + b2 * (cy - ay) + c2 * (ay - by)) / d
+    uy = (a2 * (cx - bx) + b2 * (ax - cx) + c2 * (bx - ax)) / d
+    return ux, uy, math.hypot(ax - ux, ay - uy)
+
+
+def fit_circle(points, i, j, tolerance):
+    """
+  Try to replace points[i..j] with a single arc.  Returns (cx, cy, clockwise)
+  when every point is within tolerance of the arc through points i, the
+  middle one and j, they advance monotonically around the centre and no
+  chord between them strays more than tolerance from the arc (so the
+  corners of a polygon are not rounded off); otherwise None.
+  """
+    circle = circle_through(points[i], points[(i + j) // 2], points[j])
+    if circle is None:
+        return None
+    cx, cy, r = circle
+    if not MIN_RADIUS <= r <= MAX_RADIUS:
+        return None
+    run = points[i:j + 1] - (cx, cy)
+    if numpy.max(numpy.abs(numpy.hypot(run[:, 0], run[:, 1]) - r)) > tolerance:
+        return None
+    # sagitta of the longest chord: how far the arc bulges out from that line move
+    half = numpy.max(numpy.hypot(*numpy.diff(run, axis=0).T)) / 2
+    if half > r or r - math.sqrt(r * r - half * half) > tolerance:
+        return None
+    angles = numpy.arctan2(run[:, 1], run[:, 0])
+    steps = (numpy.diff(angles) + math.pi) % (2 * math.pi) - math.pi
+    if not (numpy.all(steps > 0) or numpy.all(steps < 0)):
+        return None
+    if abs(steps.sum()) > MAX_SWEEP:
+        return None
+    return cx, cy, steps[0] < 0
+
+
+def fit_arcs(points, tolerance):
+    """
+  Split a flattened run into lines and arcs.  Each move is either (x, y) for
+  a straight line or (x, y, cx, cy, clockwise) for an arc around (cx, cy),
+  always ending on one of the original points.  The first point is the
+  start position and is not part of the result.
+  """
+    coords = numpy.asarray(points, dtype=float)
+    n = len(coords)
+    moves = []
+    i = 0
+    while i < n - 1:
+        best = None
+        if n - 1 - i >= MIN_MOVES:
+            # grow the arc exponentially, then binary search for the longest fit
+            lo = i + MIN_MOVES
+            fit = fit_circle(coords, i, lo, tolerance)
+            if fit is not None:
+                best = (lo, fit)
+                step = MIN_MOVES
+                hi = None
+                while hi is None:
+                    step *= 2
+                    j = min(i + step, n - 1)
+                    fit = fit_circle(coords, i, j, tolerance)
+                    if fit is None:
+                        hi = j
+                    else:
+                        best = (j, fit)
+                        lo = j
+                        if j == n - 1:
+                            break
+                while hi is not None and hi - lo > 1:
+                    j = (lo + hi) // 2
+                    fit = fit_circle(coords, i, j, tolerance)
+                    if fit is None:
+                        hi = j
+                    else:
+                        best = (j, fit)
+                        lo = j
+        if best is None:
+            moves.append(tuple(coords[i + 1].tolist()))
+            i += 1
+        else:
+            j, (cx, cy, clockwise) = best
+            x, y = coords[j].tolist()
+            moves.append((x, y, cx, cy, clockwise))
+            i = j
+    return moves
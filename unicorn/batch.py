@@ -0,0 +1,224 @@
+"""
+Convert many SVG files to G-code in parallel.
+
+    python -m unicorn.batch parts/ -o gcode/ --jobs 4 --compact=true
+    python -m unicorn.batch 'shift-2/**/*.svg'
+
+Every input (a directory stands for the *.svg files in it, anything else is
+a glob pattern) is converted with the same options, taken from unicorn.inx
+as for python -m unicorn, into <stem>.gcode next to it or in --output-dir.
+Files are handed to a pool of worker processes that import the converter
+once when they start.  A file that fails, even by crashing its worker, is
+recorded and skipped; the manifest lists the output, time, line count and
+error of every file, and the exit status is 1 if any of them failed.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+from unicorn.options import add_arguments
+
+# options of the worker process, set once by start_worker
+worker_options = None
+
+
+class CountingWriter:
+    """Pass text through to out, counting lines and characters."""
+
+    def __init__(self, out):
+        self.out = out
+        self.lines = 0
+        self.chars = 0
+
+    def write(self, text):
+        self.lines += text.count('\n')
+        self.chars += len(text)
+        return self.out.write(text)
+
+    def flush(self):
+        self.out.flush()
+
+
+def start_worker(options):
+    global worker_options
+    worker_options = options
+    # import the whole converter up front so the first file does not pay for it
+    from lxml import etree  # noqa: F401
+    from unicorn import pipeline, svg_parser  # noqa: F401
+
+
+def convert_file(source, target):
+    """Convert one file with the worker's options, returning its manifest record."""
+    from lxml import etree
+    from unicorn import pipeline
+    options = worker_options
+    started = time.perf_counter()
+    record = {'input': source, 'output': target}
+    try:
+        cache = pipeline.open_cache(options)
+        if options.lean:
+            parser = pipeline.stream_document(source, options, cache)
+        else:
+            root = etree.parse(source, etree.XMLParser(huge_tree=True)).getroot()
+            parser = pipeline.parse_document(root, options, cache)
+        context = pipeline.create_context(options, source)
+        pipeline.convert(parser, options, context)
+        with open(target, 'w') as f:
+            out = CountingWriter(f)
+            pipeline.write(options, context, out)
+        record['lines'] = out.lines
+        record['bytes'] = out.chars
+    except Exception as error:
+        record['output'] = None
+        record['error'] = '%s: %s' % (type(error).__name__, error)
+        if os.path.exists(target):
+            os.remove(target)
+    record['seconds'] = round(time.perf_counter() - started, 4)
+    return record
+
+
+def find_inputs(patterns):
+    """Expand directories and glob patterns into a list of files, in order and without duplicates."""
+    files = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '*.svg'))
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        for path in sorted(matches):
+            if path not in seen and os.path.isfile(path):
+                seen.add(path)
+                files.append(path)
+    return files
+
+
+def output_path(source, output_dir):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(output_dir or os.path.dirname(source), stem + '.gcode')
+
+
+def convert_all(todo, jobs, options):
+    """
+  Convert the (index, source, target) items of todo on up to jobs worker
+  processes, yielding (index, record) as files finish.  A worker that dies
+  (a crash in lxml or numpy, the OOM killer) breaks its pool and every file
+  still in it.  Only jobs files are handed out at a time, so those are the
+  ones it may have been converting: they are tried again one at a time to
+  find the file that kills its worker, and the rest of the batch goes on in
+  a new pool.
+  """
+    import collections
+    import concurrent.futures
+    from concurrent.futures.process import BrokenProcessPool
+    pending = collections.deque(todo)
+    suspects = collections.deque()
+    while pending or suspects:
+        queue, workers = (suspects, 1) if suspects else (pending, min(jobs, len(pending)))
+        with concurrent.futures.ProcessPoolExecutor(workers, initializer=start_worker,
+                                                    initargs=(options,)) as pool:
+            running = {}
+            while queue or running:
+                while queue and len(running) < workers:
+                    item = queue.popleft()
+                    running[pool.submit(convert_file, item[1], item[2])] = item
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    index, source, target = running.pop(future)
+                    try:
+                        yield index, future.result()
+                    except BrokenProcessPool as error:
+                        broken = True
+                        if workers > 1:
+                            suspects.append((index, source, target))
+                        else:
+                            yield index, {'input': source, 'output': None, 'seconds': None,
+                                          'error': '%s: %s' % (type(error).__name__, error)}
+                    except Exception as error:
+                        yield index, {'input': source, 'output': None, 'seconds': None,
+                                      'error': '%s: %s' % (type(error).__name__, error)}
+                if broken:
+                    # the files still running went down with the pool
+                    suspects.extend(running.values())
+                    break
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='python -m unicorn.batch', description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('inputs', nargs='+', help="directories of .svg files or glob patterns")
+    arg_parser.add_argument('-o', '--output-dir', default='',
+                            help="Directory for the .gcode files, default next to each input")
+    arg_parser.add_argument('--jobs', type=int, default=0,
+                            help="Worker processes, 0 (the default) uses every core")
+    arg_parser.add_argument('--manifest', default='',
+                            help="Manifest file, default batch-manifest.json in the output directory")
+    arg_parser.add_argument('--lean', action='store_true',
+                            help="Stream each SVG with iterparse instead of loading the whole tree")
+    add_arguments(arg_parser)
+    return arg_parser
+
+
+def main(args=None):
+    options = build_arg_parser().parse_args(args)
+    files = find_inputs(options.inputs)
+    if options.output_dir:
+        os.makedirs(options.output_dir, exist_ok=True)
+    manifest_path = options.manifest or os.path.join(options.output_dir or '.', 'batch-manifest.json')
+
+    # the pool already uses the cores, the cache is cleared once here, and
+    # per-run report files would be overwritten by every file
+    if options.clear_cache:
+        from unicorn import pipeline
+        pipeline.open_cache(options)
+    options.clear_cache = False
+    options.workers = 1
+    options.analysis_file = ''
+    options.toolpath_file = ''
+    options.profile_file = ''
+    options.profile_dump = ''
+
+    started = time.perf_counter()
+    records = [None] * len(files)
+    # inputs with the same name in different directories map to the same
+    # file in --output-dir: the first one is converted, the others fail
+    targets = {}
+    todo = []
+    for index, source in enumerate(files):
+        target = output_path(source, options.output_dir)
+        first = targets.setdefault(os.path.abspath(target), source)
+        if first is source:
+            todo.append((index, source, target))
+        else:
+            records[index] = {'input': source, 'output': None, 'seconds': None,
+                              'error': 'output %s is already written for %s' % (target, first)}
+            sys.stderr.write("FAILED %s: %s\n" % (source, records[index]['error']))
+    jobs = options.jobs if options.jobs > 0 else (os.cpu_count() or 1)
+    for index, record in convert_all(todo, jobs, options):
+        records[index] = record
+        if 'error' in record:
+            sys.stderr.write("FAILED %s: %s\n" % (record['input'], record['error']))
+        else:
+            sys.stderr.write("%s -> %s (%d lines, %.2f s)\n" % (
+                record['input'], record['output'], record['lines'], record['seconds']))
+
+    failed = sum(1 for record in records if 'error' in record)
+    manifest = {
+        'converted': len(records) - failed,
+        'failed': failed,
+        'jobs': jobs,
+        'total_seconds': round(time.perf_counter() - started, 4),
+        'options': {name: value for name, value in sorted(vars(options).items()) if name not in ('inputs', 'tab')},
+        'files': records,
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    sys.stderr.write("%d converted, %d failed, manifest %s\n" % (manifest['converted'], failed, manifest_path))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
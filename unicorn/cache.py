@@ -0,0 +1,175 @@
+"""
+Persistent cache of flattened path geometry.
+
+Entries are addressed by a hash of the path data, the composed transform,
+the flatness and any clipping rectangle, so an unchanged path is neither
+parsed nor subdivided again on the next export.  Each entry is one small
+binary file: a little-endian header with the number of subpaths and their
+point counts, followed by the points as float64 pairs, so cached geometry is
+bit-for-bit what flattening produced.
+
+Entries live in a subdirectory of the configured directory that the cache
+creates and marks with a CACHEDIR.TAG, under two hex digit directories.
+The directory is kept under max_bytes by evicting the least recently used
+entries; a hit touches the file's modification time.  Pruning and clearing
+only ever remove files named like entries, so pointing --cache-dir at a
+directory that holds anything else does not lose it.
+"""
+import hashlib
+import os
+import re
+import struct
+import tempfile
+
+import numpy
+
+# bump when flattening changes so old entries are not reused
+CACHE_VERSION = 2
+
+DEFAULT_MAX_BYTES = 256 << 20
+
+ENTRY_DIRECTORY = 'unicorn-geometry-v%d' % CACHE_VERSION
+HEX = re.compile(r'^[0-9a-f]+$')
+CACHEDIR_TAG = (b'Signature: 8a477f597d28d172789f06886806bc55\n'
+                b'# This file marks the geometry cache of the TimSav G-code extension.\n')
+
+
+def default_directory():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'unicorn-timsav')
+
+
+def cache_key(d, matrix, flatness, bounds=None):
+    digest = hashlib.sha1(struct.pack('<Id', CACHE_VERSION, flatness))
+    digest.update(numpy.asarray(matrix, dtype='<f8').tobytes())
+    if bounds is not None:
+        digest.update(b'clip')
+        digest.update(numpy.asarray(bounds, dtype='<f8').tobytes())
+    digest.update(d.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def encode(segments):
+    if segments is None:
+        return struct.pack('<i', -1)
+    header = struct.pack('<i%dI' % len(segments), len(segments), *(len(points) for points in segments))
+    if not segments:
+        return header
+    return header + numpy.concatenate([numpy.asarray(points, dtype='<f8').reshape(-1, 2)
+                                       for points in segments]).tobytes()
+
+
+def decode(data):
+    count, = struct.unpack_from('<i', data)
+    if count < 0:
+        return None
+    lengths = struct.unpack_from('<%dI' % count, data, 4)
+    points = numpy.frombuffer(data, dtype='<f8', offset=4 + 4 * count).reshape(-1, 2)
+    if len(points) != sum(lengths):
+        raise ValueError('truncated cache entry')
+    segments = []
+    offset = 0
+    for length in lengths:
+        segments.append(points[offset:offset + length])
+        offset += length
+    return segments
+
+
+class GeometryCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = directory or default_directory()
+        self.directory = os.path.join(self.root, ENTRY_DIRECTORY)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def get(self, key):
+        """Return the cached segments for key, or raise KeyError."""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                segments = decode(f.read())
+            os.utime(path)
+        except (OSError, ValueError, struct.error):
+            self.misses += 1
+            raise KeyError(key)
+        self.hits += 1
+        return segments
+
+    def put(self, key, segments):
+        path = self.path(key)
+        try:
+            if not os.path.isdir(self.directory):
+                self.mark()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(encode(segments))
+            os.replace(temp, path)
+        except OSError:
+            return
+        self.writes += 1
+
+    def mark(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, 'CACHEDIR.TAG'), 'wb') as f:
+            f.write(CACHEDIR_TAG)
+
+    def entries(self):
+        """Paths of the files in the cache directory that are named like entries."""
+        try:
+            buckets = os.listdir(self.directory)
+        except OSError:
+            return
+        for bucket in buckets:
+            if len(bucket) != 2 or not HEX.match(bucket):
+                continue
+            try:
+                names = os.listdir(os.path.join(self.directory, bucket))
+            except OSError:
+                continue
+            for name in names:
+                if HEX.match(name):
+                    yield os.path.join(self.directory, bucket, name)
+
+    def prune(self):
+        """Delete the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for path in self.entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        """Delete every entry, and the directories they leave empty."""
+        for path in list(self.entries()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+
+    def summary(self):
+        return "Geometry cache %d hits, %d misses" % (self.hits, self.misses)
@@ -0,0 +1,73 @@
+"""
+Convert SVG to TimSav G-code from the command line.
+
+    python -m unicorn drawing.svg -o drawing.gcode
+    python -m unicorn --lean --compact=true huge.svg > huge.gcode
+
+Takes the same options as the Inkscape extension (see unicorn.inx) but does
+not go through inkex.Effect: the SVG is read with lxml directly and modules
+are imported only once an option needs them.  --lean streams the file with
+iterparse and keeps only the elements clones refer to, for documents too
+large to hold as a tree.
+"""
+import argparse
+import sys
+import time
+
+from unicorn.options import add_arguments
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='python -m unicorn', description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('input_file', nargs='?', default='-',
+                            help="SVG file to convert, - (the default) reads stdin")
+    arg_parser.add_argument('-o', '--output', default='-',
+                            help="G-code file to write, - (the default) writes stdout")
+    arg_parser.add_argument('--lean', action='store_true',
+                            help="Stream the SVG with iterparse instead of loading the whole tree")
+    arg_parser.add_argument('--timing', action='store_true',
+                            help="Print import, load, conversion and output times to stderr")
+    add_arguments(arg_parser)
+    return arg_parser
+
+
+def main(args=None):
+    started = time.perf_counter()
+    options = build_arg_parser().parse_args(args)
+
+    from unicorn import instrument, pipeline
+    if options.lean and options.input_file != '-':
+        from unicorn.svg_parser import SvgParser  # noqa: F401
+    else:
+        from lxml import etree
+    imported = time.perf_counter()
+
+    profiler = pipeline.start_profile(options)
+    cache = pipeline.open_cache(options)
+    if options.lean and options.input_file != '-':
+        parser = pipeline.stream_document(options.input_file, options, cache)
+    else:
+        source = sys.stdin.buffer if options.input_file == '-' else options.input_file
+        with instrument.current.phase('load'):
+            root = etree.parse(source, etree.XMLParser(huge_tree=True)).getroot()
+        parser = pipeline.parse_document(root, options, cache)
+    loaded = time.perf_counter()
+
+    context = pipeline.create_context(options, options.input_file)
+    pipeline.convert(parser, options, context)
+    converted = time.perf_counter()
+
+    if options.output == '-':
+        pipeline.write(options, context, sys.stdout)
+        sys.stdout.flush()
+        pipeline.finish_profile(options, profiler)
+    else:
+        with open(options.output, 'w') as out:
+            pipeline.write(options, context, out)
+        pipeline.finish_profile(options, profiler, options.output)
+    finished = time.perf_counter()
+
+    if options.timing:
+        sys.stderr.write("import %.3f s, load %.3f s, convert %.3f s, write %.3f s\n" % (
+            imported - started, loaded - imported, converted - loaded, finished - converted))
+    return 0
@@ -0,0 +1,134 @@
+"""
+Compact G-code output.
+
+CompactWriter is a file-like filter in front of the real output: comments,
+blank lines and the spaces between words are dropped, G0-G3 are only written
+when the motion mode changes, axes and feed rates that did not change are left
+out (in absolute mode) and a move that rounds to the current position is not
+written at all.  Numbers lose their trailing zeros.  The controller ends up in
+the same state after every line as with the full output.
+"""
+import re
+
+from unicorn.analyze import COMMENT, WORD
+
+WORDS = re.compile(r'(?:\s*[A-Z]\s*[-+]?(?:\d+\.?\d*|\.\d+))*\s*')
+AXES = 'XYZ'
+
+
+def format_number(text):
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    if text in ('', '-', '+', '-0', '+0'):
+        return '0'
+    return text
+
+
+class CompactWriter:
+    def __init__(self, out):
+        self.out = out
+        self.partial = ''
+        self.motion = None
+        self.absolute = True
+        self.position = dict.fromkeys(AXES)
+        self.feed = None
+        self.lines_in = 0
+        self.lines_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def write(self, text):
+        text = self.partial + text
+        lines = text.split('\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self.write_line(line)
+        return len(text)
+
+    def flush(self):
+        self.out.flush()
+
+    def close(self):
+        if self.partial:
+            self.write_line(self.partial)
+            self.partial = ''
+
+    def write_line(self, line):
+        self.lines_in += 1
+        self.bytes_in += len(line) + 1
+        line = self.compact(line)
+        if line:
+            self.out.write(line)
+            self.out.write('\n')
+            self.lines_out += 1
+            self.bytes_out += len(line) + 1
+
+    def compact(self, line):
+        """Return the compact form of one line, or '' when it can be dropped."""
+        code = COMMENT.sub('', line).strip().upper()
+        if not code:
+            return ''
+        if not WORDS.fullmatch(code):
+            return code
+        words = [(letter, format_number(number)) for letter, number in WORD.findall(code)]
+        motion = None
+        for letter, number in words:
+            if letter != 'G':
+                continue
+            g = float(number)
+            if g in (0, 1, 2, 3) and motion is None:
+                motion = int(g)
+            else:
+                return self.non_modal(words)
+        if motion is None and not any(letter in AXES for letter, _ in words):
+            if not any(letter == 'F' for letter, _ in words):
+                return ''.join(letter + number for letter, number in words)
+        mode = self.motion if motion is None else motion
+
+        kept = []
+        axes = []
+        for letter, number in words:
+            if letter == 'G':
+                continue
+            if letter in AXES:
+                axes.append((letter, number))
+                if self.absolute and self.position[letter] == float(number):
+                    continue
+            elif letter == 'F':
+                if self.feed == float(number):
+                    continue
+                self.feed = float(number)
+            kept.append((letter, number))
+        if mode in (2, 3) and axes and not any(letter in AXES for letter, _ in kept):
+            # an arc needs at least one axis word, even for a full circle
+            kept = axes + kept
+        for letter, number in axes:
+            self.position[letter] = float(number) if self.absolute else None
+        if not kept:
+            return ''
+        if mode is not None and mode != self.motion:
+            kept.insert(0, ('G', str(mode)))
+            self.motion = mode
+        return ''.join(letter + number for letter, number in kept)
+
+    def non_modal(self, words):
+        """Pass through a line with G4, G90, G91, G92 etc. and track its effect on the position."""
+        codes = [float(number) for letter, number in words if letter == 'G']
+        if 91 in codes:
+            self.absolute = False
+            self.position = dict.fromkeys(AXES)
+        if 90 in codes:
+            self.absolute = True
+        if 92 in codes:
+            for letter, number in words:
+                if letter in AXES:
+                    self.position[letter] = float(number)
+        elif any(g in (0, 1, 2, 3) for g in codes):
+            self.motion = None
+            self.position = dict.fromkeys(AXES)
+        return ''.join(letter + number for letter, number in words)
+
+    def summary(self):
+        saved = self.bytes_in - self.bytes_out
+        return "Compact output %d bytes, %d before (saved %.1f%%)" % (
+            self.bytes_out, self.bytes_in, 100.0 * saved / self.bytes_in if self.bytes_in else 0.0)
@@ -1,3 +1,63 @@
+import math
+import shutil
+import sys
+import tempfile
+
+import numpy
+
+from unicorn import instrument
+from unicorn.compact import CompactWriter
+from unicorn.servo import format_seconds
+
+
+class CodeStream:
+    """
+  Sink for the G-code body.  Lines are written through a buffered text stream
+  into a spooled temporary file as soon as they are produced, so memory stays
+  bounded by spool_size and the body can be replayed for every page.
+  """
+
+    def __init__(self, spool_size=1 << 20):
+        self.sink = tempfile.SpooledTemporaryFile(max_size=spool_size, mode='w+', newline='')
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        self.sink.flush()
+        self.sink.seek(0)
+        try:
+            for line in self.sink:
+                yield line[:-1]
+        finally:
+            self.sink.seek(0, 2)
+
+    def append(self, line):
+        self.sink.write(line)
+        self.sink.write("\n")
+        self.count += 1
+
+    def append_block(self, text, count):
+        """Append count lines already joined into text, each ending in a newline."""
+        self.sink.write(text)
+        self.count += count
+
+    def extend(self, lines):
+        for line in lines:
+            self.append(line)
+
+    def write_to(self, out):
+        """Copy the body written so far to the file-like object out."""
+        self.sink.flush()
+        self.sink.seek(0)
+        shutil.copyfileobj(self.sink, out)
+        self.sink.seek(0, 2)
+
+    def close(self):
+        self.sink.close()
+
+
 class GCodeContext:
     def __init__(self, xy_feedrate, xy_travelrate, start_delay, stop_delay, pen_up_cmd, pen_down_cmd, pen_down_angle,
                  pen_score_angle, pen_mark_angle, file):
@@ -18,8 +78,23 @@ class GCodeContext:
         self.continuous = False
         self.file = file
 
+        self.arc_tolerance = 0
+        self.precision = 2
+        self.compact = False
+        # ServoModel to schedule pen dwells with, None waits the fixed delays
+        self.servo = None
+
         self.drawing = False
         self.last = None
+        self.pen_angle = 0.0
+        # angle the pen was lifted from while its dwell waits for the next travel move
+        self.lifting = None
+        self.dwell_time = 0.0
+        self.fixed_dwell_time = 0.0
+        # list every dwell is also recorded in as (seconds, fixed), or None
+        self.dwells = None
+        self.summary = []
+        self.trailer = []
 
         self.preamble = [
             # "G4 P1 (Scribbled version of %s @ %.2f)" % (self.file, self.xy_feedrate),
@@ -37,16 +112,16 @@ class GCodeContext:
             "",
             "(end of print job)",
             "%s (pen up)" % self.pen_up_cmd,
-            "G4 P%d (wait %dms)" % (self.stop_delay, self.stop_delay),
+            self.dwell_code(self.stop_delay),
             "G0 X%0.2F Y%0.2F F%0.2F (go home)" % (self.x_home, self.y_home, self.xy_travelrate),
             # "M18 (drives off)",
         ]
 
         self.registration = [
             "%s S%d (pen down)" % (self.pen_down_cmd, self.pen_down_angle),
-            "G4 P%d (wait %dms)" % (self.start_delay, self.start_delay),
+            self.dwell_code(self.start_delay),
             "%s (pen up)" % self.pen_up_cmd,
-            "G4 P%d (wait %dms)" % (self.stop_delay, self.stop_delay),
+            self.dwell_code(self.stop_delay),
             # "M18 (disengage drives)",
             # "M01 (Was registration test successful?)",
             # "M17 (engage drives if YES, and continue)",
@@ -61,14 +136,14 @@ class GCodeContext:
         self.sheet_footer = [
             "(Start of sheet footer.)",
             "%s (pen up)" % self.pen_up_cmd,
-            "G4 P%d (wait %dms)" % (self.stop_delay, self.stop_delay),
+            self.dwell_code(self.stop_delay),
             "G91 (relative mode)",
             "G0 Z15 F%0.2f" % self.z_feedrate,
             "G90 (absolute mode)",
             "G0 X%0.2f Y%0.2f F%0.2f" % (self.x_home, self.y_home, self.xy_feedrate),
             # "M01 (Have you retrieved the print?)",
             "(machine halts until 'okay')",
-            "G4 P%d (wait %dms)" % (self.start_delay, self.start_delay),
+            self.dwell_code(self.start_delay),
             "G91 (relative mode)",
             "G0 Z-15 F%0.2f (return to start position of current sheet)" % self.z_feedrate,
             "G0 Z-0.01 F%0.2f (move down one sheet)" % self.z_feedrate,
@@ -79,9 +154,18 @@ class GCodeContext:
 
         self.loop_forever = ["M30 (Plot again?)"]
 
-        self.codes = []
+        self.codes = CodeStream()
+
+    @staticmethod
+    def write_lines(out, lines):
+        for line in lines:
+            out.write(line)
+            out.write("\n")
 
-    def generate(self):
+    def generate(self, out=None):
+        if out is None:
+            out = sys.stdout
+        self.finish_lift()
         if self.continuous == 'true':
             self.num_pages = 1
 
@@ -92,33 +176,93 @@ class GCodeContext:
         if self.continuous == 'true' or self.num_pages > 1:
             code_sets.append(self.sheet_footer)
 
+        for line in self.summary:
+            out.write("(%s)\n" % line)
+
+        body = CompactWriter(out) if self.compact else out
         if self.continuous == 'true':
             code_sets.append(self.loop_forever)
+            pages = 1
+        else:
+            pages = self.num_pages
+        for p in range(0, pages):
             for codeset in code_sets:
-                for line in codeset:
-                    print(line)
+                if codeset is self.codes:
+                    self.codes.write_to(body)
+                else:
+                    self.write_lines(body, codeset)
+            if self.continuous != 'true':
+                self.write_lines(body, self.postscript)
+
+        trailer = list(self.trailer)
+        if self.compact:
+            body.close()
+            trailer.append(body.summary())
+        for line in trailer:
+            out.write("(%s)\n" % line)
+
+    def close(self):
+        self.codes.close()
+
+    @staticmethod
+    def dwell_code(seconds):
+        seconds = format_seconds(seconds)
+        return "G4 P%s (wait %ss)" % (seconds, seconds)
+
+    def pen_down(self, angle, note):
+        self.finish_lift()
+        self.codes.append("%s S%0.2F (%s)" % (self.pen_down_cmd, angle, note))
+        if self.servo is None:
+            self.dwell(self.start_delay, self.start_delay)
+        else:
+            self.dwell(self.servo.move_time(self.pen_angle, angle), self.start_delay)
+        self.pen_angle = angle
+        self.drawing = True
+
+    def pen_up(self):
+        self.codes.append("%s (Pen Up)" % self.pen_up_cmd)
+        if self.servo is None:
+            self.dwell(self.stop_delay, self.stop_delay)
         else:
-            for p in range(0, self.num_pages):
-                for codeset in code_sets:
-                    for line in codeset:
-                        print(line)
-                for line in self.postscript:
-                    print(line)
+            # how long to wait depends on the travel move that follows
+            self.lifting = self.pen_angle
+        self.pen_angle = 0.0
+        self.drawing = False
+
+    def finish_lift(self, target=None):
+        """Emit the dwell of a deferred pen lift, overlapping it with the travel to target."""
+        if self.lifting is None:
+            return
+        travel = 0.0
+        if target is not None and self.last is not None:
+            # at the programmed rate; acceleration only makes the real move longer
+            travel = math.hypot(target[0] - self.last[0], target[1] - self.last[1]) / self.xy_travelrate * 60
+        self.dwell(self.servo.lift_time(self.lifting, travel), self.stop_delay)
+        self.lifting = None
+
+    def dwell(self, seconds, fixed):
+        self.dwell_time += seconds
+        self.fixed_dwell_time += fixed
+        if self.dwells is not None:
+            self.dwells.append((seconds, fixed))
+        if self.servo is None or seconds > 0:
+            self.codes.append(self.dwell_code(seconds))
+
+    def dwell_summary(self):
+        return "Pen dwells %.1f s, %.1f s with fixed delays (saved %.1f s)" % (
+            self.dwell_time, self.fixed_dwell_time, self.fixed_dwell_time - self.dwell_time)
 
     def start(self, cut_type):
         if cut_type == 2:
-            self.codes.append("%s S%0.2F (pen down score)" % (self.pen_down_cmd, self.pen_score_angle))
+            self.pen_down(self.pen_score_angle, "pen down score")
         elif cut_type == 3:
-            self.codes.append("%s S%0.2F (pen down draw)" % (self.pen_down_cmd, self.pen_mark_angle))
+            self.pen_down(self.pen_mark_angle, "pen down draw")
         else:
-            self.codes.append("%s S%0.2F (pen down through)" % (self.pen_down_cmd, self.pen_down_angle))
-        self.codes.append("G4 P%d (wait %dms)" % (self.start_delay, self.start_delay))
-        self.drawing = True
+            self.pen_down(self.pen_down_angle, "pen down through")
+        instrument.current.count('pen_cycles')
 
     def stop(self):
-        self.codes.append("%s (Pen Up)" % self.pen_up_cmd)
-        self.codes.append("G4 P%d (wait %dms)" % (self.stop_delay, self.stop_delay))
-        self.drawing = False
+        self.pen_up()
 
     def go_to_point(self, x, y, stop=False):
         if self.last == (x, y):
@@ -127,10 +271,9 @@ class GCodeContext:
             return
         else:
             if self.drawing:
-                self.codes.append("%s (Pen Up)" % self.pen_up_cmd)
-                self.codes.append("G4 P%d (wait %dms)" % (self.stop_delay, self.stop_delay))
-                self.drawing = False
-            self.codes.append("G0 X%.2f Y%.2f " % (x, y))
+                self.pen_up()
+            self.finish_lift((x, y))
+            self.codes.append("G0 X%.*f Y%.*f " % (self.precision, x, self.precision, y))
         self.last = (x, y)
 
     def draw_to_point(self, x, y, stop=False):
@@ -140,8 +283,58 @@ class GCodeContext:
             return
         else:
             if not self.drawing:
-                self.codes.append("%s S%0.2F (pen down)" % (self.pen_down_cmd, self.pen_down_angle))
-                self.codes.append("G4 P%d (wait %dms)" % (self.start_delay, self.start_delay))
-                self.drawing = True
-            self.codes.append("G1 X%0.2f Y%0.2f " % (x, y))
+                self.pen_down(self.pen_down_angle, "pen down")
+            self.codes.append("G1 X%0.*f Y%0.*f " % (self.precision, x, self.precision, y))
+        self.last = (x, y)
+
+    def draw_points(self, points, chunk=65536):
+        """
+  draw_to_point() through every point of an (n, 2) array.  Points equal to
+  the one before them are dropped with numpy and each chunk of the rest is
+  formatted by a single % over the repeated G1 line, which rounds exactly
+  as the scalar path does.
+  """
+        points = numpy.asarray(points, dtype=float)
+        if not len(points):
+            return
+        moved = numpy.empty(len(points), dtype=bool)
+        moved[0] = self.last is None or self.last != tuple(points[0].tolist())
+        numpy.any(points[1:] != points[:-1], axis=1, out=moved[1:])
+        moves = points[moved]
+        if not len(moves):
+            return
+        if not self.drawing:
+            self.pen_down(self.pen_down_angle, "pen down")
+        line = "G1 X%%0.%df Y%%0.%df \n" % (self.precision, self.precision)
+        for start in range(0, len(moves), chunk):
+            block = moves[start:start + chunk]
+            self.codes.append_block(line * len(block) % tuple(block.ravel().tolist()), len(block))
+        self.last = tuple(moves[-1].tolist())
+
+    def arc_to_point(self, x, y, cx, cy, clockwise):
+        """
+  Cut an arc around (cx, cy) from the current position to (x, y).  The
+  centre is moved onto the bisector of the rounded start and end points so
+  the controller sees equal start and end radii.
+  """
+        if self.last is None or self.last == (x, y):
+            self.draw_to_point(x, y)
+            return
+        if not self.drawing:
+            self.pen_down(self.pen_down_angle, "pen down")
+        digits = self.precision
+        sx, sy = round(self.last[0], digits), round(self.last[1], digits)
+        ex, ey = round(x, digits), round(y, digits)
+        mx, my = (sx + ex) / 2, (sy + ey) / 2
+        chord = math.hypot(ex - sx, ey - sy)
+        if chord == 0:
+            self.draw_to_point(x, y)
+            return
+        nx, ny = -(ey - sy) / chord, (ex - sx) / chord
+        offset = (cx - mx) * nx + (cy - my) * ny
+        cx, cy = mx + offset * nx, my + offset * ny
+        # adding 0.0 turns a rounded -0.0 into 0.0 so it is not printed as -0.000
+        i, j = round(cx - sx, digits + 1) + 0.0, round(cy - sy, digits + 1) + 0.0
+        self.codes.append("%s X%0.*f Y%0.*f I%0.*f J%0.*f " % (
+            "G2" if clockwise else "G3", digits, ex, digits, ey, digits + 1, i, digits + 1, j))
         self.last = (x, y)
@@ -0,0 +1,488 @@
+"""
+Keep the converter warm and regenerate G-code as drawings change.
+
+    python -m unicorn.daemon serve drawing.svg 'parts/*.svg' -o gcode/ --compact=true
+    python -m unicorn.daemon convert other.svg -o other.gcode
+    python -m unicorn.daemon status
+    python -m unicorn.daemon stop
+
+serve imports the converter once, writes <stem>.gcode for every watched
+file (next to it or in --output-dir) and converts the file again whenever
+its modification time or size changes.  The other commands talk to the
+running daemon over a local socket: convert has it convert any file with
+its options and prints the result, status lists the watched files and the
+latency of recent requests, stop shuts it down.
+
+Unchanged elements cost little on the next conversion.  Flattened geometry
+is kept in memory by the hash of the path data and transform, and the
+G-code emitted for each entity is kept by the hash of its points and the
+machine state it started from (position, pen state and angle), so its
+block is copied into the output instead of being formatted again.  The
+document is still read and traversed, which is cheap next to flattening
+and emission, and the output is the same as python -m unicorn writes.
+With --profile each conversion writes <output>.profile.json; a copied block
+adds the counters (pen cycles) its entity added when it was emitted, so the
+profile counts the same work as a cold run.
+"""
+import argparse
+import collections
+import hashlib
+import json
+import os
+import select
+import socket
+import sys
+import tempfile
+import time
+
+import numpy
+
+from unicorn import instrument
+from unicorn.batch import find_inputs, output_path
+from unicorn.options import add_arguments
+
+# context attributes that decide what an entity emits, and that it changes
+STATE = ('last', 'drawing', 'pen_angle', 'lifting')
+
+# requests kept for the latency figures of status
+HISTORY = 100
+
+
+def default_socket():
+    directory = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(directory, 'unicorn-timsav-%d.sock' % os.getuid())
+
+
+class MemoryCache:
+    """
+  The get and put of cache.GeometryCache, in memory.  Entries beyond
+  max_bytes of points are dropped least recently used first.
+  """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached segments for key, or raise KeyError."""
+        try:
+            segments, size = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self.entries.move_to_end(key)
+        self.hits += 1
+        # a new list, as later stages may replace subpaths in it
+        return None if segments is None else list(segments)
+
+    def put(self, key, segments):
+        if key in self.entries:
+            return
+        if segments is not None:
+            segments = [numpy.asarray(points, dtype=float) for points in segments]
+            for points in segments:
+                points.setflags(write=False)
+        size = 64 + sum(points.nbytes for points in segments or ())
+        self.entries[key] = (segments, size)
+        self.size += size
+        self.writes += 1
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, (_, dropped) = self.entries.popitem(last=False)
+            self.size -= dropped
+            self.evictions += 1
+
+
+def fingerprint(entity):
+    """Hash of everything an entity's G-code depends on, or None for entities that are not reused."""
+    from unicorn.entities import PolyLine
+    digest = hashlib.sha1(type(entity).__name__.encode('utf-8'))
+    if isinstance(entity, PolyLine):
+        segments = entity.segments or ()
+        digest.update(repr((entity.cut_style, entity.simplified, len(segments))).encode('utf-8'))
+        for points in segments:
+            points = numpy.ascontiguousarray(points, dtype='<f8')
+            digest.update(b'%d:' % points.size)
+            digest.update(points.tobytes())
+    elif hasattr(entity, 'tag'):
+        digest.update(repr((str(entity.tag), str(entity.id))).encode('utf-8'))
+    else:
+        return None
+    return digest.digest()
+
+
+class BlockRecorder:
+    """Collects what an entity appends to context.codes."""
+
+    def __init__(self):
+        self.parts = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, line):
+        self.parts.append(line)
+        self.parts.append("\n")
+        self.count += 1
+
+    def append_block(self, text, count):
+        self.parts.append(text)
+        self.count += count
+
+    def extend(self, lines):
+        for line in lines:
+            self.append(line)
+
+
+class BlockCache:
+    """
+  The G-code every entity of one file emitted on its last conversion, keyed
+  by the entity's fingerprint and the context state it started from.  An
+  entity that finds its block copies it and replays the block's state
+  change, dwells and instrumentation counters.  Only the blocks of the
+  latest conversion are kept.
+  """
+
+    def __init__(self):
+        self.blocks = {}
+        self.elements = collections.Counter()
+        self.reused = 0
+        self.emitted = 0
+        self.changed = 0
+        self.removed = 0
+
+    def emit(self, entities, context):
+        previous, self.blocks = self.blocks, {}
+        elements = collections.Counter()
+        self.reused = self.emitted = 0
+        codes = context.codes
+        recorder = instrument.current
+        for entity in entities:
+            digest = fingerprint(entity)
+            if digest is None:
+                entity.get_gcode(context)
+                self.emitted += 1
+                continue
+            elements[(entity.id, digest)] += 1
+            key = (digest, tuple(getattr(context, name) for name in STATE))
+            block = self.blocks.get(key) or previous.get(key)
+            # a block recorded without instrumentation has no counters to replay
+            if block is None or (recorder.enabled and block[4] is None):
+                block = self.record(entity, context, recorder)
+                self.emitted += 1
+            else:
+                text, count, state, dwells, counters = block
+                codes.append_block(text, count)
+                for name, value in zip(STATE, state):
+                    setattr(context, name, value)
+                for seconds, fixed in dwells:
+                    context.dwell_time += seconds
+                    context.fixed_dwell_time += fixed
+                recorder.merge(counters)
+                self.reused += 1
+            self.blocks[key] = block
+        self.changed = sum((elements - self.elements).values())
+        self.removed = sum((self.elements - elements).values())
+        self.elements = elements
+
+    @staticmethod
+    def record(entity, context, recorder):
+        codes = context.codes
+        block = context.codes = BlockRecorder()
+        context.dwells = []
+        counters = None
+        if recorder.enabled:
+            totals, recorder.counters = recorder.counters, collections.Counter()
+        try:
+            entity.get_gcode(context)
+        finally:
+            context.codes = codes
+            if recorder.enabled:
+                counters, recorder.counters = recorder.counters, totals
+                totals.update(counters)
+        text = ''.join(block.parts)
+        codes.append_block(text, block.count)
+        dwells, context.dwells = context.dwells, None
+        return text, block.count, tuple(getattr(context, name) for name in STATE), dwells, counters
+
+
+class Converter:
+    """Convert files with one set of options, reusing the work of earlier conversions."""
+
+    def __init__(self, options):
+        # warm up: import everything a conversion needs now rather than on the first request
+        from lxml import etree  # noqa: F401
+        from unicorn import pipeline, svg_parser  # noqa: F401
+        self.options = options
+        self.geometry = MemoryCache(int(options.cache_size * (1 << 20)))
+        self.files = {}
+        self.history = collections.deque(maxlen=HISTORY)
+        self.requests = 0
+
+    def convert(self, source, target):
+        """Convert source into target and return the record of the request."""
+        from lxml import etree
+        from unicorn import pipeline
+        options = self.options
+        source = os.path.abspath(source)
+        record = {'input': source, 'output': target}
+        times = [time.perf_counter()]
+        context = None
+        profiler = pipeline.start_profile(options)
+        try:
+            with instrument.current.phase('load'):
+                root = etree.parse(source, etree.XMLParser(huge_tree=True)).getroot()
+            times.append(time.perf_counter())
+            parser = pipeline.parse_document(root, options, self.geometry)
+            # the in-memory cache stands in for the geometry cache and is not reported in the G-code
+            parser.cache = None
+            times.append(time.perf_counter())
+            context = pipeline.create_context(options, source)
+            entities = pipeline.prepare(parser, options, context)
+            times.append(time.perf_counter())
+            blocks = self.files.setdefault(source, BlockCache())
+            pipeline.emit(entities, context, blocks)
+            times.append(time.perf_counter())
+            temp = target + '.tmp'
+            with open(temp, 'w') as out:
+                pipeline.write(options, context, out)
+            os.replace(temp, target)
+            times.append(time.perf_counter())
+            record.update({
+                'lines': len(context.codes),
+                'elements': sum(blocks.elements.values()),
+                'changed': blocks.changed,
+                'removed': blocks.removed,
+                'reused': blocks.reused,
+                'emitted': blocks.emitted,
+                'phases': {name: round(end - start, 4)
+                           for name, start, end in zip(('load', 'parse', 'prepare', 'emit', 'write'), times, times[1:])},
+            })
+        except Exception as error:
+            record['output'] = None
+            record['error'] = '%s: %s' % (type(error).__name__, error)
+            # the next conversion starts from scratch
+            self.files.pop(source, None)
+        finally:
+            if context is not None:
+                context.close()
+            pipeline.finish_profile(options, profiler, None if record['output'] is None else target)
+        record['seconds'] = round(time.perf_counter() - times[0], 4)
+        self.requests += 1
+        self.history.append(record['seconds'])
+        return record
+
+    def status(self):
+        history = sorted(self.history)
+        return {
+            'requests': self.requests,
+            'files': sorted(self.files),
+            'geometry': {'entries': len(self.geometry.entries), 'bytes': self.geometry.size,
+                         'hits': self.geometry.hits, 'misses': self.geometry.misses},
+            'last_seconds': self.history[-1] if history else None,
+            'median_seconds': history[len(history) // 2] if history else None,
+            'max_seconds': history[-1] if history else None,
+        }
+
+
+class Watcher:
+    """Report the watched files that appeared or changed since the last look."""
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.seen = {}
+
+    def changed(self):
+        found = []
+        for path in find_inputs(self.patterns):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if self.seen.get(path) != signature:
+                self.seen[path] = signature
+                found.append(path)
+        return found
+
+
+def log(record):
+    if 'error' in record:
+        sys.stderr.write("FAILED %s: %s (%.3f s)\n" % (record['input'], record['error'], record['seconds']))
+    else:
+        sys.stderr.write("%s -> %s: %d of %d elements changed, %d blocks reused, %.3f s\n" % (
+            record['input'], record['output'], record['changed'], record['elements'], record['reused'],
+            record['seconds']))
+    sys.stderr.flush()
+
+
+def receive(connection, timeout=5.0):
+    """Read one newline terminated JSON message."""
+    connection.settimeout(timeout)
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = connection.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data.decode('utf-8'))
+
+
+def send(connection, message):
+    connection.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+
+def validate(message):
+    """Return the error in a request message, or None when it can be answered."""
+    if not isinstance(message, dict):
+        return 'a request must be a JSON object'
+    command = message.get('command')
+    if command == 'convert':
+        if not isinstance(message.get('input'), str) or not message['input']:
+            return 'convert needs an input file name'
+        if message.get('output') is not None and not isinstance(message['output'], str):
+            return 'output must be a file name'
+    elif command not in ('status', 'stop'):
+        return 'unknown command %r' % (command,)
+    return None
+
+
+def handle(connection, converter, watcher, options):
+    """Answer one request; return False when the daemon should stop."""
+    try:
+        message = receive(connection)
+    except (OSError, ValueError) as error:
+        send(connection, {'error': '%s: %s' % (type(error).__name__, error)})
+        return True
+    error = validate(message)
+    if error is not None:
+        send(connection, {'error': error})
+        return True
+    command = message['command']
+    if command == 'convert':
+        source = message['input']
+        target = message.get('output') or output_path(source, options.output_dir)
+        record = converter.convert(source, os.path.abspath(target))
+        log(record)
+        send(connection, record)
+    elif command == 'status':
+        status = converter.status()
+        status['watching'] = sorted(watcher.seen)
+        send(connection, status)
+    else:
+        send(connection, {'stopped': True})
+        return False
+    return True
+
+
+def listening(path):
+    """True when a daemon answers on the socket at path."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def serve(options):
+    if os.path.exists(options.socket):
+        if listening(options.socket):
+            sys.stderr.write("a daemon is already listening on %s\n" % options.socket)
+            return 1
+        # left behind by a daemon that did not shut down
+        os.remove(options.socket)
+    converter = Converter(options)
+    watcher = Watcher(options.inputs)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(options.socket)
+    server.listen(8)
+    sys.stderr.write("listening on %s\n" % options.socket)
+    sys.stderr.flush()
+    running = True
+    try:
+        while running:
+            for path in watcher.changed():
+                log(converter.convert(path, output_path(path, options.output_dir)))
+            readable, _, _ = select.select([server], [], [], options.interval)
+            if readable:
+                try:
+                    connection, _ = server.accept()
+                    with connection:
+                        running = handle(connection, converter, watcher, options)
+                except (OSError, ValueError, KeyError) as error:
+                    # a client that went away or sent nonsense must not stop the watcher
+                    sys.stderr.write("request failed: %s: %s\n" % (type(error).__name__, error))
+                    sys.stderr.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(options.socket)
+    return 0
+
+
+def request(path, message, timeout=600.0):
+    """Send one message to the daemon listening on path and return its answer."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(path)
+        send(client, message)
+        return receive(client, timeout)
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='python -m unicorn.daemon', description=__doc__.strip().splitlines()[0])
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser('serve', help="watch files and answer requests")
+    serve_parser.add_argument('inputs', nargs='*', help="SVG files, directories of .svg files or glob patterns to watch")
+    serve_parser.add_argument('-o', '--output-dir', default='',
+                              help="Directory for the .gcode files, default next to each input")
+    serve_parser.add_argument('--interval', type=float, default=0.5,
+                              help="Seconds between looks at the watched files")
+    add_arguments(serve_parser)
+
+    convert_parser = commands.add_parser('convert', help="have the daemon convert a file")
+    convert_parser.add_argument('input_file', help="SVG file to convert")
+    convert_parser.add_argument('-o', '--output', default='',
+                                help="G-code file to write, default <stem>.gcode as for watched files")
+    commands.add_parser('status', help="show the watched files and request latency")
+    commands.add_parser('stop', help="stop the daemon")
+
+    for command in commands.choices.values():
+        command.add_argument('--socket', default=default_socket(), help="socket the daemon listens on")
+    return arg_parser
+
+
+def main(args=None):
+    options = build_arg_parser().parse_args(args)
+    if options.command == 'serve':
+        # per-run report files would be overwritten by every request
+        options.analysis_file = ''
+        options.toolpath_file = ''
+        options.profile_file = ''
+        options.profile_dump = ''
+        return serve(options)
+
+    if options.command == 'convert':
+        message = {'command': 'convert', 'input': os.path.abspath(options.input_file),
+                   'output': os.path.abspath(options.output) if options.output else None}
+    else:
+        message = {'command': options.command}
+    try:
+        answer = request(options.socket, message)
+    except OSError as error:
+        sys.stderr.write("no daemon on %s: %s\n" % (options.socket, error))
+        return 1
+    print(json.dumps(answer, indent=2))
+    return 1 if 'error' in answer else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,29 @@
 import math
 
+import numpy
+
+from unicorn import arcfit
+
 
 class Entity:
+	# layer and group are set by the parser, source by the optimizers on copies they make
+	__slots__ = ('id', 'layer', 'group', 'source')
+
+	def __init__(self):
+		self.id = None
+		self.layer = None
+		self.group = None
+
 	def get_gcode(self, context):
 		# raise NotImplementedError()
 		return "NIE"
 
 
 class Line(Entity):
+	__slots__ = ('start', 'end')
+
 	def __init__(self):
+		super().__init__()
 		self.start = None
 		self.end = None
 
@@ -24,10 +39,13 @@ class Line(Entity):
 
 
 class Circle(Entity):
+	__slots__ = ('center', 'radius', 'cut_style')
+
 	def __init__(self):
+		super().__init__()
 		self.center = None
 		self.radius = None
-		self.cutStyle = None
+		self.cut_style = None
 
 	def __str__(self):
 		return "Circle at [%.2f,%.2f], radius %.2f" % (self.center[0], self.center[1], self.radius)
@@ -39,14 +57,17 @@ class Circle(Entity):
 
 		context.codes.append("(" + str(self) + ")")
 		context.go_to_point(start[0], start[1])
-		context.start(self.cutStyle)
+		context.start(self.cut_style)
 		context.codes.append(arc_code)
 		context.stop()
 		context.codes.append("")
 
 
 class Arc(Entity):
+	__slots__ = ('center', 'radius', 'start_angle', 'end_angle', 'cut_style')
+
 	def __init__(self):
+		super().__init__()
 		self.center = None
 		self.radius = None
 		self.start_angle = None
@@ -71,7 +92,7 @@ class Arc(Entity):
 		delta = self.end_angle - self.start_angle
 
 		if delta < 0:
-			arc_code = "G3"
+			arc_code = "G2"
 		else:
 			arc_code = "G3"
 		arc_code = arc_code + " X%.2f Y%.2f I%.2f J%.2f F%.2f" % (
@@ -87,24 +108,37 @@ class Arc(Entity):
 
 
 class PolyLine(Entity):
+	# segments is a list of (n, 2) float64 point arrays, one per subpath
+	__slots__ = ('segments', 'cut_style', 'simplified')
+
 	def __init__(self):
+		super().__init__()
 		self.segments = None
 		self.cut_style = None
+		self.simplified = None
 
 	def __str__(self):
 		return "Polyline consisting of %d segments." % len(self.segments)
 
 	def get_gcode(self, context):
 		"""Emit gcode for drawing polyline"""
-		if hasattr(self, 'segments'):
+		if self.segments:
+			if self.simplified:
+				context.codes.append("(Simplified from %d to %d points)" % self.simplified)
 			for points in self.segments:
-				start = points[0]
+				points = numpy.asarray(points, dtype=float)
+				start = points[0].tolist()
 
 				context.codes.append("(" + str(self) + ")")
 				context.go_to_point(start[0], start[1])
 				context.start(self.cut_style)
-				for point in points[1:]:
-					context.draw_to_point(point[0], point[1])
-					context.last = point
+				if context.arc_tolerance:
+					for move in arcfit.fit_arcs(points, context.arc_tolerance):
+						if len(move) == 2:
+							context.draw_to_point(move[0], move[1])
+						else:
+							context.arc_to_point(*move)
+				else:
+					context.draw_points(points[1:])
 				context.stop()
 				context.codes.append("")
@@ -0,0 +1,174 @@
+import numpy
+
+from unicorn import instrument
+
+DEFAULT_FLATNESS = 0.2
+
+# upper bound on the number of lines a single cubic is split into
+MAX_SEGMENTS = 4096
+
+
+def distance_to_chord(p, a, b):
+    """Distance from each point p to the segment a-b (all (n, 2) arrays)."""
+    ab = b - a
+    length = numpy.einsum('ij,ij->i', ab, ab)
+    t = numpy.einsum('ij,ij->i', p - a, ab) / numpy.where(length > 0, length, 1.0)
+    closest = a + numpy.clip(t, 0.0, 1.0)[:, None] * ab
+    return numpy.hypot(*(p - closest).T)
+
+
+def segment_counts(p0, p1, p2, p3, flatness):
+    """
+  Number of lines needed for each cubic so the polyline stays within
+  flatness of the curve.  This is Wang's formula for degree 3:
+  n = sqrt(3 * 2 / 8 * max(|p0 - 2p1 + p2|, |p1 - 2p2 + p3|) / flatness)
+
+  Cubics whose control points already lie within flatness of the chord
+  (straight lines, whatever their parametrisation) need a single line.
+  """
+    flatness = max(flatness, 1e-9)
+    second = numpy.maximum(numpy.hypot(*(p0 - 2 * p1 + p2).T), numpy.hypot(*(p1 - 2 * p2 + p3).T))
+    n = numpy.ceil(numpy.sqrt(0.75 * second / flatness))
+    straight = numpy.maximum(distance_to_chord(p1, p0, p3), distance_to_chord(p2, p0, p3)) <= flatness
+    n[straight] = 1
+    return numpy.clip(n, 1, MAX_SEGMENTS).astype(numpy.int64)
+
+
+def clip_segment(ax, ay, bx, by, bounds):
+    """Parameters (t0, t1) of the part of segment a-b inside bounds (Liang-Barsky), or None."""
+    x0, y0, x1, y1 = bounds
+    dx = bx - ax
+    dy = by - ay
+    t0, t1 = 0.0, 1.0
+    for p, q in ((-dx, ax - x0), (dx, x1 - ax), (-dy, ay - y0), (dy, y1 - ay)):
+        if p == 0:
+            if q < 0:
+                return None
+            continue
+        r = q / p
+        if p < 0:
+            if r > t1:
+                return None
+            t0 = max(t0, r)
+        else:
+            if r < t0:
+                return None
+            t1 = min(t1, r)
+    if t1 <= t0 and (dx or dy):
+        # only touches the boundary
+        return None
+    return t0, t1
+
+
+def clip_polyline(points, bounds):
+    """
+  Split an (n, 2) polyline into the runs that lie inside the rectangle
+  bounds (x0, y0, x1, y1), cutting the segments that cross its edges.  A
+  closed polyline that starts inside is not split at its start point: the
+  run it ends with carries on into the run it starts with.
+  """
+    x0, y0, x1, y1 = bounds
+    xs, ys = points[:, 0], points[:, 1]
+    if xs.min() >= x0 and xs.max() <= x1 and ys.min() >= y0 and ys.max() <= y1:
+        return [points]
+    if xs.max() < x0 or xs.min() > x1 or ys.max() < y0 or ys.min() > y1:
+        return []
+    runs = []
+    run = None
+    coords = points.tolist()
+    for (ax, ay), (bx, by) in zip(coords[:-1], coords[1:]):
+        t = clip_segment(ax, ay, bx, by, bounds)
+        if t is None:
+            run = None
+            continue
+        t0, t1 = t
+        if run is None or t0 > 0:
+            run = [(ax + t0 * (bx - ax), ay + t0 * (by - ay))]
+            runs.append(run)
+        run.append((ax + t1 * (bx - ax), ay + t1 * (by - ay)))
+        if t1 < 1:
+            run = None
+    first = coords[0]
+    if len(runs) > 1 and first == coords[-1] and x0 <= first[0] <= x1 and y0 <= first[1] <= y1:
+        runs[-1].extend(runs.pop(0)[1:])
+    return [numpy.array(run) for run in runs]
+
+
+def clip_segments(segments, bounds):
+    """clip_polyline applied to every subpath of a path."""
+    return [run for points in segments for run in clip_polyline(numpy.asarray(points, dtype=float), bounds)]
+
+
+def flatten_cubic_super_path(csp, flatness=DEFAULT_FLATNESS, matrix=None, bounds=None):
+    """
+  Flatten every subpath of a CubicSuperPath into an (n, 2) float array of
+  points.  Segment counts are chosen up front for all cubics of the path and
+  all points are evaluated in one pass, so the cost is linear in the number
+  of points produced.
+
+  An optional 2x3 affine matrix is applied to all control points at once
+  before flattening; Bezier curves map onto Bezier curves, so the flatness
+  holds in the transformed coordinates.
+
+  With bounds (x0, y0, x1, y1), a path whose control points all lie outside
+  the rectangle is dropped before any subdivision (a Bezier curve stays in
+  the hull of its control points) and one that crosses its edges is clipped.
+  """
+    arrays = [numpy.asarray(sp, dtype=float).reshape(-1, 3, 2) for sp in csp if len(sp)]
+    if not arrays:
+        return []
+    nodes = numpy.concatenate(arrays)
+    if matrix is not None:
+        (a, c, e), (b, d, f) = matrix
+        x = nodes[..., 0]
+        y = nodes[..., 1]
+        nodes = numpy.stack((a * x + c * y + e, b * x + d * y + f), axis=-1)
+    crossing = False
+    if bounds is not None:
+        corners = nodes.reshape(-1, 2)
+        (left, bottom), (right, top) = corners.min(axis=0), corners.max(axis=0)
+        x0, y0, x1, y1 = bounds
+        if right < x0 or left > x1 or top < y0 or bottom > y1:
+            instrument.current.count('paths_culled')
+            return []
+        crossing = left < x0 or right > x1 or bottom < y0 or top > y1
+    lengths = numpy.array([len(a) for a in arrays])
+    firsts = numpy.cumsum(lengths) - lengths
+
+    # a cubic joins node i to node i + 1 unless node i + 1 starts a new subpath
+    joined = numpy.ones(len(nodes) - 1, dtype=bool)
+    joined[firsts[1:] - 1] = False
+    p0 = nodes[:-1, 1][joined]
+    p1 = nodes[:-1, 2][joined]
+    p2 = nodes[1:, 0][joined]
+    p3 = nodes[1:, 1][joined]
+
+    counts = segment_counts(p0, p1, p2, p3, flatness)
+    cubic = numpy.repeat(numpy.arange(len(counts)), counts)
+    step = numpy.arange(len(cubic)) - numpy.repeat(numpy.cumsum(counts) - counts, counts) + 1
+    t = (step / counts[cubic])[:, None]
+    s = 1.0 - t
+    points = (s * s * s) * p0[cubic] + (3 * s * s * t) * p1[cubic] + \
+             (3 * s * t * t) * p2[cubic] + (t * t * t) * p3[cubic]
+
+    # cubics of subpath k produce a contiguous run of points; prepend its start node
+    total = numpy.concatenate(([0], numpy.cumsum(counts)))
+    last_cubic = numpy.cumsum(lengths - 1)
+    points_per_path = total[last_cubic] - total[last_cubic - (lengths - 1)]
+
+    recorder = instrument.current
+    recorder.count('cubics_subdivided', len(counts))
+    recorder.count('points_produced', len(points) + len(arrays))
+
+    result = []
+    offset = 0
+    for first, count in zip(firsts, points_per_path):
+        run = numpy.empty((count + 1, 2))
+        run[0] = nodes[first, 1]
+        run[1:] = points[offset:offset + count]
+        offset += count
+        result.append(run)
+    if crossing:
+        recorder.count('paths_clipped')
+        result = clip_segments(result, bounds)
+    return result
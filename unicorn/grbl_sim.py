@@ -0,0 +1,187 @@
+"""
+A simulated GRBL controller on a pseudo terminal, for testing senders without
+hardware.
+
+    python -m unicorn.grbl_sim        # prints the pty to connect to
+
+The simulation keeps GRBL's 128 byte receive buffer and planner queue: a
+line leaves the receive buffer (and is acknowledged with 'ok') only once the
+planner has a free block, and each planned move or dwell takes block_time
+seconds, or waits while in feed hold.  Bytes that arrive while the receive
+buffer is full are counted as overflows, where a real controller would lose
+them.  Realtime '!', '~', '?' and Ctrl-X are handled as they arrive.
+"""
+import collections
+import os
+import select
+import sys
+import threading
+import time
+import tty
+
+from unicorn.analyze import WORD
+from unicorn.compact import WORDS
+
+BANNER = "Grbl 1.1h ['$' for help]"
+
+
+class SimulatedGrbl:
+    def __init__(self, rx_buffer_size=128, planner_blocks=16, block_time=0.001):
+        self.rx_buffer_size = rx_buffer_size
+        self.planner_blocks = planner_blocks
+        self.block_time = block_time
+
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+        self.rx = bytearray()
+        self.planner = collections.deque()
+        self.progress = 0.0
+        self.hold = False
+        self.absolute = True
+        self.position = [0.0, 0.0, 0.0]
+
+        self.lines = []
+        self.overflows = 0
+        self.max_rx = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+    @property
+    def state(self):
+        if self.hold:
+            return 'Hold'
+        return 'Run' if self.planner else 'Idle'
+
+    def start(self):
+        self.running = True
+        self.reply('')
+        self.reply(BANNER)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def reply(self, text):
+        os.write(self.master, (text + '\r\n').encode('ascii'))
+
+    def run(self):
+        last = time.monotonic()
+        while self.running:
+            readable, _, _ = select.select([self.master], [], [], 0.0005)
+            if readable:
+                try:
+                    data = os.read(self.master, 1024)
+                except OSError:
+                    data = b''
+                with self.lock:
+                    for byte in data:
+                        self.receive(byte)
+            now = time.monotonic()
+            with self.lock:
+                self.advance(now - last)
+                self.execute_lines()
+            last = now
+
+    def receive(self, byte):
+        if byte in b'!~?\x18':
+            self.realtime(byte)
+        elif len(self.rx) >= self.rx_buffer_size:
+            self.overflows += 1
+        else:
+            self.rx.append(byte)
+            self.max_rx = max(self.max_rx, len(self.rx))
+
+    def realtime(self, byte):
+        if byte == ord('!'):
+            if self.planner:
+                self.hold = True
+        elif byte == ord('~'):
+            self.hold = False
+        elif byte == ord('?'):
+            self.reply('<%s|MPos:%.3f,%.3f,%.3f|Bf:%d,%d>' % (
+                self.state, self.position[0], self.position[1], self.position[2],
+                self.planner_blocks - len(self.planner), self.rx_buffer_size - len(self.rx)))
+        else:
+            self.rx.clear()
+            self.planner.clear()
+            self.hold = False
+            self.reply('')
+            self.reply(BANNER)
+
+    def advance(self, seconds):
+        if self.hold or not self.planner:
+            self.progress = 0.0
+            return
+        self.progress += seconds
+        while self.planner and self.progress >= self.block_time:
+            self.planner.popleft()
+            self.progress -= self.block_time
+
+    def execute_lines(self):
+        while len(self.planner) < self.planner_blocks:
+            end = self.rx.find(b'\n')
+            if end < 0:
+                return
+            line = self.rx[:end].decode('ascii', 'replace').strip().upper()
+            del self.rx[:end + 1]
+            self.execute(line)
+
+    def execute(self, line):
+        if not line:
+            # GRBL acknowledges empty lines, such as a sender's wake-up
+            self.reply('ok')
+            return
+        self.lines.append(line)
+        if not WORDS.fullmatch(line):
+            self.errors += 1
+            self.reply('error:1')
+            return
+        words = WORD.findall(line)
+        for letter, number in words:
+            if letter == 'G' and float(number) == 90:
+                self.absolute = True
+            elif letter == 'G' and float(number) == 91:
+                self.absolute = False
+        moved = False
+        for axis, name in enumerate('XYZ'):
+            for letter, number in words:
+                if letter == name:
+                    value = float(number)
+                    self.position[axis] = value if self.absolute else self.position[axis] + value
+                    moved = True
+        if moved or ('G', '4') in words:
+            self.planner.append(line)
+        self.reply('ok')
+
+
+def main():
+    with SimulatedGrbl(block_time=0.002) as grbl:
+        print(grbl.port)
+        sys.stdout.flush()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        print('%d lines, %d overflows, %d errors' % (len(grbl.lines), grbl.overflows, grbl.errors))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Opt-in pipeline instrumentation.
+
+Code reports through the module attribute `current`, which is a
+NullInstrumentation (every call a no-op) until enable() swaps in a recording
+Instrumentation.  Hot paths therefore only pay for an attribute lookup and an
+empty call when instrumentation is off; per-element timing is guarded by
+`current.enabled` so it does not even read the clock.
+
+Set UNICORN_PROFILE=1 in the environment (or pass --profile) to enable it.
+"""
+import collections
+import os
+import sys
+import time
+
+ENVIRONMENT = 'UNICORN_PROFILE'
+
+# The pipeline imports this module as unicorn.instrument and the tests, run
+# from unicorn/, import it bare.  Register it under both names so there is one
+# `current` whichever name loads it first.
+sys.modules.setdefault('unicorn.instrument', sys.modules[__name__])
+sys.modules.setdefault('instrument', sys.modules[__name__])
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class NullInstrumentation:
+    enabled = False
+
+    def phase(self, name):
+        return NULL_TIMER
+
+    def count(self, name, n=1):
+        pass
+
+    def element(self, element_id, seconds):
+        pass
+
+    def merge(self, counters):
+        pass
+
+
+class PhaseTimer:
+    def __init__(self, owner, name):
+        self.owner = owner
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        phases = self.owner.phases
+        phases[self.name] = phases.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class Instrumentation:
+    enabled = True
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = collections.Counter()
+        self.elements = collections.defaultdict(float)
+
+    def phase(self, name):
+        return PhaseTimer(self, name)
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def element(self, element_id, seconds):
+        self.elements[element_id] += seconds
+
+    def merge(self, counters):
+        if counters:
+            self.counters.update(counters)
+
+    def slowest(self, n=10):
+        return sorted(self.elements.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def report(self):
+        return {
+            'phases_s': {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            'counters': dict(self.counters),
+            'elements_s': {str(element_id): round(seconds, 6) for element_id, seconds in self.elements.items()},
+            'slowest_elements': [[str(element_id), round(seconds, 6)] for element_id, seconds in self.slowest()],
+        }
+
+    def summary(self):
+        lines = ["Phase %s %.3f s" % (name, seconds) for name, seconds in self.phases.items()]
+        lines.extend("Counter %s %d" % (name, value) for name, value in sorted(self.counters.items()))
+        lines.extend("Slow element %s %.3f s" % (element_id, seconds) for element_id, seconds in self.slowest(5))
+        return lines
+
+
+current = NullInstrumentation()
+
+
+def enable():
+    """Start recording into a fresh Instrumentation and return it."""
+    global current
+    current = Instrumentation()
+    return current
+
+
+def disable():
+    global current
+    current = NullInstrumentation()
+
+
+def requested():
+    """True when the environment asks for instrumentation."""
+    return os.environ.get(ENVIRONMENT, '') not in ('', '0')
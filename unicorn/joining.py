@@ -0,0 +1,129 @@
+import math
+
+import numpy
+
+from unicorn.ordering import Subpath, collect_subpaths, partition_entities, rebuild_entities
+
+
+class EndpointHash:
+    """
+  Endpoints of open subpaths hashed on a grid of tolerance-sized cells, so
+  finding every endpoint within tolerance of a point only looks at the 3x3
+  cells around it.
+  """
+
+    def __init__(self, tolerance):
+        self.tolerance = max(tolerance, 1e-9)
+        self.cells = {}
+
+    def key(self, x, y):
+        return int(math.floor(x / self.tolerance)), int(math.floor(y / self.tolerance))
+
+    def add(self, index, point, at_end):
+        self.cells.setdefault(self.key(*point), []).append((point[0], point[1], index, at_end))
+
+    def discard(self, index, point, at_end):
+        k = self.key(*point)
+        bucket = self.cells.get(k)
+        if bucket:
+            bucket.remove((point[0], point[1], index, at_end))
+            if not bucket:
+                del self.cells[k]
+
+    def find(self, point, accept):
+        """Return the closest (index, at_end) within tolerance of point for which accept(index) holds."""
+        kx, ky = self.key(*point)
+        best = None
+        for ix in (kx - 1, kx, kx + 1):
+            for iy in (ky - 1, ky, ky + 1):
+                for x, y, index, at_end in self.cells.get((ix, iy), ()):
+                    d = math.hypot(x - point[0], y - point[1])
+                    if d <= self.tolerance and accept(index) and (best is None or d < best[0]):
+                        best = (d, index, at_end)
+        return None if best is None else best[1:]
+
+
+class PathJoiner:
+    """
+  Chain open subpaths that share an endpoint (within tolerance) and a cut
+  style into single pen-down runs, flipping subpaths where needed.  Each
+  join saves one pen-up/pen-down cycle and its dwells.
+  """
+
+    def __init__(self, tolerance=0.01, preserve='none'):
+        self.tolerance = tolerance
+        self.preserve = preserve
+        self.joins = 0
+
+    def join(self, entity_list):
+        """Return a new entity list with joinable subpaths chained together."""
+        self.joins = 0
+        result = []
+        for block in partition_entities(entity_list, self.preserve):
+            subpaths, passthrough = collect_subpaths(block)
+            result.extend(passthrough)
+            result.extend(rebuild_entities(self.chain(subpaths)))
+        return result
+
+    def chain(self, subpaths):
+        endpoints = EndpointHash(self.tolerance)
+        for index, sp in enumerate(subpaths):
+            if not sp.closed:
+                endpoints.add(index, sp.endpoint(False, False), False)
+                endpoints.add(index, sp.endpoint(False, True), True)
+
+        used = [False] * len(subpaths)
+
+        def take(index):
+            used[index] = True
+            sp = subpaths[index]
+            if not sp.closed:
+                endpoints.discard(index, sp.endpoint(False, False), False)
+                endpoints.discard(index, sp.endpoint(False, True), True)
+
+        chains = []
+        for index, sp in enumerate(subpaths):
+            if used[index]:
+                continue
+            take(index)
+            if sp.closed:
+                chains.append(sp)
+                continue
+            style = sp.entity.cut_style
+
+            def accept(other):
+                return subpaths[other].entity.cut_style == style
+
+            # extend forwards from the end, then backwards from the start; the
+            # pieces are only concatenated into one array once the chain is done
+            tail = [sp.points]
+            head = []
+            last = sp.endpoint(False, True)
+            while True:
+                found = endpoints.find(last, accept)
+                if found is None:
+                    break
+                other, at_end = found
+                take(other)
+                extra = subpaths[other].points
+                tail.append(extra[::-1] if at_end else extra)
+                last = tail[-1][-1]
+                self.joins += 1
+            first = sp.endpoint(False, False)
+            while True:
+                found = endpoints.find(first, accept)
+                if found is None:
+                    break
+                other, at_end = found
+                take(other)
+                extra = subpaths[other].points
+                head.append(extra if at_end else extra[::-1])
+                first = head[-1][0]
+                self.joins += 1
+            if len(tail) + len(head) > 1:
+                pieces = head[::-1] + tail
+                points = numpy.concatenate([numpy.asarray(piece, dtype=float).reshape(-1, 2) for piece in pieces])
+                chains.append(Subpath(sp.entity, points))
+            else:
+                chains.append(sp)
+        return chains
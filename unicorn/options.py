@@ -0,0 +1,198 @@
+"""
+Conversion options, shared by the Inkscape extension (unicorn.py, which
+receives them from unicorn.inx) and the standalone converter
+(python -m unicorn).  Only the standard library is imported here so the
+command line can print --help without loading anything else.
+"""
+import os
+
+
+def boolean(value):
+    """argparse type for the "true"/"false" strings Inkscape passes, as inkex.Boolean."""
+    if value.upper() == "TRUE":
+        return True
+    if value.upper() == "FALSE":
+        return False
+    return None
+
+
+def add_arguments(arg_parser):
+    arg_parser.add_argument("--pen-up-cmd",
+                            action="store", type=str,
+                            dest="pen_up_cmd", default="M5",
+                            help="Pen Up Command")
+    arg_parser.add_argument("--pen-down-cmd",
+                            action="store", type=str,
+                            dest="pen_down_cmd", default="M3",
+                            help="Pen Down Command")
+    arg_parser.add_argument("--pen-down-angle",
+                            action="store", type=float,
+                            dest="pen_down_angle", default="90.0",
+                            help="Pen Down Angle")
+    arg_parser.add_argument("--pen-score-angle",
+                            action="store", type=float,
+                            dest="pen_score_angle", default="45.0",
+                            help="Pen Score Angle")
+    arg_parser.add_argument("--pen-draw-angle",
+                            action="store", type=float,
+                            dest="pen_mark_angle", default="10.0",
+                            help="Pen Mark Angle")
+    arg_parser.add_argument("--start-delay",
+                            action="store", type=float,
+                            dest="start_delay", default="1",
+                            help="Delay after pen down command before movement in seconds")
+    arg_parser.add_argument("--stop-delay",
+                            action="store", type=float,
+                            dest="stop_delay", default="1.0",
+                            help="Delay after pen up command before movement in seconds")
+    arg_parser.add_argument("--pen-schedule",
+                            action="store", type=boolean,
+                            dest="pen_schedule", default=False,
+                            help="Time pen dwells with a servo model instead of the fixed delays")
+    arg_parser.add_argument("--servo-speed",
+                            action="store", type=float,
+                            dest="servo_speed", default="300.0",
+                            help="Servo speed in degrees per second")
+    arg_parser.add_argument("--servo-settle",
+                            action="store", type=float,
+                            dest="servo_settle", default="0.05",
+                            help="Time for the servo to settle after a move in seconds")
+    arg_parser.add_argument("--servo-clearance",
+                            action="store", type=float,
+                            dest="servo_clearance", default="10.0",
+                            help="Degrees the pen lifts before it clears the work and travel may start")
+    arg_parser.add_argument("--xy-feedrate",
+                            action="store", type=float,
+                            dest="xy_feedrate", default="3500.0",
+                            help="XY axes feedrate in mm/min")
+    arg_parser.add_argument("--xy-travelrate",
+                            action="store", type=float,
+                            dest="xy_travelrate", default="7000.0",
+                            help="XY axes travelrate in mm/min")
+    arg_parser.add_argument("--z-feedrate",
+                            action="store", type=float,
+                            dest="z_feedrate", default="150.0",
+                            help="Z axis feedrate in mm/min")
+    arg_parser.add_argument("--z-height",
+                            action="store", type=float,
+                            dest="z_height", default="0.0",
+                            help="Z axis print height in mm")
+    arg_parser.add_argument("--flatness",
+                            action="store", type=float,
+                            dest="flatness", default="0.2",
+                            help="Maximum distance between a curve and the lines approximating it in mm")
+    arg_parser.add_argument("--precision",
+                            action="store", type=int,
+                            dest="precision", default="2",
+                            help="Decimal places written for coordinates")
+    arg_parser.add_argument("--compact",
+                            action="store", type=boolean,
+                            dest="compact", default=False,
+                            help="Write compact gcode: modal commands, no comments, no unchanged axes")
+    arg_parser.add_argument("--skip-hidden",
+                            action="store", type=boolean,
+                            dest="skip_hidden", default=True,
+                            help="Skip hidden objects, display:none layers and their content")
+    arg_parser.add_argument("--clip-to",
+                            action="store", type=str, choices=('none', 'page', 'bed'),
+                            dest="clip_to", default="none",
+                            help="Drop and clip geometry outside the page or the machine bed (none, page, bed)")
+    arg_parser.add_argument("--bed-width",
+                            action="store", type=float,
+                            dest="bed_width", default="600.0",
+                            help="Machine bed width in mm")
+    arg_parser.add_argument("--bed-height",
+                            action="store", type=float,
+                            dest="bed_height", default="600.0",
+                            help="Machine bed height in mm")
+    arg_parser.add_argument("--instance-clones",
+                            action="store", type=boolean,
+                            dest="instance_clones", default=False,
+                            help="Flatten each cloned object once and reuse it for every clone")
+    arg_parser.add_argument("--workers",
+                            action="store", type=int,
+                            dest="workers", default="1",
+                            help="Processes used to flatten large documents, 0 uses every core")
+    arg_parser.add_argument("--cache",
+                            action="store", type=boolean,
+                            dest="cache", default=False,
+                            help="Keep flattened paths in a cache so unchanged paths are not flattened again")
+    arg_parser.add_argument("--cache-dir",
+                            action="store", type=str,
+                            dest="cache_dir", default=os.environ.get('UNICORN_CACHE_DIR', ''),
+                            help="Cache directory, default ~/.cache/unicorn-timsav")
+    arg_parser.add_argument("--cache-size",
+                            action="store", type=float,
+                            dest="cache_size", default="256",
+                            help="Largest cache size in MB, least recently used paths are evicted")
+    arg_parser.add_argument("--clear-cache",
+                            action="store", type=boolean,
+                            dest="clear_cache", default=False,
+                            help="Empty the cache before converting")
+    arg_parser.add_argument("--arc-tolerance",
+                            action="store", type=float,
+                            dest="arc_tolerance", default="0.0",
+                            help="Fit G2/G3 arcs to curves within this distance in mm, 0 cuts curves as lines")
+    arg_parser.add_argument("--simplify-tolerance",
+                            action="store", type=float,
+                            dest="simplify_tolerance", default="0.0",
+                            help="Drop points within this distance in mm of the simplified path, 0 keeps all points")
+    arg_parser.add_argument("--join-paths",
+                            action="store", type=boolean,
+                            dest="join_paths", default=False,
+                            help="Join paths with the same cut style that share an end point")
+    arg_parser.add_argument("--join-tolerance",
+                            action="store", type=float,
+                            dest="join_tolerance", default="0.01",
+                            help="Largest gap in mm between end points that are joined")
+    arg_parser.add_argument("--optimize-travel",
+                            action="store", type=boolean,
+                            dest="optimize_travel", default=False,
+                            help="Reorder and reverse paths to shorten pen-up travel")
+    arg_parser.add_argument("--inside-out",
+                            action="store", type=boolean,
+                            dest="inside_out", default=False,
+                            help="Cut everything inside a closed path before the path, shortest travel within each level")
+    arg_parser.add_argument("--preserve-order",
+                            action="store", type=str,
+                            dest="preserve_order", default="none",
+                            help="Keep document order between layers or groups (none, layer, group)")
+    arg_parser.add_argument("--analyze",
+                            action="store", type=boolean,
+                            dest="analyze", default=False,
+                            help="Estimate the run time and write a summary at the top of the output")
+    arg_parser.add_argument("--acceleration",
+                            action="store", type=float,
+                            dest="acceleration", default="500.0",
+                            help="XY acceleration in mm/s^2 used for the run time estimate")
+    arg_parser.add_argument("--junction-deviation",
+                            action="store", type=float,
+                            dest="junction_deviation", default="0.01",
+                            help="GRBL junction deviation in mm used for the run time estimate")
+    arg_parser.add_argument("--analysis-file",
+                            action="store", type=str,
+                            dest="analysis_file", default="",
+                            help="Also write the analysis as JSON to this file")
+    arg_parser.add_argument("--toolpath-file",
+                            action="store", type=str,
+                            dest="toolpath_file", default="",
+                            help="Also save the toolpath to this file, to post later with python -m unicorn.toolpath")
+    arg_parser.add_argument("--profile",
+                            action="store", type=boolean,
+                            dest="profile", default=False,
+                            help="Time each phase and count pipeline work (also enabled by UNICORN_PROFILE=1)")
+    arg_parser.add_argument("--profile-file",
+                            action="store", type=str,
+                            dest="profile_file", default="",
+                            help="Write the profile as JSON to this file, default is the output file with .profile.json")
+    arg_parser.add_argument("--profile-comments",
+                            action="store", type=boolean,
+                            dest="profile_comments", default=False,
+                            help="Append the profile as comments at the end of the output")
+    arg_parser.add_argument("--profile-dump",
+                            action="store", type=str,
+                            dest="profile_dump", default=os.environ.get('UNICORN_CPROFILE', ''),
+                            help="Run under cProfile and write the stats to this file")
+    arg_parser.add_argument("--tab",
+                            action="store", type=str,
+                            dest="tab")
@@ -0,0 +1,493 @@
+import copy
+import math
+
+import numpy
+
+
+class Subpath:
+    """
+  A single pen-down run taken from an entity's segments.  The run may be
+  emitted reversed; closed runs start and end on the same point so flipping
+  them never changes travel and they are always emitted as drawn.
+  """
+
+    def __init__(self, entity, points):
+        self.entity = entity
+        self.points = points
+        self.closed = len(points) > 2 and tuple(points[0]) == tuple(points[-1])
+        self.reversed = False
+
+    def endpoint(self, reverse, end):
+        """Return the start (end=False) or end (end=True) point for an orientation."""
+        if self.closed:
+            reverse = False
+        index = -1 if end != reverse else 0
+        p = self.points[index]
+        return p[0], p[1]
+
+    def oriented_points(self):
+        if self.reversed and not self.closed:
+            return self.points[::-1]
+        return self.points
+
+
+def distance(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def travel_length(subpaths, origin=(0.0, 0.0)):
+    """Total pen-up distance needed to visit subpaths in the given order and orientation."""
+    total = 0.0
+    here = origin
+    for sp in subpaths:
+        total += distance(here, sp.endpoint(sp.reversed, False))
+        here = sp.endpoint(sp.reversed, True)
+    return total
+
+
+def collect_subpaths(entity_list):
+    """
+  Split entities into the subpaths they draw and the entities that draw
+  nothing (ignored tags, layer changes) and therefore carry no position.
+  """
+    subpaths = []
+    passthrough = []
+    for entity in entity_list:
+        segments = getattr(entity, 'segments', None)
+        if segments:
+            for points in segments:
+                if len(points):
+                    subpaths.append(Subpath(entity, points))
+        else:
+            passthrough.append(entity)
+    return subpaths, passthrough
+
+
+def rebuild_entities(subpaths):
+    """
+  Turn an ordered list of subpaths back into entities.  Consecutive subpaths
+  from the same source entity are kept together so each piece keeps the
+  source's cut style and attributes.
+  """
+    result = []
+    current = None
+    for sp in subpaths:
+        if current is None or current.source is not sp.entity:
+            current = copy.copy(sp.entity)
+            current.source = getattr(sp.entity, 'source', sp.entity)
+            current.segments = []
+            result.append(current)
+        current.segments.append(sp.oriented_points())
+    return result
+
+
+def partition_entities(entity_list, preserve):
+    """
+  Split the entity list into consecutive blocks that must keep their
+  relative order.  preserve is 'none', 'layer' or 'group'.
+  """
+    if preserve not in ('layer', 'group'):
+        return [list(entity_list)] if entity_list else []
+    blocks = []
+    last_key = object()
+    for entity in entity_list:
+        key = getattr(entity, preserve, None)
+        if not blocks or key != last_key:
+            blocks.append([])
+            last_key = key
+        blocks[-1].append(entity)
+    return blocks
+
+
+class EndpointGrid:
+    """
+  Uniform grid over subpath endpoints used for nearest-neighbour queries.
+  Every subpath is indexed by its start point and, when it is open, by its
+  end point as well (reaching the end point means drawing it reversed).
+  """
+
+    def __init__(self, subpaths, cell=None):
+        self.cells = {}
+        self.count = 0
+        xs = []
+        ys = []
+        for sp in subpaths:
+            for reverse in (False, True):
+                x, y = sp.endpoint(reverse, False)
+                xs.append(x)
+                ys.append(y)
+        if cell is None:
+            if xs:
+                area = max(max(xs) - min(xs), 1.0) * max(max(ys) - min(ys), 1.0)
+                cell = math.sqrt(area / max(len(subpaths), 1))
+            else:
+                cell = 1.0
+        self.cell = max(cell, 1e-6)
+        self.min_ix = self.max_ix = self.min_iy = self.max_iy = 0
+        for index, sp in enumerate(subpaths):
+            self.insert(index, sp)
+
+    def key(self, x, y):
+        return int(math.floor(x / self.cell)), int(math.floor(y / self.cell))
+
+    def insert(self, index, sp):
+        orientations = (False,) if sp.closed else (False, True)
+        for reverse in orientations:
+            x, y = sp.endpoint(reverse, False)
+            k = self.key(x, y)
+            if not self.cells:
+                self.min_ix, self.min_iy = self.max_ix, self.max_iy = k
+            else:
+                self.min_ix = min(self.min_ix, k[0])
+                self.max_ix = max(self.max_ix, k[0])
+                self.min_iy = min(self.min_iy, k[1])
+                self.max_iy = max(self.max_iy, k[1])
+            self.cells.setdefault(k, []).append((x, y, index, reverse))
+            self.count += 1
+
+    def remove(self, index, sp):
+        orientations = (False,) if sp.closed else (False, True)
+        for reverse in orientations:
+            x, y = sp.endpoint(reverse, False)
+            k = self.key(x, y)
+            bucket = self.cells[k]
+            bucket.remove((x, y, index, reverse))
+            if not bucket:
+                del self.cells[k]
+            self.count -= 1
+
+    def nearest(self, x, y, exclude=None):
+        """Return (distance, index, reverse) of the closest indexed endpoint, or None."""
+        if not self.count:
+            return None
+        cx, cy = self.key(x, y)
+        reach = max(abs(cx - self.min_ix), abs(cx - self.max_ix), abs(cy - self.min_iy), abs(cy - self.max_iy))
+        best = None
+        for r in range(0, reach + 1):
+            exhaustive = (2 * r + 1) ** 2 > 4 * len(self.cells)
+            if exhaustive:
+                # the rings cover more area than there are occupied cells left
+                cells = self.cells.values()
+            else:
+                cells = (self.cells.get(k, ()) for k in self.ring(cx, cy, r))
+            for bucket in cells:
+                for px, py, index, reverse in bucket:
+                    if index == exclude:
+                        continue
+                    d = math.hypot(px - x, py - y)
+                    if best is None or d < best[0]:
+                        best = (d, index, reverse)
+            # anything in ring r + 1 is at least r cells away
+            if exhaustive or (best is not None and best[0] <= r * self.cell):
+                break
+        return best
+
+    def neighbours(self, x, y, k, exclude=None):
+        """Return up to k distinct subpath indexes with an endpoint close to (x, y)."""
+        cx, cy = self.key(x, y)
+        reach = max(abs(cx - self.min_ix), abs(cx - self.max_ix), abs(cy - self.min_iy), abs(cy - self.max_iy))
+        found = {}
+        for r in range(0, reach + 1):
+            for key in self.ring(cx, cy, r):
+                for px, py, index, reverse in self.cells.get(key, ()):
+                    if index == exclude:
+                        continue
+                    d = math.hypot(px - x, py - y)
+                    if index not in found or d < found[index]:
+                        found[index] = d
+            if len(found) >= k:
+                break
+        return sorted(found, key=found.get)[:k]
+
+    @staticmethod
+    def ring(cx, cy, r):
+        if r == 0:
+            yield cx, cy
+            return
+        for ix in range(cx - r, cx + r + 1):
+            yield ix, cy - r
+            yield ix, cy + r
+        for iy in range(cy - r + 1, cy + r):
+            yield cx - r, iy
+            yield cx + r, iy
+
+
+def polygon_area(points):
+    """Area enclosed by a closed run of points (shoelace formula)."""
+    xs, ys = points[:, 0], points[:, 1]
+    return abs(float(numpy.dot(xs[:-1], ys[1:]) - numpy.dot(xs[1:], ys[:-1]))) / 2
+
+
+def point_in_polygon(x, y, points):
+    """Even-odd test of (x, y) against a closed run of points."""
+    x0, y0 = points[:-1, 0], points[:-1, 1]
+    x1, y1 = points[1:, 0], points[1:, 1]
+    crosses = (y0 > y) != (y1 > y)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        xi = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    return bool(numpy.count_nonzero(crosses & (x < xi)) % 2)
+
+
+class ContainmentGrid:
+    """
+  Uniform grid over the bounding boxes of closed subpaths.  Every box is
+  entered in each cell it overlaps, so the subpaths that may surround a
+  point are found in the point's cell instead of testing every pair.
+  """
+
+    def __init__(self, boxes, closed, cell=None):
+        self.cells = {}
+        if cell is None:
+            if boxes:
+                area = max(max(b[2] for b in boxes) - min(b[0] for b in boxes), 1.0) * \
+                    max(max(b[3] for b in boxes) - min(b[1] for b in boxes), 1.0)
+                cell = math.sqrt(area / len(boxes))
+            else:
+                cell = 1.0
+        self.cell = max(cell, 1e-6)
+        for index in closed:
+            x0, y0, x1, y1 = boxes[index]
+            ix0, iy0 = self.key(x0, y0)
+            ix1, iy1 = self.key(x1, y1)
+            for ix in range(ix0, ix1 + 1):
+                for iy in range(iy0, iy1 + 1):
+                    self.cells.setdefault((ix, iy), []).append(index)
+
+    def key(self, x, y):
+        return int(math.floor(x / self.cell)), int(math.floor(y / self.cell))
+
+    def around(self, x, y):
+        """Indexes of the closed subpaths whose box overlaps the cell of (x, y)."""
+        return self.cells.get(self.key(x, y), ())
+
+
+def containment_parents(subpaths):
+    """
+  For every subpath the index of the smallest closed subpath around it, or
+  None.  A subpath is inside another when its bounding box is and its first
+  point is inside the other's outline.
+  """
+    arrays = [numpy.asarray(sp.points, dtype=float) for sp in subpaths]
+    boxes = [(a[:, 0].min(), a[:, 1].min(), a[:, 0].max(), a[:, 1].max()) for a in arrays]
+    closed = [index for index, sp in enumerate(subpaths) if sp.closed]
+    areas = [0.0] * len(subpaths)
+    for index in closed:
+        areas[index] = polygon_area(arrays[index])
+    grid = ContainmentGrid(boxes, closed)
+
+    parents = []
+    for index, points in enumerate(arrays):
+        x0, y0, x1, y1 = boxes[index]
+        x, y = points[0]
+        candidates = []
+        for other in grid.around(x, y):
+            bx0, by0, bx1, by1 = boxes[other]
+            if areas[other] > areas[index] and bx0 <= x0 and by0 <= y0 and x1 <= bx1 and y1 <= by1:
+                candidates.append(other)
+        candidates.sort(key=areas.__getitem__)
+        parent = None
+        for other in candidates:
+            if point_in_polygon(x, y, arrays[other]):
+                parent = other
+                break
+        parents.append(parent)
+    return parents, areas
+
+
+def containment_levels(subpaths):
+    """
+  Group subpaths into levels that are cut one after the other, so everything
+  inside a closed subpath is cut before it.  Level 0 holds the subpaths with
+  nothing inside them, a closed subpath is one level after the highest
+  subpath it surrounds.
+  """
+    parents, areas = containment_parents(subpaths)
+    levels = [0] * len(subpaths)
+    # a parent is larger than its children, so it is reached after all of them
+    for index in sorted(range(len(subpaths)), key=areas.__getitem__):
+        parent = parents[index]
+        if parent is not None:
+            levels[parent] = max(levels[parent], levels[index] + 1)
+    grouped = [[] for _ in range(max(levels, default=-1) + 1)]
+    for index, sp in enumerate(subpaths):
+        grouped[levels[index]].append(sp)
+    return grouped
+
+
+class TravelOptimizer:
+    """
+  Reorder and flip subpaths to shorten pen-up travel.
+
+  A nearest-neighbour tour is built with an EndpointGrid and then improved
+  with 2-opt (reverse a run of the tour) and Or-opt (move a short chain
+  elsewhere) moves restricted to each subpath's nearest neighbours.
+
+  With inside_out, each block is first split into containment_levels and
+  the levels are ordered one after the other, inner shapes first.
+  """
+
+    def __init__(self, preserve='none', neighbours=8, passes=4, inside_out=False):
+        self.preserve = preserve
+        self.neighbours = neighbours
+        self.passes = passes
+        self.inside_out = inside_out
+        self.before = 0.0
+        self.after = 0.0
+        self.levels = 0
+
+    def optimize(self, entity_list, origin=(0.0, 0.0)):
+        """Return a new entity list with the same geometry in a shorter travel order."""
+        result = []
+        here = origin
+        self.before = travel_length(collect_subpaths(entity_list)[0], origin)
+        self.after = 0.0
+        self.levels = 0
+        for block in partition_entities(entity_list, self.preserve):
+            subpaths, passthrough = collect_subpaths(block)
+            result.extend(passthrough)
+            levels = containment_levels(subpaths) if self.inside_out else [subpaths]
+            self.levels = max(self.levels, len(levels))
+            for level in levels:
+                ordered = self.order(level, here)
+                self.after += travel_length(ordered, here)
+                if ordered:
+                    here = ordered[-1].endpoint(ordered[-1].reversed, True)
+                result.extend(rebuild_entities(ordered))
+        return result
+
+    def order(self, subpaths, origin=(0.0, 0.0)):
+        """Return subpaths ordered (and flipped through .reversed) for short travel."""
+        if len(subpaths) < 2:
+            return list(subpaths)
+        tour = self.nearest_neighbour(subpaths, origin)
+        neighbours = self.neighbour_lists(subpaths)
+        for _ in range(self.passes):
+            improved = self.two_opt(subpaths, tour, neighbours, origin)
+            improved = self.or_opt(subpaths, tour, neighbours, origin) or improved
+            if not improved:
+                break
+        ordered = []
+        for index, reverse in tour:
+            sp = subpaths[index]
+            sp.reversed = reverse and not sp.closed
+            ordered.append(sp)
+        return ordered
+
+    def nearest_neighbour(self, subpaths, origin):
+        grid = EndpointGrid(subpaths)
+        tour = []
+        x, y = origin
+        while grid.count:
+            _, index, reverse = grid.nearest(x, y)
+            sp = subpaths[index]
+            grid.remove(index, sp)
+            tour.append((index, reverse))
+            x, y = sp.endpoint(reverse, True)
+        return tour
+
+    def neighbour_lists(self, subpaths):
+        grid = EndpointGrid(subpaths)
+        result = []
+        for index, sp in enumerate(subpaths):
+            near = set(grid.neighbours(*sp.endpoint(False, False), k=self.neighbours, exclude=index))
+            if not sp.closed:
+                near.update(grid.neighbours(*sp.endpoint(False, True), k=self.neighbours, exclude=index))
+            result.append(near)
+        return result
+
+    @staticmethod
+    def _end(subpaths, tour, position, origin):
+        if position < 0:
+            return origin
+        index, reverse = tour[position]
+        return subpaths[index].endpoint(reverse, True)
+
+    @staticmethod
+    def _start(subpaths, tour, position):
+        if position >= len(tour):
+            return None
+        index, reverse = tour[position]
+        return subpaths[index].endpoint(reverse, False)
+
+    @staticmethod
+    def _leg(a, b):
+        if b is None:
+            return 0.0
+        return distance(a, b)
+
+    def two_opt(self, subpaths, tour, neighbours, origin):
+        """Reverse runs of the tour (flipping each subpath in them) while that shortens travel."""
+        improved = False
+        position = {index: p for p, (index, _) in enumerate(tour)}
+        for i in range(len(tour)):
+            index = tour[i][0]
+            for other in neighbours[index] | {index}:
+                lo, hi = sorted((position[index], position[other]))
+                before = self._end(subpaths, tour, lo - 1, origin)
+                after = self._start(subpaths, tour, hi + 1)
+                first_start = self._start(subpaths, tour, lo)
+                last_end = self._end(subpaths, tour, hi, origin)
+                old = self._leg(before, first_start) + self._leg(last_end, after)
+                new = self._leg(before, last_end) + self._leg(first_start, after)
+                if new < old - 1e-9:
+                    tour[lo:hi + 1] = [(idx, not rev) for idx, rev in reversed(tour[lo:hi + 1])]
+                    for p in range(lo, hi + 1):
+                        position[tour[p][0]] = p
+                    improved = True
+        return improved
+
+    def or_opt(self, subpaths, tour, neighbours, origin, max_chain=3):
+        """Move chains of up to max_chain subpaths next to a neighbour, flipped if that helps."""
+        improved = False
+        position = {index: p for p, (index, _) in enumerate(tour)}
+        for length in range(1, max_chain + 1):
+            s = 0
+            while s + length <= len(tour):
+                if self._move_chain(subpaths, tour, neighbours, origin, position, s, length):
+                    position = {index: p for p, (index, _) in enumerate(tour)}
+                    improved = True
+                s += 1
+        return improved
+
+    def _move_chain(self, subpaths, tour, neighbours, origin, position, s, length):
+        e = s + length - 1
+        prev_end = self._end(subpaths, tour, s - 1, origin)
+        next_start = self._start(subpaths, tour, e + 1)
+        chain_start = self._start(subpaths, tour, s)
+        chain_end = self._end(subpaths, tour, e, origin)
+        gain = self._leg(prev_end, chain_start) + self._leg(chain_end, next_start) - self._leg(prev_end, next_start)
+        if gain <= 1e-9:
+            return False
+
+        chain = tour[s:e + 1]
+        flipped = [(idx, not rev) for idx, rev in reversed(chain)]
+        candidates = set()
+        for idx, _ in chain:
+            for other in neighbours[idx]:
+                t = position[other]
+                candidates.add(t - 1)
+                candidates.add(t)
+
+        best = None
+        for q in candidates:
+            # insert between tour[q] and tour[q + 1]; q == -1 means right after the origin
+            if s - 1 <= q <= e:
+                continue
+            a = self._end(subpaths, tour, q, origin)
+            b = self._start(subpaths, tour, q + 1)
+            removed = self._leg(a, b)
+            for option in (chain, flipped):
+                first_index, first_rev = option[0]
+                last_index, last_rev = option[-1]
+                cost = self._leg(a, subpaths[first_index].endpoint(first_rev, False)) + \
+                    self._leg(subpaths[last_index].endpoint(last_rev, True), b) - removed
+                if cost < gain - 1e-9 and (best is None or cost < best[0]):
+                    best = (cost, q, option)
+        if best is None:
+            return False
+        _, q, option = best
+        if q < s:
+            tour[q + 1:e + 1] = option + tour[q + 1:s]
+        else:
+            tour[s:q + 1] = tour[e + 1:q + 1] + option
+        return True
@@ -0,0 +1,186 @@
+"""
+The conversion shared by the Inkscape extension (unicorn.py) and the
+standalone converter (python -m unicorn): parse the SVG into entities,
+optionally simplify, join and reorder them, emit them into a GCodeContext
+(or save them as a toolpath to post later, see unicorn.toolpath) and write
+the G-code out.  Modules for optional stages are only imported
+when their option is set.
+"""
+import json
+
+from unicorn import instrument
+from unicorn.context import GCodeContext
+
+
+def create_context(options, file):
+    context = GCodeContext(options.xy_feedrate, options.xy_travelrate,
+                           options.start_delay, options.stop_delay,
+                           options.pen_up_cmd,
+                           options.pen_down_cmd,
+                           options.pen_down_angle, options.pen_score_angle,
+                           options.pen_mark_angle,
+                           file)
+    context.arc_tolerance = options.arc_tolerance
+    context.precision = options.precision
+    context.compact = options.compact
+    if options.pen_schedule:
+        from unicorn.servo import ServoModel
+        context.servo = ServoModel(options.servo_speed, options.servo_settle, options.servo_clearance)
+    return context
+
+
+def open_cache(options):
+    """Return the GeometryCache the options ask for, or None; --clear-cache empties it first."""
+    if not (options.cache or options.clear_cache):
+        return None
+    from unicorn.cache import GeometryCache
+    cache = GeometryCache(options.cache_dir, int(options.cache_size * (1 << 20)))
+    if options.clear_cache:
+        cache.clear()
+    return cache if options.cache else None
+
+
+def parser_arguments(options, cache):
+    return (options.flatness, options.instance_clones, options.workers, cache, options.skip_hidden,
+            options.clip_to, (options.bed_width, options.bed_height))
+
+
+def parse_document(root, options, cache=None):
+    """Traverse an SVG root element and flatten its paths."""
+    from unicorn.svg_parser import SvgParser
+    parser = SvgParser(root, *parser_arguments(options, cache))
+    recorder = instrument.current
+    with recorder.phase('traverse'):
+        parser.traverse()
+    with recorder.phase('flatten'):
+        parser.load_pending()
+    return parser
+
+
+def stream_document(source, options, cache=None):
+    """parse_document() for a file read with iterparse, see SvgParser.stream."""
+    from unicorn.svg_parser import SvgParser
+    recorder = instrument.current
+    with recorder.phase('traverse'):
+        parser = SvgParser.stream(source, *parser_arguments(options, cache))
+    with recorder.phase('flatten'):
+        parser.load_pending()
+    return parser
+
+
+def convert(parser, options, context):
+    """Run the optional stages over the parsed entities and emit them into context."""
+    entities = prepare(parser, options, context)
+    if options.toolpath_file:
+        from unicorn.toolpath import Toolpath
+        with instrument.current.phase('toolpath'):
+            Toolpath.from_entities(entities, context.summary, context.file).save(options.toolpath_file)
+    emit(entities, context)
+
+
+def prepare(parser, options, context):
+    """The parsed entities after the optional stages, whose summaries go into context."""
+    recorder = instrument.current
+    entities = parser.entities
+    if parser.hidden or parser.outside:
+        context.summary.append("Skipped %d hidden objects and %d paths out of bounds" % (parser.hidden, parser.outside))
+    cache = parser.cache
+    if cache is not None:
+        if cache.writes:
+            cache.prune()
+        context.summary.append(cache.summary())
+    if options.simplify_tolerance > 0:
+        from unicorn.simplify import simplify_entities
+        with recorder.phase('simplify'):
+            before, after = simplify_entities(entities, options.simplify_tolerance)
+        context.summary.append("Simplified %d points to %d" % (before, after))
+    if options.join_paths:
+        from unicorn.joining import PathJoiner
+        joiner = PathJoiner(options.join_tolerance, preserve=options.preserve_order)
+        with recorder.phase('join'):
+            entities = joiner.join(entities)
+        context.summary.append("Joined paths, saving %d pen lifts" % joiner.joins)
+    if options.optimize_travel or options.inside_out:
+        from unicorn.ordering import TravelOptimizer
+        optimizer = TravelOptimizer(preserve=options.preserve_order, inside_out=options.inside_out)
+        with recorder.phase('optimize'):
+            entities = optimizer.optimize(entities, (context.x_home, context.y_home))
+        if options.inside_out:
+            context.summary.append("Cut inside out in %d levels" % optimizer.levels)
+        context.summary.append("Travel distance %.2f mm (was %.2f mm)" % (optimizer.after, optimizer.before))
+    return entities
+
+
+def emit(entities, context, blocks=None):
+    """Emit the entities into context, through a daemon.BlockCache when one is given."""
+    with instrument.current.phase('emit'):
+        if blocks is None:
+            for entity in entities:
+                entity.get_gcode(context)
+        else:
+            blocks.emit(entities, context)
+        context.finish_lift()
+    if context.servo is not None:
+        context.summary.append(context.dwell_summary())
+
+
+def post(toolpath, context):
+    """Emit a saved Toolpath into context, as convert() would have emitted its entities."""
+    context.summary.extend(toolpath.summary)
+    emit(toolpath.entities(), context)
+
+
+def analyze(options, context):
+    from unicorn.analyze import GCodeAnalyzer
+    analyzer = GCodeAnalyzer(options.xy_feedrate, options.xy_travelrate,
+                             options.pen_up_cmd, options.pen_down_cmd,
+                             options.acceleration, options.junction_deviation)
+    context.generate(analyzer)
+    analyzer.close()
+    context.summary.extend(analyzer.summary())
+    if options.analysis_file:
+        with open(options.analysis_file, 'w') as f:
+            json.dump(analyzer.report(), f, indent=2)
+
+
+def write(options, context, out=None):
+    """Write the G-code to out (stdout by default) and release the context."""
+    recorder = instrument.current
+    if options.analyze:
+        with recorder.phase('analyze'):
+            analyze(options, context)
+    if recorder.enabled:
+        recorder.count('gcode_lines', len(context.codes))
+        if options.profile_comments:
+            context.trailer.extend(recorder.summary())
+    with recorder.phase('generate'):
+        context.generate(out)
+    context.close()
+
+
+def start_profile(options):
+    """Enable instrumentation and cProfile as the options ask; returns the cProfile.Profile or None."""
+    if options.profile or instrument.requested():
+        instrument.enable()
+    if options.profile_dump:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    return None
+
+
+def finish_profile(options, profiler, output_path=None):
+    """Dump the cProfile stats and write the instrumentation report next to output_path."""
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(options.profile_dump)
+    recorder = instrument.current
+    if recorder.enabled:
+        path = options.profile_file
+        if not path and output_path:
+            path = output_path + '.profile.json'
+        if path:
+            with open(path, 'w') as f:
+                json.dump(recorder.report(), f, indent=2)
+        instrument.disable()
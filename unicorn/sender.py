@@ -0,0 +1,312 @@
+"""
+Stream G-code to a GRBL controller.
+
+GRBL answers every line with 'ok' (or 'error:N') once it has taken it out of
+its 128 byte serial receive buffer.  Waiting for each 'ok' before sending the
+next line leaves that buffer, and often the planner behind it, empty between
+lines.  Character counting instead tracks the bytes of every line that has
+not been acknowledged yet and sends the next line as soon as it fits, so the
+buffer stays full.
+
+The realtime commands feed hold ('!'), resume ('~') and status report ('?')
+bypass the buffer and can be sent at any time.  GrblSender works on any
+serial device or pseudo terminal (POSIX only); unicorn.grbl_sim provides a
+simulated controller to test against.
+
+    python -m unicorn.sender job.gcode --port /dev/ttyUSB0
+    python -m unicorn drawing.svg | python -m unicorn.sender - --port /dev/ttyACM0
+
+When streaming a file from a terminal, typing ! ~ or ? sends that realtime
+command.
+"""
+import argparse
+import collections
+import os
+import select
+import sys
+import termios
+import time
+import tty
+
+from unicorn.analyze import COMMENT
+
+RX_BUFFER_SIZE = 128
+
+FEED_HOLD = b'!'
+CYCLE_START = b'~'
+STATUS_REPORT = b'?'
+SOFT_RESET = b'\x18'
+
+BAUD_RATES = {
+    9600: termios.B9600,
+    19200: termios.B19200,
+    38400: termios.B38400,
+    57600: termios.B57600,
+    115200: termios.B115200,
+    230400: termios.B230400,
+}
+
+
+class GrblError(Exception):
+    pass
+
+
+def open_port(path, baudrate=115200):
+    """Open a serial device or pty in raw mode at baudrate and return its file descriptor."""
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+    try:
+        tty.setraw(fd)
+        attributes = termios.tcgetattr(fd)
+        attributes[2] |= termios.CLOCAL | termios.CREAD
+        attributes[4] = attributes[5] = BAUD_RATES[baudrate]
+        termios.tcsetattr(fd, termios.TCSANOW, attributes)
+    except Exception:
+        os.close(fd)
+        raise
+    return fd
+
+
+def clean_line(line):
+    """Strip comments and whitespace, which GRBL ignores but which would take buffer space."""
+    return ''.join(COMMENT.sub('', line).split())
+
+
+class GrblSender:
+    def __init__(self, fd, rx_buffer_size=RX_BUFFER_SIZE, timeout=30.0, stop_on_error=False):
+        self.fd = fd
+        self.rx_buffer_size = rx_buffer_size
+        self.timeout = timeout
+        self.stop_on_error = stop_on_error
+        # file descriptor whose ! ~ ? keys are forwarded as realtime commands
+        self.realtime_input = None
+
+        # (line number, line, bytes) of every line the controller has not acknowledged
+        self.in_flight = collections.deque()
+        self.buffered = 0
+        self.received = b''
+        self.partial = ''
+
+        self.status = None
+        self.messages = []
+        self.errors = []
+        self.lines_sent = 0
+        self.bytes_sent = 0
+        self.acks = 0
+        self.starvations = 0
+        self.max_buffered = 0
+        self.started = None
+        self.finished = None
+
+    def wake(self, delay=2.0):
+        """Wake the controller up as GRBL's own streaming script does and skip its start-up messages."""
+        self.send_bytes(b'\r\n\r\n')
+        deadline = time.monotonic() + delay
+        while time.monotonic() < deadline:
+            self.poll(deadline - time.monotonic())
+        self.messages = []
+
+    # file-like interface so GCodeContext.generate() can write straight into the sender
+    def write(self, text):
+        text = self.partial + text
+        lines = text.split('\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self.send_line(line)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.partial:
+            self.send_line(self.partial)
+            self.partial = ''
+        self.finish()
+
+    def stream(self, lines):
+        """Send every line and wait until all of them are acknowledged."""
+        for line in lines:
+            self.send_line(line)
+        self.finish()
+        return self.report()
+
+    def send_line(self, line):
+        line = clean_line(line)
+        if not line:
+            return
+        data = (line + '\n').encode('ascii')
+        if len(data) > self.rx_buffer_size:
+            raise GrblError('line is longer than the receive buffer: %s' % line)
+        if self.started is None:
+            self.started = time.perf_counter()
+        while self.buffered + len(data) > self.rx_buffer_size:
+            self.wait_for_response()
+        if not self.in_flight and self.lines_sent:
+            # every line was acknowledged before this one arrived: the receive buffer ran dry
+            self.starvations += 1
+        self.send_bytes(data)
+        self.lines_sent += 1
+        self.bytes_sent += len(data)
+        self.in_flight.append((self.lines_sent, line, len(data)))
+        self.buffered += len(data)
+        self.max_buffered = max(self.max_buffered, self.buffered)
+        # pick up acknowledgements that are already waiting so the count stays tight
+        self.poll(0)
+
+    def finish(self):
+        while self.in_flight:
+            self.wait_for_response()
+        self.finished = time.perf_counter()
+
+    def send_bytes(self, data):
+        while data:
+            data = data[os.write(self.fd, data):]
+
+    def wait_for_response(self):
+        acks = self.acks
+        deadline = time.monotonic() + self.timeout
+        while self.acks == acks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise GrblError('no response from the controller in %.0f s' % self.timeout)
+            self.poll(remaining)
+
+    def poll(self, timeout):
+        """Wait up to timeout seconds for input from the controller (or realtime keys) and handle it."""
+        fds = [self.fd] if self.realtime_input is None else [self.fd, self.realtime_input]
+        readable, _, _ = select.select(fds, [], [], max(timeout, 0))
+        if self.realtime_input is not None and self.realtime_input in readable:
+            for key in os.read(self.realtime_input, 64):
+                if bytes((key,)) in (FEED_HOLD, CYCLE_START, STATUS_REPORT):
+                    self.realtime(bytes((key,)))
+        if self.fd in readable:
+            data = os.read(self.fd, 4096)
+            if not data:
+                raise GrblError('the controller closed the connection')
+            self.received += data
+            while b'\n' in self.received:
+                line, self.received = self.received.split(b'\n', 1)
+                self.handle(line.decode('ascii', 'replace').strip())
+
+    def handle(self, response):
+        if not response:
+            return
+        if (response == 'ok' or response.startswith('error')) and self.in_flight:
+            number, line, size = self.in_flight.popleft()
+            self.buffered -= size
+            self.acks += 1
+            if response != 'ok':
+                self.errors.append((number, line, response))
+                if self.stop_on_error:
+                    raise GrblError('line %d %s: %s' % (number, line, response))
+        elif response.startswith('<'):
+            self.status = response
+        elif response.startswith('ALARM'):
+            raise GrblError(response)
+        else:
+            self.messages.append(response)
+
+    def realtime(self, command):
+        """Send a realtime command (FEED_HOLD, CYCLE_START, STATUS_REPORT or SOFT_RESET) right away."""
+        self.send_bytes(command)
+
+    def feed_hold(self):
+        self.realtime(FEED_HOLD)
+
+    def resume(self):
+        self.realtime(CYCLE_START)
+
+    def query_status(self, timeout=1.0):
+        """Ask for a status report and return it, or None if none arrives within timeout."""
+        self.status = None
+        self.realtime(STATUS_REPORT)
+        deadline = time.monotonic() + timeout
+        while self.status is None and time.monotonic() < deadline:
+            self.poll(deadline - time.monotonic())
+        return self.status
+
+    def wait_until_idle(self, interval=0.1, timeout=None):
+        """Poll the status until the controller has finished every planned move; return the last report."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.query_status()
+            if status is not None and status.startswith('<Idle'):
+                return status
+            if deadline is not None and time.monotonic() > deadline:
+                raise GrblError('the controller is still busy: %s' % status)
+            time.sleep(interval)
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def report(self):
+        elapsed = self.elapsed
+        return {
+            'lines': self.lines_sent,
+            'bytes': self.bytes_sent,
+            'seconds': round(elapsed, 3),
+            'lines_per_second': round(self.lines_sent / elapsed, 1) if elapsed else 0.0,
+            'bytes_per_second': round(self.bytes_sent / elapsed, 1) if elapsed else 0.0,
+            'starvations': self.starvations,
+            'max_buffered': self.max_buffered,
+            'errors': [{'line': number, 'code': line, 'error': error} for number, line, error in self.errors],
+        }
+
+    def summary(self):
+        report = self.report()
+        return [
+            "Sent %d lines (%d bytes) in %.1f s, %.1f lines/s" % (
+                report['lines'], report['bytes'], report['seconds'], report['lines_per_second']),
+            "Receive buffer ran dry %d times, fullest %d of %d bytes" % (
+                self.starvations, self.max_buffered, self.rx_buffer_size),
+            "Errors %d" % len(self.errors),
+        ]
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('gcode', help="G-code file to send, - for stdin")
+    parser.add_argument('--port', required=True, help="serial device or pty")
+    parser.add_argument('--baud', type=int, default=115200, choices=sorted(BAUD_RATES))
+    parser.add_argument('--rx-buffer', type=int, default=RX_BUFFER_SIZE, help="controller receive buffer in bytes")
+    parser.add_argument('--timeout', type=float, default=30.0, help="seconds to wait for an acknowledgement")
+    parser.add_argument('--no-wake', action='store_true', help="do not wake the controller up first")
+    parser.add_argument('--stop-on-error', action='store_true', help="stop at the first error reply")
+    options = parser.parse_args(args)
+
+    fd = open_port(options.port, options.baud)
+    sender = GrblSender(fd, options.rx_buffer, options.timeout, options.stop_on_error)
+    keys = None
+    if options.gcode != '-' and sys.stdin.isatty():
+        keys = sys.stdin.fileno()
+        saved = termios.tcgetattr(keys)
+        tty.setcbreak(keys)
+        sender.realtime_input = keys
+    try:
+        if not options.no_wake:
+            sender.wake()
+        if options.gcode == '-':
+            sender.stream(sys.stdin)
+        else:
+            with open(options.gcode) as f:
+                sender.stream(f)
+        sender.wait_until_idle()
+    except GrblError as error:
+        sys.stderr.write('%s\n' % error)
+        return 1
+    finally:
+        if keys is not None:
+            termios.tcsetattr(keys, termios.TCSADRAIN, saved)
+        os.close(fd)
+        for line in sender.summary():
+            print(line)
+        for number, line, error in sender.errors:
+            print("line %d %s: %s" % (number, line, error))
+    return 1 if sender.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
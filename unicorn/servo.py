@@ -0,0 +1,38 @@
+"""
+Timing model of the pen servo, used to schedule dwells instead of waiting
+the fixed start and stop delays after every pen command.
+
+The pen is up at servo angle 0 (the pen up command, M5, is S0) and down at
+the angle of the cut style.  Moving between two angles takes the angle
+difference divided by the servo speed, plus the settle time.  A lifting pen
+only has to clear the work (rise by the clearance angle) before travel may
+start; the rest of the lift happens during the travel move.
+"""
+
+
+def format_seconds(seconds):
+    """Dwell time for a G4 P word, which GRBL reads as seconds: at most 3 decimals, no trailing zeros."""
+    return ('%.3f' % seconds).rstrip('0').rstrip('.')
+
+
+class ServoModel:
+    def __init__(self, speed, settle=0.0, clearance=0.0):
+        # degrees per second
+        self.speed = speed
+        # seconds
+        self.settle = settle
+        # degrees
+        self.clearance = clearance
+
+    def move_time(self, start, end):
+        """Seconds for the servo to go from angle start to end and settle."""
+        return abs(end - start) / self.speed + self.settle
+
+    def lift_time(self, angle, travel):
+        """
+  Seconds to wait after lifting the pen from angle before a travel move
+  taking travel seconds: the rest of the lift may overlap the travel, but
+  the pen must clear the work first.
+  """
+        clear = min(self.clearance, angle) / self.speed
+        return max(clear, self.move_time(angle, 0.0) - travel)
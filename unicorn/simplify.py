@@ -0,0 +1,79 @@
+import numpy
+
+
+def distances_to_segment(coords, a, b):
+    """Distance from every row of coords to the segment a-b."""
+    ab = b - a
+    length = ab.dot(ab)
+    if length == 0:
+        return numpy.hypot(*(coords - a).T)
+    t = numpy.clip((coords - a).dot(ab) / length, 0.0, 1.0)
+    return numpy.hypot(*(coords - a - t[:, None] * ab).T)
+
+
+def simplify_mask(coords, tolerance):
+    """
+  Ramer-Douglas-Peucker over an (n, 2) array, returning a boolean mask of
+  the points to keep.  The recursion is replaced by an explicit stack and
+  each split scans its span with one vectorized distance computation.  The
+  first and last points are always kept; a closed run is first split at the
+  point farthest from its start so both halves have a usable chord.
+  """
+    n = len(coords)
+    keep = numpy.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    if n < 3:
+        return keep
+    if numpy.array_equal(coords[0], coords[-1]):
+        k = int(numpy.argmax(numpy.hypot(*(coords - coords[0]).T)))
+        keep[k] = True
+        stack = [(0, k), (k, n - 1)]
+    else:
+        stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2:
+            continue
+        d = distances_to_segment(coords[i + 1:j], coords[i], coords[j])
+        k = int(numpy.argmax(d))
+        if d[k] > tolerance:
+            k += i + 1
+            keep[k] = True
+            stack.append((i, k))
+            stack.append((k, j))
+    return keep
+
+
+def simplify_points(points, tolerance):
+    """Return points with those within tolerance of the simplified polyline removed."""
+    if len(points) < 3:
+        return points
+    keep = simplify_mask(numpy.asarray(points, dtype=float), tolerance)
+    if isinstance(points, numpy.ndarray):
+        return points[keep]
+    return [points[i] for i in numpy.flatnonzero(keep)]
+
+
+def simplify_entities(entity_list, tolerance):
+    """
+  Simplify every subpath of the entities in place.  Each entity that lost
+  points records (before, after) in its simplified attribute; the totals
+  over all entities are returned.
+  """
+    total_before = 0
+    total_after = 0
+    for entity in entity_list:
+        segments = getattr(entity, 'segments', None)
+        if not segments:
+            continue
+        before = after = 0
+        for index, points in enumerate(segments):
+            simplified = simplify_points(points, tolerance)
+            before += len(points)
+            after += len(simplified)
+            segments[index] = simplified
+        if after < before:
+            entity.simplified = (before, after)
+        total_before += before
+        total_after += after
+    return total_before, total_after
@@ -0,0 +1,225 @@
+"""
+CSS cascade for the few properties the converter needs: stroke (which picks
+the cut style), display and visibility.
+
+An element's declared values come from its presentation attributes, then
+the rules of the document's <style> sheets, then its style attribute, each
+overriding the one before.  stroke and visibility are inherited from the
+parent, display is not, but an element is only displayed when its parent
+is.  Computed styles are memoized on the parent style and the declared
+values, so the children of a group, and every path sharing a class or a
+style string, share one ComputedStyle and its cut style.
+
+Style sheets support simple selectors (type, .class, #id, * and compounds
+of them such as path.cut) in comma separated lists; rules with combinators,
+attribute selectors or pseudo-classes are ignored.
+"""
+import re
+
+PROPERTIES = ('stroke', 'display', 'visibility')
+
+THROUGH = 1
+SCORE = 2
+MARK = 3
+
+CUT_STYLES = {
+    '#ff0000': SCORE,
+    '#0000ff': MARK,
+}
+
+NAMED_COLORS = {
+    'red': '#ff0000',
+    'blue': '#0000ff',
+}
+
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_RULE = re.compile(r'([^{}]+)\{([^{}]*)\}')
+SIMPLE_SELECTOR = re.compile(r'^(\*|[-\w]+)?((?:[.#][-\w]+)*)$')
+SELECTOR_PART = re.compile(r'([.#])([-\w]+)')
+RGB = re.compile(r'^rgb\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)\s*\)$')
+
+
+def normalize_color(value):
+    """Lower case #rrggbb for hex, rgb() and the named colours the cut styles use; anything else as given."""
+    value = value.strip().lower()
+    if value in NAMED_COLORS:
+        return NAMED_COLORS[value]
+    if len(value) == 4 and value[0] == '#':
+        return '#' + ''.join(c * 2 for c in value[1:])
+    match = RGB.match(value)
+    if match:
+        return '#%02x%02x%02x' % tuple(min(int(c), 255) for c in match.groups())
+    return value
+
+
+def parse_declarations(text):
+    """The declarations of a style attribute or rule body that the cascade uses, as a dict."""
+    declared = {}
+    for declaration in text.split(';'):
+        name, colon, value = declaration.partition(':')
+        name = name.strip().lower()
+        if colon and name in PROPERTIES:
+            value = value.replace('!important', '').strip()
+            if value:
+                declared[name] = value
+    return declared
+
+
+def local_name(tag):
+    return tag.rpartition('}')[2] if isinstance(tag, str) else None
+
+
+class Selector:
+    """A compound simple selector such as path.cut#outline, with its specificity."""
+
+    def __init__(self, text):
+        match = SIMPLE_SELECTOR.match(text)
+        if match is None or not text:
+            raise ValueError(text)
+        tag, rest = match.groups()
+        self.tag = None if tag in (None, '*') else tag
+        self.id = None
+        self.classes = set()
+        for kind, name in SELECTOR_PART.findall(rest):
+            if kind == '#':
+                self.id = name
+            else:
+                self.classes.add(name)
+        self.specificity = (1 if self.id else 0, len(self.classes), 1 if self.tag else 0)
+
+    def key(self):
+        """The most selective part, which the sheet indexes the selector by."""
+        if self.id:
+            return '#' + self.id
+        if self.classes:
+            return '.' + min(self.classes)
+        return self.tag or '*'
+
+    def matches(self, tag, element_id, classes):
+        return (self.tag is None or self.tag == tag) and (self.id is None or self.id == element_id) and \
+            self.classes <= classes
+
+
+class StyleSheet:
+    """
+  The rules of the document's <style> elements, indexed by id, class and
+  type so an element is only checked against the rules that can match it.
+  The declared values for each (type, id, class) combination are memoized.
+  """
+
+    def __init__(self, texts=()):
+        self.rules = {}
+        self.count = 0
+        self.matched = {}
+        for text in texts:
+            self.add(text)
+
+    def __bool__(self):
+        return self.count > 0
+
+    def add(self, text):
+        for selectors, body in CSS_RULE.findall(CSS_COMMENT.sub('', text)):
+            declared = parse_declarations(body)
+            if not declared:
+                continue
+            for text in selectors.split(','):
+                try:
+                    selector = Selector(text.strip())
+                except ValueError:
+                    continue
+                self.rules.setdefault(selector.key(), []).append((selector, self.count, declared))
+                self.count += 1
+        self.matched.clear()
+
+    def match(self, tag, element_id, class_names):
+        """Declared values of the matching rules, later and more specific rules winning."""
+        key = (tag, element_id, class_names)
+        declared = self.matched.get(key)
+        if declared is None:
+            classes = set(class_names.split()) if class_names else set()
+            keys = ['*']
+            if tag:
+                keys.append(tag)
+            if element_id:
+                keys.append('#' + element_id)
+            keys.extend('.' + name for name in classes)
+            found = [rule for k in keys for rule in self.rules.get(k, ())
+                     if rule[0].matches(tag, element_id, classes)]
+            found.sort(key=lambda rule: (rule[0].specificity, rule[1]))
+            declared = {}
+            for _, _, values in found:
+                declared.update(values)
+            self.matched[key] = declared
+        return declared
+
+
+class ComputedStyle:
+    __slots__ = ('stroke', 'display', 'visibility', 'displayed', 'cut_style')
+
+    def __init__(self, parent=None, declared=()):
+        declared = dict(declared)
+        stroke = declared.get('stroke', 'inherit')
+        visibility = declared.get('visibility', 'inherit')
+        display = declared.get('display', 'inline')
+        if parent is None:
+            self.stroke = 'none' if stroke == 'inherit' else normalize_color(stroke)
+            self.visibility = 'visible' if visibility == 'inherit' else visibility
+            self.display = 'inline' if display == 'inherit' else display
+            self.displayed = self.display != 'none'
+        else:
+            self.stroke = parent.stroke if stroke == 'inherit' else normalize_color(stroke)
+            self.visibility = parent.visibility if visibility == 'inherit' else visibility
+            self.display = parent.display if display == 'inherit' else display
+            self.displayed = parent.displayed and self.display != 'none'
+        self.cut_style = CUT_STYLES.get(self.stroke, THROUGH)
+
+    @property
+    def visible(self):
+        return self.displayed and self.visibility not in ('hidden', 'collapse')
+
+
+class StyleResolver:
+    """Compute the style of each element from its parent's, sharing the results."""
+
+    def __init__(self, sheet=None):
+        self.sheet = sheet if sheet is not None else StyleSheet()
+        self.root = ComputedStyle()
+        self.computed = {}
+        self.attributes = {}
+
+    @classmethod
+    def for_document(cls, root):
+        """A resolver with the <style> sheets found anywhere in the tree under root."""
+        texts = [element.text or '' for element in root.iter() if local_name(element.tag) == 'style']
+        return cls(StyleSheet(texts))
+
+    def declared(self, node):
+        """Declared values of node: presentation attributes, then sheet rules, then the style attribute."""
+        get = node.get
+        declared = {}
+        for name in PROPERTIES:
+            value = get(name)
+            if value is not None:
+                declared[name] = value.strip()
+        if self.sheet:
+            declared.update(self.sheet.match(local_name(node.tag), get('id'), get('class')))
+        style = get('style')
+        if style:
+            values = self.attributes.get(style)
+            if values is None:
+                values = self.attributes[style] = parse_declarations(style)
+            declared.update(values)
+        return declared
+
+    def compute(self, node, parent=None):
+        """The ComputedStyle of node as a child of parent (the root style by default)."""
+        if parent is None:
+            parent = self.root
+        declared = self.declared(node)
+        if not declared:
+            return parent
+        key = (parent, tuple(sorted(declared.items())))
+        style = self.computed.get(key)
+        if style is None:
+            style = self.computed[key] = ComputedStyle(parent, declared)
+        return style
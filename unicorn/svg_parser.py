@@ -1,8 +1,30 @@
+import concurrent.futures
+import copy
+import math
+import os
+import time
+
 import inkex
-from inkex import Path, bezier, CubicSuperPath
+import numpy
+from inkex import Path, CubicSuperPath
 from inkex.transforms import Transform
 from lxml import etree
-from unicorn import entities
+from unicorn import entities, instrument
+from unicorn.cache import cache_key
+from unicorn.flatten import DEFAULT_FLATNESS, clip_segments, flatten_cubic_super_path
+from unicorn.style import StyleResolver, StyleSheet, local_name
+
+SVG_GROUP = inkex.addNS('g', 'svg')
+SVG_USE = inkex.addNS('use', 'svg')
+XLINK_HREF = inkex.addNS('href', 'xlink')
+INKSCAPE_GROUPMODE = inkex.addNS('groupmode', 'inkscape')
+INKSCAPE_LABEL = inkex.addNS('label', 'inkscape')
+
+# elements that are never drawn themselves; their content is skipped without a warning
+NON_RENDERED = frozenset(
+    name for tag in ('clipPath', 'mask', 'marker', 'linearGradient', 'radialGradient', 'filter', 'title', 'desc',
+                     'script')
+    for name in (inkex.addNS(tag, 'svg'), tag))
 
 
 def parse_length_with_units(string):
@@ -33,38 +55,39 @@ def parse_length_with_units(string):
     return v, u
 
 
-def sub_divide_cubic_path(sp, flat, i=1):
+def flatten_path_data(d, matrix, flatness, bounds=None):
     """
-  Break up a bezier curve into smaller curves, each of which
-  is approximately a straight line within a given tolerance
-  (the "smoothness" defined by [flat]).
-
-  This is a modified version of cspsubdiv.cspsubdiv(). I rewrote the recursive
-  call because it caused recursion-depth errors on complicated line segments.
+  Parse path data, transform it by matrix and flatten it into a list of
+  (n, 2) float64 point arrays, one per subpath, culled or clipped to bounds
+  when given.  Returns None for empty path data.  This is a plain function
+  of picklable arguments so it can run in worker processes.
   """
+    p = Path(d)
+    if len(p) == 0:
+        return None
+    # a list of lists of cubic beziers [ctrl p1, ctrl p2, endpoint] where the
+    # start-point is the last point in the previous segment; the transform is
+    # applied to all of its nodes in one array operation
+    return flatten_cubic_super_path(CubicSuperPath(p), flatness, matrix, bounds)
 
-    while True:
-        while True:
-            if i >= len(sp):
-                return
-
-            p0 = sp[i - 1][1]
-            p1 = sp[i - 1][2]
-            p2 = sp[i][0]
-            p3 = sp[i][1]
-
-            b = (p0, p1, p2, p3)
 
-            if bezier.maxdist(b) > flat:
-                break
+def flatten_chunk(items):
+    return [flatten_path_data(*item) for item in items]
 
-            i += 1
 
-        one, two = bezier.beziersplitatt(b, 0.5)
-        sp[i - 1][2] = one[1]
-        sp[i][0] = two[2]
-        p = [one[2], one[3], two[1]]
-        sp[i:1] = [p]
+def flatten_chunk_timed(items):
+    """
+  flatten_chunk that also records instrumentation, for worker processes:
+  returns (results, counters, seconds per item) so the parent can merge them.
+  """
+    recorder = instrument.enable()
+    results = []
+    durations = []
+    for item in items:
+        start = time.perf_counter()
+        results.append(flatten_path_data(*item))
+        durations.append(time.perf_counter() - start)
+    return results, dict(recorder.counters), durations
 
 
 class SvgIgnoredEntity:
@@ -86,42 +109,33 @@ class SvgIgnoredEntity:
 
 
 class SvgPath(entities.PolyLine):
+    __slots__ = ('flatness', 'defer', 'pending')
+
     def __init__(self):
         super().__init__()
-        self.cutStyle = 1
+        self.flatness = DEFAULT_FLATNESS
+        # when defer is set, load() leaves the (d, matrix, flatness) work item in pending
+        self.defer = False
+        self.pending = None
 
     def load(self, node, trans):
-        a = node.get('style').split(";")
-        d = dict(s.split(':') for s in a)
-        if d['stroke'] == "#ff0000":
-            self.cutStyle = 2
-        elif d['stroke'] == "#0000ff":
-            self.cutStyle = 3
-        else:
-            pass
+        self.id = node.get('id')
+        if self.cut_style is None:
+            # loaded outside a traversal, so only the element's own style counts
+            self.cut_style = StyleResolver().compute(node).cut_style
 
         d = node.get('d')
-        p = Path(d)
-        if len(p) == 0:
-            return
-        p = CubicSuperPath(p)
-        p = p.transform(trans)
-
-        # p is now a list of lists of cubic beziers [ctrl p1, ctrl p2, endpoint]
-        # where the start-point is the last point in the previous segment
-        self.segments = []
-        for sp in p:
-            points = []
-            sub_divide_cubic_path(sp, 0.2)  # TODO: smoothness preference
-            for csp in sp:
-                points.append((csp[1][0], csp[1][1]))
-            self.segments.append(points)
+        if self.defer:
+            self.pending = (d, trans.matrix, self.flatness)
+        else:
+            self.segments = flatten_path_data(d, trans.matrix, self.flatness)
 
     def new_path_from_node(self, node):
         new_path = etree.Element(inkex.addNS('path', 'svg'))
-        s = node.get('style')
-        if s:
-            new_path.set('style', s)
+        for name in ('style', 'stroke'):
+            value = node.get(name)
+            if value:
+                new_path.set(name, value)
         t = node.get('transform')
         if t:
             new_path.set('transform', t)
@@ -129,6 +143,8 @@ class SvgPath(entities.PolyLine):
 
 
 class SvgRect(SvgPath):
+    __slots__ = ()
+
     def load(self, node, trans):
         new_path = self.new_path_from_node(node)
         x = float(node.get('x'))
@@ -142,6 +158,8 @@ class SvgRect(SvgPath):
 
 
 class SvgLine(SvgPath):
+    __slots__ = ()
+
     def load(self, node, trans):
         new_path = self.new_path_from_node(node)
         x1 = float(node.get('x1'))
@@ -154,6 +172,8 @@ class SvgLine(SvgPath):
 
 
 class SvgPolyLine(SvgPath):
+    __slots__ = ()
+
     def load(self, node, trans):
         new_path = self.new_path_from_node(node)
         pl = node.get('points', '').strip()
@@ -171,10 +191,20 @@ class SvgPolyLine(SvgPath):
 
 
 class SvgEllipse(SvgPath):
+    __slots__ = ()
+
     def load(self, node, trans):
         rx = float(node.get('rx', '0'))
         ry = float(node.get('ry', '0'))
-        SvgPath.load(self, self.make_ellipse_path(rx, ry, node), trans)
+        self.load_ellipse(rx, ry, node, trans)
+
+    def load_ellipse(self, rx, ry, node, trans):
+        new_path = self.make_ellipse_path(rx, ry, node)
+        if new_path is None:
+            # a zero radius disables rendering of the element
+            self.id = node.get('id')
+            return
+        SvgPath.load(self, new_path, trans)
 
     def make_ellipse_path(self, rx, ry, node):
         if rx == 0 or ry == 0:
@@ -194,9 +224,11 @@ class SvgEllipse(SvgPath):
 
 
 class SvgCircle(SvgEllipse):
+    __slots__ = ()
+
     def load(self, node, trans):
         rx = float(node.get('r', '0'))
-        SvgPath.load(self, self.make_ellipse_path(rx, rx, node), trans)
+        self.load_ellipse(rx, rx, node, trans)
 
 
 class SvgText(SvgIgnoredEntity):
@@ -231,17 +263,123 @@ class SvgParser:
         'text': SvgIgnoredEntity
     }
 
-    def __init__(self, svg):
+    # documents with fewer paths than this are always flattened serially
+    parallel_threshold = 256
+
+    def __init__(self, svg, flatness=DEFAULT_FLATNESS, instance_clones=False, workers=1, cache=None,
+                 skip_hidden=True, clip='none', bed_size=None):
         self.svg = svg
+        self.flatness = flatness
+        self.instance_clones = instance_clones
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
         self.entities = []
+        self.pending = []
+        self.ids = None
+        self.clones = {}
+        self.cache = cache
+        self.styles = StyleResolver.for_document(svg)
+        self.skip_hidden = skip_hidden
+        self.hidden = 0
+        self.outside = 0
         self.svgHeight = self.get_length('height')
+        self.bounds = self.clip_bounds(clip, bed_size)
 
     def parse(self):
+        self.traverse()
+        self.load_pending()
+
+    def traverse(self):
+        """Walk the document and create its entities, leaving path flattening to load_pending()."""
         # 0.28222 scale determined by comparing pixels-per-mm in a default Inkscape file.
         # self.svgWidth = self.getLength('width', 354) * 0.28222
         # self.svgHeight = self.getLength('height', 354) * 0.28222
-        self.recursively_traverse_svg(self.svg, Transform(((1.0, 0.0, 0), (0.0, -1.0, self.svgHeight))))
-        # self.recursivelyTraverseSvg(self.svg)
+        # the root element's own style is inherited by the whole drawing
+        style = self.styles.compute(self.svg)
+        if self.skip_hidden and not style.displayed:
+            self.hidden += 1
+            return
+        self.traverse_svg(self.svg, Transform(((1.0, 0.0, 0), (0.0, -1.0, self.svgHeight))), style)
+
+    def clip_bounds(self, clip, bed_size):
+        """The rectangle (x0, y0, x1, y1) in output millimetres that geometry is clipped to, or None."""
+        if clip == 'bed':
+            return (0.0, 0.0) + tuple(bed_size)
+        if clip == 'page':
+            width = self.get_length('width')
+            if width is None or self.svgHeight is None:
+                inkex.errormsg('Warning: the page size is unknown, nothing is clipped to it')
+                return None
+            return 0.0, 0.0, width, self.svgHeight
+        return None
+
+    def load_pending(self):
+        """
+    Flatten the work items that were collected during traversal.  Items
+    found in the geometry cache are not parsed or flattened at all; the
+    rest are flattened and stored in it.
+    """
+        pending, self.pending = self.pending, []
+        items = [entity.pending for entity in pending]
+        if self.bounds is not None:
+            items = [item + (self.bounds,) for item in items]
+        results = [None] * len(pending)
+        todo = range(len(pending))
+        keys = None
+        if self.cache is not None:
+            keys = [cache_key(*item) if item[0] else None for item in items]
+            todo = []
+            for index, key in enumerate(keys):
+                try:
+                    results[index] = self.cache.get(key)
+                except KeyError:
+                    todo.append(index)
+        flattened, durations = self.flatten_items([items[index] for index in todo])
+        for index, segments in zip(todo, flattened):
+            results[index] = segments
+            if keys is not None and keys[index] is not None:
+                self.cache.put(keys[index], segments)
+        for entity, segments in zip(pending, results):
+            if segments is not None and not len(segments) and entity.pending[0]:
+                self.outside += 1
+            entity.segments = segments
+            entity.pending = None
+        if durations:
+            recorder = instrument.current
+            for index, seconds in zip(todo, durations):
+                recorder.element(pending[index].id, seconds)
+
+    def flatten_items(self, items):
+        """
+    Return the flattened segments of each (d, matrix, flatness) item, and
+    the seconds spent on each when instrumentation is enabled.  Large
+    batches are split into chunks and flattened across a process pool;
+    results come back in submission order, so they match a serial run.
+    """
+        recorder = instrument.current
+        durations = None
+        if self.workers > 1 and len(items) >= self.parallel_threshold:
+            size = -(-len(items) // (self.workers * 4))
+            chunks = [items[i:i + size] for i in range(0, len(items), size)]
+            with concurrent.futures.ProcessPoolExecutor(self.workers) as pool:
+                if recorder.enabled:
+                    results = []
+                    durations = []
+                    for chunk_results, counters, chunk_durations in pool.map(flatten_chunk_timed, chunks):
+                        results.extend(chunk_results)
+                        durations.extend(chunk_durations)
+                        recorder.merge(counters)
+                else:
+                    results = [segments for chunk in pool.map(flatten_chunk, chunks) for segments in chunk]
+        elif recorder.enabled:
+            results = []
+            durations = []
+            for item in items:
+                start = time.perf_counter()
+                results.append(flatten_path_data(*item))
+                durations.append(time.perf_counter() - start)
+        else:
+            results = flatten_chunk(items)
+        return results, durations
 
     def get_length(self, name):
         """
@@ -270,79 +408,331 @@ class SvgParser:
             # No width specified; assume the default value
             return None
 
-    def recursively_traverse_svg(self, node_list,
-                                 trans_current=Transform(((1.0, 0.0, 0.0), (0.0, -1.0, 0.0))),
-                                 parent_visibility='visible'):
+    def traverse_svg(self, node_list,
+                     trans_current=Transform(((1.0, 0.0, 0.0), (0.0, -1.0, 0.0))),
+                     parent_style=None, layer=None, group=None, refs=frozenset()):
         """
-    Recursively traverse the svg file to plot out all of the
-    paths.  The function keeps track of the composite transformation
-    that should be applied to each path.
+    Walk the svg file to plot out all of the paths.  The walk keeps
+    track of the composite transformation that should be applied to
+    each path.
 
     This function handles path, group, line, rect, polyline, polygon,
     circle, ellipse and use (clone) elements. Notable elements not
     handled include text.  Unhandled elements should be converted to
     paths in Inkscape.
 
-    TODO: There's a lot of inlined code in the eggbot version of this
-    that would benefit from the Entities method of dealing with things.
+    The walk uses an explicit stack of child iterators instead of
+    recursion, so it visits nodes in the same order without Python
+    recursion limits.  Each frame carries the composed transform, the
+    computed style, layer, group and the ids of the <use> references
+    being expanded (to stop self-referencing clones).
     """
-        for node in node_list:
-            # Ignore invisible nodes
-            v = node.get('visibility', parent_visibility)
-            if v == 'inherit':
-                v = parent_visibility
-            if v == 'hidden' or v == 'collapse':
-                pass
+        visited = 0
+        if parent_style is None:
+            parent_style = self.styles.root
+        compute_style = self.styles.compute
+        stack = [(iter(node_list), trans_current, parent_style, layer, group, refs)]
+        while stack:
+            nodes, trans_current, parent_style, layer, group, refs = stack[-1]
+            node = next(nodes, None)
+            if node is None:
+                stack.pop()
+                continue
+            visited += 1
+
+            tag = node.tag
+            if tag in NON_RENDERED:
+                continue
+            # Ignore invisible nodes: nothing under display:none is drawn, while the
+            # children of a hidden group may be visible again
+            style = compute_style(node, parent_style)
+            if self.skip_hidden and not style.displayed:
+                self.hidden += 1
+                continue
 
             # first apply the current matrix transform to this node's transform
-
-            trans = Transform(node.get("transform"))
-            trans_new = trans_current * trans
-
-            if node.tag == inkex.addNS('g', 'svg') or node.tag == 'g':
-                if node.get(inkex.addNS('groupmode', 'inkscape')) == 'layer':
-                    node.get(inkex.addNS('label', 'inkscape'))
-
-                self.recursively_traverse_svg(node, trans_new, parent_visibility=v)
-            elif node.tag == inkex.addNS('use', 'svg') or node.tag == 'use':
-                ref_id = node.get(inkex.addNS('href', 'xlink'))
-                if ref_id:
-                    # [1:] to ignore leading '#' in reference
-                    path = '//*[@id="%s"]' % ref_id[1:]
-                    ref_node = node.xpath(path)
-                    if ref_node:
-                        x = float(node.get('x', '0'))
-                        y = float(node.get('y', '0'))
-                        # Note: the transform has already been applied
-                        if (x != 0) or (y != 0):
-                            trans_new2 = trans_new * Transform('translate(%f,%f)' % (x, y))
-                        else:
-                            trans_new2 = trans_new
-                        v = node.get('visibility', v)
-                        self.recursively_traverse_svg(ref_node, trans_new2, parent_visibility=v)
+            transform = node.get('transform')
+            if transform:
+                trans_new = trans_current @ Transform(transform)
+            else:
+                trans_new = trans_current
+
+            if tag == SVG_GROUP or tag == 'g':
+                node_group = node.get('id', group)
+                node_layer = layer
+                if node.get(INKSCAPE_GROUPMODE) == 'layer':
+                    node_layer = node.get(INKSCAPE_LABEL, node_group)
+
+                stack.append((iter(node), trans_new, style, node_layer, node_group, refs))
+            elif tag == SVG_USE or tag == 'use':
+                ref_id, trans_new = self.use_reference(node, trans_new)
+                ref_node = self.find_by_id(ref_id) if ref_id else None
+                if ref_node is not None and ref_id not in refs:
+                    instrument.current.count('use_resolutions')
+                    if self.instance_clones:
+                        self.instance_clone(ref_node, ref_id, trans_new, style, layer, group, refs)
                     else:
-                        pass
-                else:
-                    pass
-            elif not isinstance(node.tag, str):
+                        stack.append((iter((ref_node,)), trans_new, style, layer, group, refs | {ref_id}))
+            elif not isinstance(tag, str):
                 pass
+            elif self.skip_hidden and not style.visible:
+                self.hidden += 1
             else:
-                entity = self.make_entity(node, trans_new)
-                if entity is None:
+                entity = self.make_entity(node, trans_new, style)
+                if entity is not None:
+                    entity.layer = layer
+                    entity.group = group
+                else:
                     inkex.errormsg(
-                        'Warning: unable to draw object, please convert it to a path first. objID: ' + node.get('id'))
-
-    def make_entity(self, node, trans):
-        for node_type in SvgParser.entity_map.keys():
-            tag = node_type
-            ns = 'svg'
-            if type(tag) is tuple:
-                tag = node_type[0]
-                ns = node_type[1]
-            if node.tag == inkex.addNS(tag, ns) or node.tag == tag:
-                constructor = SvgParser.entity_map[node_type]
-                entity = constructor()
-                entity.load(node, trans)
-                self.entities.append(entity)
-                return entity
-        return None
+                        'Warning: unable to draw object, please convert it to a path first. objID: %s' % node.get('id'))
+        instrument.current.count('nodes_visited', visited)
+
+    @staticmethod
+    def use_reference(node, trans):
+        """
+    Return the id a <use> element refers to (None if it has none) and its
+    transform with the x/y offset applied.  The referenced content
+    inherits the style of the <use> element.
+    """
+        ref_id = node.get(XLINK_HREF)
+        if not ref_id:
+            return None, trans
+        x = float(node.get('x', '0'))
+        y = float(node.get('y', '0'))
+        # Note: the transform has already been applied
+        if (x != 0) or (y != 0):
+            trans = trans @ Transform(translate=(x, y))
+        # [1:] to ignore leading '#' in reference
+        return ref_id[1:], trans
+
+    def add_clone(self, ref_node, ref_id, trans, style, layer, group):
+        instrument.current.count('use_resolutions')
+        if self.instance_clones:
+            self.instance_clone(ref_node, ref_id, trans, style, layer, group, frozenset())
+        else:
+            self.traverse_svg((ref_node,), trans, style, layer, group, frozenset((ref_id,)))
+
+    @classmethod
+    def stream(cls, source, *args, **kwargs):
+        """
+    Parse a document too large to hold as a tree.  A first iterparse pass
+    collects the ids that <use> elements refer to; a second one walks the
+    document with the same rules as traverse_svg, creating each entity when
+    its element ends and then discarding the element.  Only the subtrees
+    clones refer to are kept.  Returns the parser with its paths still
+    pending, as traverse() leaves them.
+    """
+        keep, sheets = scan_document(source)
+        events = etree.iterparse(source, events=('start', 'end'), huge_tree=True, remove_comments=True)
+        _, root = next(events)
+        parser = cls(root, *args, **kwargs)
+        parser.styles = StyleResolver(StyleSheet(sheets))
+        parser.ids = {}
+        parser.traverse_events(events, keep)
+        return parser
+
+    def traverse_events(self, events, keep):
+        """The streaming counterpart of traverse(), fed by iterparse start and end events."""
+        visited = 0
+        # per open element: transform, style, layer, group, is a group (None when it is not drawn)
+        compute_style = self.styles.compute
+        # the root element's start event was read by stream(); its style is inherited by the whole drawing
+        style = compute_style(self.svg)
+        stack = [(Transform(((1.0, 0.0, 0), (0.0, -1.0, self.svgHeight))), style, None, None, True)]
+        # depth inside an element whose children are not drawn, and inside subtrees clones refer to
+        skip = 0
+        if self.skip_hidden and not style.displayed:
+            self.hidden += 1
+            stack[-1] = stack[-1][:4] + (None,)
+            skip = 1
+        kept = 0
+        # <use> elements that refer forward or to an enclosing group, resolved once the document is read
+        deferred = []
+        for event, node in events:
+            if event == 'start':
+                if node.get('id') in keep:
+                    kept += 1
+                if skip:
+                    skip += 1
+                    continue
+                trans_current, parent_style, layer, group, _ = stack[-1]
+                visited += 1
+                style = compute_style(node, parent_style)
+                if node.tag in NON_RENDERED or (self.skip_hidden and not style.visible and
+                                                not (style.displayed and node.tag in (SVG_GROUP, 'g', SVG_USE, 'use'))):
+                    if node.tag not in NON_RENDERED:
+                        self.hidden += 1
+                    stack.append((None, style, layer, group, None))
+                    skip = 1
+                    continue
+                transform = node.get('transform')
+                trans_new = trans_current @ Transform(transform) if transform else trans_current
+                if node.tag == SVG_GROUP or node.tag == 'g':
+                    node_group = node.get('id', group)
+                    node_layer = layer
+                    if node.get(INKSCAPE_GROUPMODE) == 'layer':
+                        node_layer = node.get(INKSCAPE_LABEL, node_group)
+                    stack.append((trans_new, style, node_layer, node_group, True))
+                else:
+                    stack.append((trans_new, style, layer, group, False))
+                    skip = 1
+                continue
+
+            element_id = node.get('id')
+            if skip > 1:
+                skip -= 1
+            else:
+                trans_new, style, layer, group, is_group = stack.pop()
+                if is_group is None:
+                    skip = 0
+                elif not is_group:
+                    skip = 0
+                    if node.tag == SVG_USE or node.tag == 'use':
+                        ref_id, trans_new = self.use_reference(node, trans_new)
+                        ref_node = self.ids.get(ref_id)
+                        if ref_node is not None:
+                            self.add_clone(ref_node, ref_id, trans_new, style, layer, group)
+                        elif ref_id in keep:
+                            deferred.append((len(self.entities), ref_id, trans_new, style, layer, group))
+                    elif isinstance(node.tag, str):
+                        entity = self.make_entity(node, trans_new, style)
+                        if entity is not None:
+                            entity.layer = layer
+                            entity.group = group
+                        else:
+                            inkex.errormsg('Warning: unable to draw object, please convert it to a path first. '
+                                           'objID: %s' % element_id)
+            if element_id in keep:
+                kept -= 1
+                self.ids.setdefault(element_id, node)
+            elif not kept:
+                node.clear()
+                parent = node.getparent()
+                if parent is not None:
+                    parent.remove(node)
+
+        for index, ref_id, trans, style, layer, group in reversed(deferred):
+            ref_node = self.ids.get(ref_id)
+            if ref_node is None:
+                continue
+            entities, self.entities = self.entities, []
+            try:
+                self.add_clone(ref_node, ref_id, trans, style, layer, group)
+            finally:
+                entities[index:index] = self.entities
+                self.entities = entities
+        instrument.current.count('nodes_visited', visited)
+
+    def instance_clone(self, ref_node, ref_id, trans, style, layer, group, refs):
+        """
+    Add the entities of a <use> instance.  The referenced subtree is
+    flattened once in its own coordinates and cached by id, flatness and
+    the style it inherits; every instance then only maps the cached points
+    through its transform.
+
+    The cached points must be flat enough for the largest scale factor of
+    the instance transform, so the local flatness is the document flatness
+    divided by that factor rounded up to a power of two.  Instances of
+    similar size share one cache entry.
+    """
+        matrix = numpy.array(trans.matrix)
+        scale = numpy.linalg.norm(matrix[:, :2], 2)
+        flatness = self.flatness
+        if scale > 0:
+            flatness /= 2.0 ** math.ceil(math.log2(scale))
+        key = (ref_id, flatness, style)
+        prototypes = self.clones.get(key)
+        if prototypes is None:
+            # the prototype is flattened in its own coordinates, so it is clipped per instance
+            entities, pending, document_flatness, bounds = self.entities, self.pending, self.flatness, self.bounds
+            self.entities, self.pending, self.flatness, self.bounds = [], [], flatness, None
+            try:
+                self.traverse_svg((ref_node,), Transform(), style, layer, group, refs | {ref_id})
+                # instances copy the prototype points, so they are needed right away
+                self.load_pending()
+            finally:
+                prototypes = self.entities
+                self.entities, self.pending, self.flatness, self.bounds = entities, pending, document_flatness, bounds
+            self.clones[key] = prototypes
+
+        linear = matrix[:, :2].T
+        offset = matrix[:, 2]
+        for prototype in prototypes:
+            entity = copy.copy(prototype)
+            if getattr(prototype, 'segments', None):
+                entity.segments = [numpy.asarray(points) @ linear + offset for points in prototype.segments]
+                if self.bounds is not None:
+                    entity.segments = clip_segments(entity.segments, self.bounds)
+                    if not entity.segments:
+                        self.outside += 1
+            entity.layer = layer
+            entity.group = group
+            self.entities.append(entity)
+
+    def find_by_id(self, ref_id):
+        """Look up an element by id through an index of the whole document built on first use."""
+        if self.ids is None:
+            self.ids = {}
+            for element in self.svg.getroottree().iter():
+                element_id = element.get('id') if isinstance(element.tag, str) else None
+                if element_id is not None:
+                    self.ids.setdefault(element_id, element)
+        return self.ids.get(ref_id)
+
+    def make_entity(self, node, trans, style=None):
+        constructor = SvgParser.tag_map.get(node.tag)
+        if constructor is None:
+            return None
+        recorder = instrument.current
+        if recorder.enabled:
+            start = time.perf_counter()
+        entity = constructor()
+        if isinstance(entity, SvgPath):
+            if style is not None:
+                entity.cut_style = style.cut_style
+            entity.flatness = self.flatness
+            entity.defer = True
+        entity.load(node, trans)
+        if recorder.enabled:
+            recorder.element(node.get('id'), time.perf_counter() - start)
+        if getattr(entity, 'pending', None):
+            self.pending.append(entity)
+        self.entities.append(entity)
+        return entity
+
+
+def scan_document(source):
+    """
+  The ids that <use> elements in the document at source refer to and the
+  text of its <style> sheets, read with constant memory.
+  """
+    ids = set()
+    sheets = []
+    for _, element in etree.iterparse(source, events=('end',), huge_tree=True, remove_comments=True):
+        if element.tag == SVG_USE or element.tag == 'use':
+            ref_id = element.get(XLINK_HREF)
+            if ref_id:
+                ids.add(ref_id[1:])
+        elif local_name(element.tag) == 'style':
+            sheets.append(element.text or '')
+        element.clear()
+        parent = element.getparent()
+        if parent is not None:
+            parent.remove(element)
+    return ids, sheets
+
+
+def build_tag_map(entity_map):
+    """Expand entity_map to Clark notation ('{namespace}tag') keys plus the bare tag names."""
+    tag_map = {}
+    for node_type, constructor in entity_map.items():
+        tag = node_type
+        ns = 'svg'
+        if type(tag) is tuple:
+            tag, ns = node_type
+        tag_map[inkex.addNS(tag, ns)] = constructor
+        tag_map[tag] = constructor
+    return tag_map
+
+
+SvgParser.tag_map = build_tag_map(SvgParser.entity_map)
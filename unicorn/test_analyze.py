@@ -0,0 +1,31 @@
+import math
+from unittest import TestCase
+from analyze import GCodeAnalyzer
+
+
+class Test(TestCase):
+    def analyze(self, text, **settings):
+        analyzer = GCodeAnalyzer(**settings)
+        analyzer.write(text)
+        analyzer.close()
+        return analyzer
+
+    def test_distances_and_pen_cycles(self):
+        analyzer = self.analyze("M5 (Pen Up)\nG90\nG0 X10.00 Y0.00 \nM3 S90.00 (pen down)\nG4 P0.5 (wait)\n"
+                                "G1 X10.00 Y20.00 \nX30 Y20\nM5 (Pen Up)\nG4 P1 (wait)\n"
+                                "G0 X0 Y0\nM3 S45\nG3 X0 Y0 I5 J0\nM5\n")
+        self.assertAlmostEqual(10.0 + math.hypot(30, 20), analyzer.travel_distance)
+        # an arc ending where it starts is a full circle
+        self.assertAlmostEqual(20.0 + 20.0 + 10 * math.pi, analyzer.cut_distance)
+        self.assertEqual(2, analyzer.pen_cycles)
+        self.assertEqual(2, analyzer.dwells)
+        self.assertAlmostEqual(1.5, analyzer.dwell_time)
+
+    def test_long_move_time(self):
+        # 6000 mm/min is 100 mm/s; accelerating to it at 1000 mm/s^2 takes 0.1 s and 5 mm each way
+        analyzer = self.analyze("G1 F6000 X1000\n", acceleration=1000.0)
+        self.assertAlmostEqual(0.1 + 0.1 + 990.0 / 100.0, analyzer.motion_time)
+
+    def test_straight_runs_do_not_stop(self):
+        joined = self.analyze("G1 F6000 X500\nX1000\n", acceleration=1000.0)
+        self.assertAlmostEqual(0.1 + 0.1 + 990.0 / 100.0, joined.motion_time)
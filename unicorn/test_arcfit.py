@@ -0,0 +1,39 @@
+import math
+from unittest import TestCase
+from arcfit import fit_arcs
+
+
+def arc_points(cx, cy, r, start, end, count):
+    return [(cx + r * math.cos(start + (end - start) * k / count),
+             cy + r * math.sin(start + (end - start) * k / count)) for k in range(count + 1)]
+
+
+class Test(TestCase):
+    def test_counter_clockwise_arc(self):
+        points = arc_points(5.0, 5.0, 10.0, 0.0, math.pi / 2, 20)
+        moves = fit_arcs(points, 0.01)
+        self.assertEqual(1, len(moves))
+        x, y, cx, cy, clockwise = moves[0]
+        self.assertEqual(points[-1], (x, y))
+        self.assertAlmostEqual(5.0, cx)
+        self.assertAlmostEqual(5.0, cy)
+        self.assertFalse(clockwise)
+
+    def test_clockwise_arc(self):
+        points = arc_points(0.0, 0.0, 3.0, math.pi, 0.0, 30)
+        moves = fit_arcs(points, 0.01)
+        self.assertTrue(all(len(move) == 5 and move[4] for move in moves))
+        self.assertEqual(points[-1], moves[-1][:2])
+
+    def test_lines_stay_lines(self):
+        points = [(0.0, 0.0), (1.0, 0.0), (2.0, 0.0), (3.0, 0.0), (3.0, 1.0)]
+        self.assertEqual(points[1:], fit_arcs(points, 0.1))
+
+    def test_polygons_stay_lines(self):
+        square = [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0), (0.0, 0.0)]
+        self.assertEqual(square[1:], fit_arcs(square, 0.1))
+        rect = [(55.0, 80.0), (75.0, 80.0), (75.0, 90.0), (55.0, 90.0), (55.0, 80.0)]
+        self.assertEqual(rect[1:], fit_arcs(rect, 0.05))
+        for sides in (5, 6, 8, 12):
+            polygon = arc_points(20.0, 20.0, 10.0, 0.0, 2 * math.pi, sides)
+            self.assertTrue(all(len(move) == 2 for move in fit_arcs(polygon, 0.1)), sides)
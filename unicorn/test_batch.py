@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+from unittest import TestCase, mock
+from batch import convert_file, main
+
+SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="100mm" height="100mm">
+<path id="p%d" style="stroke:#000000" d="M 0,0 L %d,0"/>
+</svg>
+"""
+
+
+def convert_or_die(source, target):
+    # stands in for a crash in lxml or numpy that takes the worker down
+    if os.path.basename(source) == 'crash.svg':
+        os._exit(1)
+    return convert_file(source, target)
+
+
+class Test(TestCase):
+    def test_failed_file_does_not_stop_the_batch(self):
+        with tempfile.TemporaryDirectory() as temp:
+            for i in range(1, 4):
+                with open(os.path.join(temp, 'part%d.svg' % i), 'w') as f:
+                    f.write(SVG % (i, i * 10))
+            with open(os.path.join(temp, 'broken.svg'), 'w') as f:
+                f.write('<svg><path')
+            out = os.path.join(temp, 'out')
+
+            self.assertEqual(1, main([temp, '-o', out, '--jobs', '2', '--compact=true']))
+            with open(os.path.join(out, 'batch-manifest.json')) as f:
+                manifest = json.load(f)
+            self.assertEqual((3, 1), (manifest['converted'], manifest['failed']))
+            self.assertIn('error', manifest['files'][0])
+            for record in manifest['files'][1:]:
+                with open(record['output']) as f:
+                    self.assertEqual(record['lines'], len(f.read().splitlines()))
+            with open(os.path.join(out, 'part3.gcode')) as f:
+                self.assertIn('G1X30', f.read())
+
+    def test_same_name_in_two_directories_is_not_overwritten(self):
+        with tempfile.TemporaryDirectory() as temp:
+            for i, name in enumerate(('a', 'b'), 1):
+                os.makedirs(os.path.join(temp, name))
+                with open(os.path.join(temp, name, 'part.svg'), 'w') as f:
+                    f.write(SVG % (i, i * 10))
+            out = os.path.join(temp, 'out')
+
+            self.assertEqual(1, main([os.path.join(temp, '**', '*.svg'), '-o', out, '--jobs', '2']))
+            with open(os.path.join(out, 'batch-manifest.json')) as f:
+                manifest = json.load(f)
+            self.assertEqual((1, 1), (manifest['converted'], manifest['failed']))
+            self.assertIn('already written', manifest['files'][1]['error'])
+            with open(os.path.join(out, 'part.gcode')) as f:
+                self.assertIn('G1 X10.00', f.read())
+
+    def test_worker_crash_only_fails_its_file(self):
+        with tempfile.TemporaryDirectory() as temp:
+            for name in ('crash', 'part1', 'part2', 'part3', 'part4', 'part5', 'part6'):
+                with open(os.path.join(temp, name + '.svg'), 'w') as f:
+                    f.write(SVG % (1, 10))
+            out = os.path.join(temp, 'out')
+
+            with mock.patch('batch.convert_file', convert_or_die):
+                self.assertEqual(1, main([temp, '-o', out, '--jobs', '3']))
+            with open(os.path.join(out, 'batch-manifest.json')) as f:
+                manifest = json.load(f)
+            self.assertEqual((6, 1), (manifest['converted'], manifest['failed']))
+            for record in manifest['files']:
+                if record['input'].endswith('crash.svg'):
+                    self.assertIn('BrokenProcessPool', record['error'])
+                else:
+                    self.assertTrue(os.path.exists(record['output']))
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import time
+from unittest import TestCase
+from cache import GeometryCache, cache_key, decode, encode
+
+
+class Test(TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp.cleanup)
+
+    def test_round_trip_is_exact(self):
+        segments = [[[0.1, 0.2], [1.0 / 3, 2.5]], [[5.0, 6.0]], []]
+        self.assertEqual(segments, [points.tolist() for points in decode(encode(segments))])
+        self.assertIsNone(decode(encode(None)))
+
+    def test_key_covers_path_transform_and_flatness(self):
+        key = cache_key('M 0,0 L 1,1', ((1, 0, 0), (0, 1, 0)), 0.2)
+        self.assertEqual(key, cache_key('M 0,0 L 1,1', ((1, 0, 0), (0, 1, 0)), 0.2))
+        self.assertNotEqual(key, cache_key('M 0,0 L 1,2', ((1, 0, 0), (0, 1, 0)), 0.2))
+        self.assertNotEqual(key, cache_key('M 0,0 L 1,1', ((1, 0, 0), (0, 1, 1)), 0.2))
+        self.assertNotEqual(key, cache_key('M 0,0 L 1,1', ((1, 0, 0), (0, 1, 0)), 0.1))
+
+    def test_hits_misses_and_eviction(self):
+        cache = GeometryCache(self.temp.name)
+        with self.assertRaises(KeyError):
+            cache.get('aa01')
+        cache.put('aa01', [[(0.0, 0.0), (1.0, 1.0)]])
+        self.assertEqual([[0.0, 0.0], [1.0, 1.0]], cache.get('aa01')[0].tolist())
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+        cache.put('bb02', [[(2.0, 2.0)] * 100])
+        old = time.time() - 100
+        os.utime(cache.path('bb02'), (old, old))
+        cache.max_bytes = os.path.getsize(cache.path('aa01'))
+        cache.prune()
+        self.assertEqual(1, cache.evictions)
+        self.assertTrue(os.path.exists(cache.path('aa01')))
+        self.assertFalse(os.path.exists(cache.path('bb02')))
+
+    def test_clear_and_prune_only_remove_entries(self):
+        cache = GeometryCache(self.temp.name, max_bytes=0)
+        other = os.path.join(self.temp.name, 'notes.txt')
+        with open(other, 'w') as f:
+            f.write('keep')
+        os.makedirs(os.path.join(self.temp.name, 'ab'))
+        stray = os.path.join(self.temp.name, 'ab', 'cdef')
+        open(stray, 'w').close()
+        cache.put('aa01', [[(0.0, 0.0)]])
+        self.assertTrue(cache.path('aa01').startswith(cache.directory))
+        self.assertTrue(os.path.exists(os.path.join(cache.directory, 'CACHEDIR.TAG')))
+
+        cache.prune()
+        self.assertFalse(os.path.exists(cache.path('aa01')))
+        cache.put('bb02', [[(0.0, 0.0)]])
+        cache.clear()
+        self.assertFalse(os.path.exists(cache.path('bb02')))
+        self.assertTrue(os.path.exists(other))
+        self.assertTrue(os.path.exists(stray))
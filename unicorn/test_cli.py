@@ -0,0 +1,38 @@
+import os
+import tempfile
+from unittest import TestCase
+from cli import main
+
+SVG = """<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" width="100mm" height="100mm">
+<use xlink:href="#later" x="5" y="5"/>
+<g id="outer" transform="translate(1,2)">
+  <path id="p1" style="stroke:#000000" d="M 0,0 L 10,0"/>
+  <use xlink:href="#outer" x="20"/>
+  <use xlink:href="#p1" y="3"/>
+</g>
+<defs><path id="later" style="stroke:#ff0000" d="M 1,1 C 5,5 8,0 10,10"/></defs>
+<circle id="c" style="stroke:#0000ff" cx="50" cy="50" r="5"/>
+</svg>
+"""
+
+
+class Test(TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp.cleanup)
+        self.svg = os.path.join(self.temp.name, 'drawing.svg')
+        with open(self.svg, 'w') as f:
+            f.write(SVG)
+
+    def convert(self, *args):
+        out = os.path.join(self.temp.name, 'out.gcode')
+        self.assertEqual(0, main([self.svg, '-o', out] + list(args)))
+        with open(out) as f:
+            return f.read()
+
+    def test_lean_matches_tree(self):
+        gcode = self.convert()
+        self.assertIn("G1 X11.00 Y98.00", gcode)
+        self.assertIn("G1 X32.00 Y96.00", gcode)
+        self.assertEqual(gcode, self.convert('--lean'))
+        self.assertEqual(self.convert('--instance-clones=true'), self.convert('--lean', '--instance-clones=true'))
@@ -0,0 +1,44 @@
+from unittest import TestCase
+from compact import CompactWriter
+from analyze import GCodeAnalyzer
+
+GCODE = ("M5 (Pen Up)\nG90 (absolute mode)\nG92 X0.00 Y0.00 Z0.00 (you are here)\nG1 F3500.00 (Cut Feed Rate)\n\n"
+         "(Polyline consisting of 1 segments.)\nG0 X10.00 Y0.00 \nM3 S90.00 (pen down)\nG4 P1 (wait 1ms)\n"
+         "G1 X10.00 Y20.00 \nG1 X10.001 Y20.00 \nG1 X30.50 Y20.00 \nG3 X30.50 Y20.00 I5.000 J0.000 \n"
+         "M5 (Pen Up)\nG4 P1 (wait 1ms)\n\nG91 (relative mode)\nG0 Z15 F150.00\nG0 Z-15\nG90\n"
+         "G0 X0.00 Y0.00 F7000.00 (go home)\n")
+
+
+class Test(TestCase):
+    def compact(self, text):
+        lines = []
+
+        class Out:
+            def write(self, s):
+                lines.append(s)
+
+        writer = CompactWriter(Out())
+        writer.write(text)
+        writer.close()
+        return ''.join(lines), writer
+
+    def test_modal_words_and_unchanged_axes(self):
+        text, writer = self.compact(GCODE)
+        self.assertEqual("M5\nG90\nG92X0Y0Z0\nG1F3500\nG0X10\nM3S90\nG4P1\nG1Y20\nX10.001\nX30.5\nG3X30.5Y20I5J0\n"
+                         "M5\nG4P1\nG91\nG0Z15F150\nZ-15\nG90\nX0Y0F7000\n", text)
+        self.assertEqual(len(GCODE), writer.bytes_in)
+        self.assertEqual(len(text), writer.bytes_out)
+
+    def test_same_motion(self):
+        def run(text):
+            analyzer = GCodeAnalyzer()
+            analyzer.write(text)
+            analyzer.close()
+            return analyzer
+
+        full = run(GCODE)
+        compact = run(self.compact(GCODE)[0])
+        self.assertAlmostEqual(full.cut_distance, compact.cut_distance)
+        self.assertAlmostEqual(full.travel_distance, compact.travel_distance)
+        self.assertAlmostEqual(full.estimated_time, compact.estimated_time)
+        self.assertEqual(full.pen_cycles, compact.pen_cycles)
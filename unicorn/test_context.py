@@ -0,0 +1,71 @@
+import math
+import re
+from unittest import TestCase
+
+import numpy
+
+from context import GCodeContext
+from entities import PolyLine
+
+POINTS = [(1.005, 2.0), (1.005, 2.0), (3.125, -0.001), (3.125, -0.001), (-0.0, 0.0), (0.0, 0.0), (2.675, 1e-9)]
+
+
+def make_context():
+    return GCodeContext(3500.0, 6000.0, 0.5, 0.25, "M5", "M3", 90.0, 45.0, 10.0, "test.svg")
+
+
+class Test(TestCase):
+    def emit(self, bulk, start=(0.0, 0.0), points=POINTS, precision=2):
+        context = make_context()
+        context.precision = precision
+        context.go_to_point(*start)
+        if bulk:
+            context.draw_points(numpy.array(points, dtype=float), chunk=3)
+        else:
+            for x, y in points:
+                context.draw_to_point(x, y)
+        context.draw_to_point(5.0, 5.0)
+        return list(context.codes), context.last, context.drawing
+
+    def test_draw_points_matches_draw_to_point(self):
+        for precision in (0, 2, 3):
+            self.assertEqual(self.emit(False, precision=precision), self.emit(True, precision=precision))
+        codes, last, drawing = self.emit(True)
+        self.assertEqual(5, sum(1 for code in codes if code.startswith("G1")))
+        self.assertIn("G1 X3.12 Y-0.00 ", codes)
+        self.assertEqual((5.0, 5.0), last)
+        self.assertTrue(drawing)
+
+    def test_draw_points_skips_the_current_position(self):
+        self.assertEqual(self.emit(False, start=POINTS[0]), self.emit(True, start=POINTS[0]))
+        codes, last, drawing = self.emit(True, points=[(0.0, 0.0), (0.0, 0.0)])
+        self.assertEqual(1, sum(1 for code in codes if code.startswith("M3")))
+
+    def test_arcs_through_polyline(self):
+        cx, cy, r = 12.3456, 7.891, 9.87
+        angles = numpy.linspace(0.2, 2.8, 25)
+        for word, direction in (("G3", angles), ("G2", angles[::-1])):
+            polyline = PolyLine()
+            polyline.segments = [numpy.column_stack((cx + r * numpy.cos(direction), cy + r * numpy.sin(direction)))]
+            context = make_context()
+            context.arc_tolerance = 0.05
+            polyline.get_gcode(context)
+
+            position = None
+            arcs = 0
+            for code in context.codes:
+                move = re.match(r"(G[0-3]) X(\S+) Y(\S+)(?: I(\S+) J(\S+))?", code)
+                if move is None:
+                    continue
+                x, y = float(move.group(2)), float(move.group(3))
+                if move.group(4) is not None:
+                    arcs += 1
+                    self.assertEqual(word, move.group(1))
+                    i, j = float(move.group(4)), float(move.group(5))
+                    centre = (position[0] + i, position[1] + j)
+                    # the centre is snapped onto the bisector of the rounded end points
+                    self.assertAlmostEqual(math.dist(centre, position), math.dist(centre, (x, y)), delta=0.001)
+                    self.assertLess(math.dist(centre, (cx, cy)), 0.02)
+                position = (x, y)
+            self.assertEqual(1, arcs)
+            self.assertEqual(polyline.segments[0][-1].round(2).tolist(), list(position))
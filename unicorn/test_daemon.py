@@ -0,0 +1,102 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+from unittest import TestCase
+
+from cli import main as convert
+from daemon import Converter, build_arg_parser, main, request, serve
+
+SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="100mm" height="100mm">
+<path id="p1" style="stroke:#000000" d="M 10,10 L 60,10 L 60,60 Z"/>
+<path id="p2" style="stroke:#ff0000" d="%s"/>
+<circle id="c" style="stroke:#0000ff" cx="80" cy="80" r="5"/>
+<path id="p3" style="stroke:#000000" d="M 5,90 C 20,70 40,99 50,90"/>
+</svg>
+"""
+
+EDITS = ("M 40,40 C 45,50 50,30 55,45", "M 40,40 C 45,50 50,30 57,45")
+
+
+class Test(TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp.cleanup)
+        self.svg = self.path('drawing.svg')
+
+    def path(self, name):
+        return os.path.join(self.temp.name, name)
+
+    def save(self, d):
+        with open(self.svg, 'w') as f:
+            f.write(SVG % d)
+
+    def read(self, name):
+        with open(self.path(name)) as f:
+            return f.read()
+
+    def test_unchanged_elements_reuse_their_blocks(self):
+        args = ['--pen-schedule=true', '--optimize-travel=true']
+        converter = Converter(build_arg_parser().parse_args(['serve'] + args))
+        for run, d in enumerate(EDITS + EDITS[:1]):
+            self.save(d)
+            record = converter.convert(self.svg, self.path('daemon.gcode'))
+            self.assertEqual(0, convert([self.svg, '-o', self.path('cli.gcode')] + args))
+            self.assertEqual(self.read('cli.gcode'), self.read('daemon.gcode'))
+            self.assertEqual(4, record['elements'])
+            if run:
+                self.assertEqual((1, 1, 3), (record['changed'], record['removed'], record['reused']))
+            else:
+                self.assertEqual((4, 0, 0), (record['changed'], record['removed'], record['reused']))
+        self.assertEqual(3, converter.status()['requests'])
+
+    def test_reused_blocks_replay_their_counters(self):
+        args = ['--profile=true', '--pen-schedule=true']
+        converter = Converter(build_arg_parser().parse_args(['serve'] + args))
+        self.save(EDITS[0])
+        counters = []
+        for run in range(2):
+            record = converter.convert(self.svg, self.path('daemon.gcode'))
+            with open(self.path('daemon.gcode.profile.json')) as f:
+                counters.append(json.load(f)['counters'])
+        self.assertEqual(4, record['reused'])
+        self.assertEqual(0, convert([self.svg, '-o', self.path('cli.gcode')] + args))
+        with open(self.path('cli.gcode.profile.json')) as f:
+            counters.append(json.load(f)['counters'])
+        cold, warm, cli = [{name: run.get(name) for name in ('pen_cycles', 'gcode_lines')} for run in counters]
+        self.assertEqual(4, cold['pen_cycles'])
+        self.assertEqual(cold, warm)
+        self.assertEqual(cli, warm)
+
+    def test_socket_requests(self):
+        self.save(EDITS[0])
+        socket_path = self.path('daemon.sock')
+        options = build_arg_parser().parse_args(['serve', self.svg, '--interval', '0.05', '--socket', socket_path])
+        server = threading.Thread(target=serve, args=(options,))
+        server.start()
+        self.addCleanup(server.join, 10)
+        self.addCleanup(lambda: os.path.exists(socket_path) and request(socket_path, {'command': 'stop'}))
+        while not os.path.exists(socket_path):
+            server.join(0.01)
+
+        record = request(socket_path, {'command': 'convert', 'input': self.svg, 'output': self.path('other.gcode')})
+        self.assertNotIn('error', record)
+        self.assertEqual(self.path('other.gcode'), record['output'])
+        self.assertEqual(4, record['reused'])
+        self.assertIn('emit', record['phases'])
+        self.assertEqual(self.read('drawing.gcode'), self.read('other.gcode'))
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+        self.assertIn('input', request(socket_path, {'command': 'convert'})['error'])
+        self.assertIn('object', request(socket_path, [1, 2])['error'])
+        self.assertEqual(1, serve(options))
+
+        status = request(socket_path, {'command': 'status'})
+        self.assertEqual([self.svg], status['watching'])
+        self.assertEqual(2, status['requests'])
+        self.assertEqual(1, main(['convert', self.path('missing.svg'), '--socket', socket_path]))
+        self.assertEqual(0, main(['stop', '--socket', socket_path]))
+        server.join(10)
+        self.assertFalse(server.is_alive())
@@ -0,0 +1,52 @@
+from unittest import TestCase
+import numpy
+from inkex import Path, CubicSuperPath
+from flatten import clip_polyline, flatten_cubic_super_path
+
+
+def distance_to_polyline(p, points):
+    a = points[:-1]
+    ab = points[1:] - a
+    t = numpy.clip(numpy.einsum('ij,ij->i', p - a, ab) / numpy.einsum('ij,ij->i', ab, ab), 0, 1)
+    return numpy.min(numpy.hypot(*(a + t[:, None] * ab - p).T))
+
+
+class Test(TestCase):
+    def test_lines_are_not_subdivided(self):
+        csp = CubicSuperPath(Path('M 0,0 L 10,0 L 10,10 Z M 5,5'))
+        runs = flatten_cubic_super_path(csp, 0.2)
+        self.assertEqual([[0, 0], [10, 0], [10, 10], [0, 0]], runs[0].tolist())
+        self.assertEqual([[5, 5]], runs[1].tolist())
+
+    def test_curve_within_flatness(self):
+        csp = CubicSuperPath(Path('M 0,0 C 0,80 120,80 100,0 S 150,-60 200,30'))
+        for flatness in (1.0, 0.2, 0.01):
+            points = flatten_cubic_super_path(csp, flatness)[0]
+            self.assertEqual([200, 30], points[-1].tolist())
+            for sp in csp:
+                for i in range(1, len(sp)):
+                    b = numpy.array([sp[i - 1][1], sp[i - 1][2], sp[i][0], sp[i][1]])
+                    for t in numpy.linspace(0, 1, 50):
+                        s = 1 - t
+                        p = s ** 3 * b[0] + 3 * s * s * t * b[1] + 3 * s * t * t * b[2] + t ** 3 * b[3]
+                        self.assertLessEqual(distance_to_polyline(p, points), flatness + 1e-9)
+
+    def test_clip_polyline(self):
+        points = numpy.array([(-5.0, 5.0), (5.0, 5.0), (5.0, 15.0), (8.0, 15.0), (8.0, 5.0), (15.0, 5.0)])
+        runs = clip_polyline(points, (0.0, 0.0, 10.0, 10.0))
+        self.assertEqual([[[0.0, 5.0], [5.0, 5.0], [5.0, 10.0]], [[8.0, 10.0], [8.0, 5.0], [10.0, 5.0]]],
+                         [run.tolist() for run in runs])
+        self.assertIs(points, clip_polyline(points, (-10.0, 0.0, 20.0, 20.0))[0])
+        self.assertEqual([], clip_polyline(points, (20.0, 20.0, 30.0, 30.0)))
+
+        # a closed square crossing x = 100 is one cut, not split at its start
+        square = numpy.array([(90.0, 90.0), (90.0, 80.0), (110.0, 80.0), (110.0, 90.0), (90.0, 90.0)])
+        self.assertEqual([[[100.0, 90.0], [90.0, 90.0], [90.0, 80.0], [100.0, 80.0]]],
+                         [run.tolist() for run in clip_polyline(square, (0.0, 0.0, 100.0, 100.0))])
+
+    def test_bounds_cull_before_subdivision(self):
+        csp = CubicSuperPath(Path("M 50,50 C 60,50 70,60 70,70"))
+        self.assertEqual([], flatten_cubic_super_path(csp, 0.01, bounds=(0.0, 0.0, 40.0, 40.0)))
+        clipped = flatten_cubic_super_path(csp, 0.01, bounds=(0.0, 0.0, 65.0, 100.0))
+        self.assertEqual(1, len(clipped))
+        self.assertAlmostEqual(65.0, clipped[0][:, 0].max())
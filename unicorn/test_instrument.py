@@ -0,0 +1,33 @@
+from unittest import TestCase
+import flatten
+import instrument
+from flatten import flatten_cubic_super_path
+
+
+class Test(TestCase):
+    def tearDown(self):
+        instrument.disable()
+
+    def test_disabled_by_default(self):
+        self.assertFalse(instrument.current.enabled)
+        with instrument.current.phase('flatten'):
+            instrument.current.count('points_produced', 3)
+
+    def test_records_phases_counters_and_elements(self):
+        recorder = instrument.enable()
+        with recorder.phase('flatten'):
+            flatten_cubic_super_path([[[[0, 0], [0, 0], [0, 0]], [[10, 10], [10, 0], [10, 0]]]], 0.1)
+        recorder.element('slow', 0.5)
+        recorder.element('fast', 0.1)
+        recorder.merge({'points_produced': 2})
+
+        report = recorder.report()
+        self.assertIn('flatten', report['phases_s'])
+        self.assertEqual(1, report['counters']['cubics_subdivided'])
+        self.assertGreater(report['counters']['points_produced'], 4)
+        self.assertEqual(['slow', 0.5], report['slowest_elements'][0])
+
+    def test_one_module_under_both_names(self):
+        self.assertIs(instrument, flatten.instrument)
+        recorder = instrument.enable()
+        self.assertIs(recorder, flatten.instrument.current)
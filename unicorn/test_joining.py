@@ -0,0 +1,26 @@
+from unittest import TestCase
+from lxml import etree
+from joining import PathJoiner
+from svg_parser import SvgParser
+
+# three lines end to end in each colour: black, red and blue meet at (30, 10) and (60, 10)
+MIXED = """<svg xmlns="http://www.w3.org/2000/svg" width="100mm" height="100mm">
+<path id="through1" style="stroke:#000000" d="M 0,10 L 30,10"/>
+<path id="score" style="stroke:#ff0000" d="M 30,10 L 60,10"/>
+<path id="mark" style="stroke:#0000ff" d="M 60,10 L 90,10"/>
+<path id="through2" style="stroke:#000000" d="M 30,10 L 30,40"/>
+</svg>
+"""
+
+
+class Test(TestCase):
+    def test_joins_only_paths_of_the_same_cut_style(self):
+        parser = SvgParser(etree.fromstring(MIXED))
+        parser.parse()
+        joiner = PathJoiner(0.01)
+        entities = joiner.join(parser.entities)
+        self.assertEqual(1, joiner.joins)
+        runs = sorted((entity.cut_style, sorted((tuple(points[0]), tuple(points[-1]))))
+                      for entity in entities for points in entity.segments)
+        self.assertEqual([(1, [(0.0, 90.0), (30.0, 60.0)]), (2, [(30.0, 90.0), (60.0, 90.0)]),
+                          (3, [(60.0, 90.0), (90.0, 90.0)])], runs)
@@ -0,0 +1,91 @@
+import random
+from unittest import TestCase
+from entities import PolyLine
+from ordering import TravelOptimizer, collect_subpaths, containment_levels, travel_length
+
+
+def square(x, y, size):
+    return [(x, y), (x + size, y), (x + size, y + size), (x, y + size), (x, y)]
+
+
+def make_polyline(segments, layer=None):
+    entity = PolyLine()
+    entity.segments = segments
+    entity.layer = layer
+    return entity
+
+
+class Test(TestCase):
+    def test_reverses_open_subpath(self):
+        far = make_polyline([[(10.0, 0.0), (20.0, 0.0)]])
+        near = make_polyline([[(30.0, 0.0), (21.0, 0.0)]])
+        optimizer = TravelOptimizer()
+        result = optimizer.optimize([far, near])
+        self.assertEqual([[(10.0, 0.0), (20.0, 0.0)], [(21.0, 0.0), (30.0, 0.0)]],
+                         [points for entity in result for points in entity.segments])
+        self.assertAlmostEqual(10.0 + 1.0, optimizer.after)
+        self.assertAlmostEqual(10.0 + 10.0, optimizer.before)
+
+    def test_keeps_geometry_and_shortens_travel(self):
+        rng = random.Random(1)
+        entities = []
+        for _ in range(200):
+            x, y = rng.uniform(0, 500), rng.uniform(0, 500)
+            entities.append(make_polyline([[(x, y), (x + 3, y + 4)], [(x + 10, y), (x + 12, y), (x + 10, y)]]))
+        optimizer = TravelOptimizer()
+        result = optimizer.optimize(entities)
+
+        def key(points):
+            return min(tuple(points), tuple(reversed(points)))
+
+        before = sorted(key(p) for e in entities for p in e.segments)
+        after = sorted(key(p) for e in result for p in e.segments)
+        self.assertEqual(before, after)
+        self.assertLess(optimizer.after, optimizer.before / 2)
+        self.assertAlmostEqual(optimizer.after, travel_length(collect_subpaths(result)[0]))
+
+    def test_preserve_layer_order(self):
+        first = make_polyline([[(100.0, 100.0), (101.0, 100.0)]], layer='a')
+        second = make_polyline([[(0.0, 1.0), (1.0, 1.0)]], layer='b')
+        result = TravelOptimizer(preserve='layer').optimize([first, second])
+        self.assertEqual(['a', 'b'], [entity.layer for entity in result])
+        result = TravelOptimizer().optimize([first, second])
+        self.assertEqual(['b', 'a'], [entity.layer for entity in result])
+
+    def test_containment_levels(self):
+        outline = square(0.0, 0.0, 100.0)
+        hole = square(10.0, 10.0, 30.0)
+        island = square(20.0, 20.0, 5.0)
+        slot = [(60.0, 60.0), (70.0, 60.0)]
+        separate = square(200.0, 0.0, 10.0)
+        # an L-shaped part whose bounding box holds the square but whose outline does not
+        corner = [(300.0, 0.0), (400.0, 0.0), (400.0, 10.0), (310.0, 10.0), (310.0, 100.0), (300.0, 100.0),
+                  (300.0, 0.0)]
+        beside = square(350.0, 50.0, 10.0)
+        subpaths = collect_subpaths([make_polyline([outline, hole, island, slot, separate, corner, beside])])[0]
+        levels = containment_levels(subpaths)
+        self.assertEqual([[island, slot, separate, corner, beside], [hole], [outline]],
+                         [[sp.points for sp in level] for level in levels])
+
+    def test_inside_out_cuts_children_first(self):
+        rng = random.Random(2)
+        entities = []
+        for part in range(40):
+            x, y = part % 8 * 60.0, part // 8 * 60.0
+            entities.append(make_polyline([square(x, y, 50.0)]))
+            for _ in range(25):
+                entities.append(make_polyline([square(x + rng.uniform(5, 40), y + rng.uniform(5, 40), 2.0)]))
+        rng.shuffle(entities)
+        optimizer = TravelOptimizer(inside_out=True)
+        result = optimizer.optimize(entities)
+        order = [points[0] for entity in result for points in entity.segments]
+        self.assertEqual(1040, len(order))
+        self.assertEqual(2, optimizer.levels)
+        cut = set()
+        for entity in result:
+            for points in entity.segments:
+                x, y = points[0]
+                if points[2][0] - x == 50.0:
+                    holes = [p for p in cut if x < p[0] < x + 50.0 and y < p[1] < y + 50.0]
+                    self.assertEqual(25, len(holes))
+                cut.add((x, y))
@@ -0,0 +1,53 @@
+import os
+from unittest import TestCase
+from grbl_sim import SimulatedGrbl
+from sender import GrblSender, open_port, clean_line
+
+
+class Test(TestCase):
+    def setUp(self):
+        self.grbl = SimulatedGrbl(block_time=0.0005).start()
+        self.addCleanup(self.grbl.stop)
+        fd = open_port(self.grbl.port)
+        self.addCleanup(os.close, fd)
+        self.sender = GrblSender(fd, timeout=5.0)
+        self.sender.wake(0.05)
+
+    def test_clean_line(self):
+        self.assertEqual("G1X10.00Y2.50F3500", clean_line("G1 X10.00 Y2.50 F3500 (cut)"))
+        self.assertEqual("", clean_line("; comment only"))
+
+    def test_stream_keeps_buffer_within_limit(self):
+        lines = ["G90", "(start)"] + ["G1 X%d.00 Y%d.25 F3500" % (i, i % 7) for i in range(300)] + ["G4 P0.1", "M2"]
+        report = self.sender.stream(lines)
+        self.assertEqual(303, report['lines'])
+        self.assertEqual(303, len(self.grbl.lines))
+        self.assertEqual(0, self.grbl.overflows)
+        self.assertLessEqual(self.grbl.max_rx, 128)
+        self.assertGreater(self.sender.max_buffered, 64)
+        self.assertGreater(report['lines_per_second'], 0)
+        self.assertEqual([], report['errors'])
+
+    def test_errors_are_reported_per_line(self):
+        report = self.sender.stream(["G1 X1", "$$$", "G1 X2"])
+        self.assertEqual([{'line': 2, 'code': '$$$', 'error': 'error:1'}], report['errors'])
+
+    def test_file_like_writes(self):
+        self.sender.write("G1 X1.00 Y1.00\nG1 X2")
+        self.sender.write(".00 Y2.00\n")
+        self.sender.write("G1 X3.00 Y3.00")
+        self.sender.close()
+        self.assertEqual(["G1X1.00Y1.00", "G1X2.00Y2.00", "G1X3.00Y3.00"], self.grbl.lines)
+
+    def test_feed_hold_and_resume(self):
+        self.grbl.block_time = 0.05
+        self.sender.write("".join("G1 X%d\n" % i for i in range(20)))
+        # the controller only holds once it has planned a move
+        self.sender.wait_for_response()
+        self.sender.feed_hold()
+        self.assertTrue(self.sender.query_status().startswith("<Hold|"))
+        self.sender.resume()
+        self.assertTrue(self.sender.query_status().startswith("<Run|"))
+        self.grbl.block_time = 0.0005
+        self.sender.close()
+        self.assertTrue(self.sender.wait_until_idle(0.01, 5).startswith("<Idle|MPos:19.000,0.000,0.000"))
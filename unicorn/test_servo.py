@@ -0,0 +1,52 @@
+from unittest import TestCase
+from context import GCodeContext
+from servo import ServoModel, format_seconds
+
+
+def make_context(servo=None, start_delay=0.5, stop_delay=0.25):
+    context = GCodeContext(3500.0, 6000.0, start_delay, stop_delay, "M5", "M3", 90.0, 45.0, 10.0, "test.svg")
+    context.servo = servo
+    return context
+
+
+def cut(context, segments, cut_type=1):
+    for start, end in segments:
+        context.go_to_point(*start)
+        context.start(cut_type)
+        context.draw_to_point(*end)
+        context.stop()
+    context.finish_lift()
+    return list(context.codes)
+
+
+class Test(TestCase):
+    def test_format_seconds(self):
+        self.assertEqual("1", format_seconds(1.0))
+        self.assertEqual("0.25", format_seconds(0.25))
+        self.assertEqual("0.033", format_seconds(1 / 30.0))
+
+    def test_fixed_delays_in_seconds(self):
+        codes = cut(make_context(), [((0, 0), (10, 0))])
+        self.assertIn("G4 P0.5 (wait 0.5s)", codes)
+        self.assertIn("G4 P0.25 (wait 0.25s)", codes)
+
+    def test_dwell_from_servo_angle(self):
+        codes = cut(make_context(ServoModel(300.0, 0.05, 10.0)), [((0, 0), (10, 0))], cut_type=2)
+        # 45 degrees down, then a lift with nothing to overlap
+        self.assertEqual(["G0 X0.00 Y0.00 ", "M3 S45.00 (pen down score)", "G4 P0.2 (wait 0.2s)",
+                          "G1 X10.00 Y0.00 ", "M5 (Pen Up)", "G4 P0.2 (wait 0.2s)"], codes)
+
+    def test_lift_overlaps_travel(self):
+        context = make_context(ServoModel(300.0, 0.05, 10.0))
+        # 0.05 s of travel after the first cut, 1 s after the second
+        codes = cut(context, [((0, 0), (1, 0)), ((6, 0), (7, 0)), ((107, 0), (108, 0))])
+        lifts = [codes[i + 1] for i, code in enumerate(codes[:-1]) if code == "M5 (Pen Up)"]
+        self.assertEqual(["G4 P0.3 (wait 0.3s)", "G4 P0.033 (wait 0.033s)", "G4 P0.35 (wait 0.35s)"], lifts)
+        self.assertAlmostEqual(3 * 0.35 + 0.3 + 0.033 + 0.35, context.dwell_time, 2)
+        self.assertAlmostEqual(3 * 0.75, context.fixed_dwell_time)
+
+    def test_dwell_skipped_when_travel_covers_lift(self):
+        context = make_context(ServoModel(600.0, 0.0, 0.0))
+        codes = cut(context, [((0, 0), (1, 0)), ((100, 0), (101, 0))])
+        self.assertEqual(["M5 (Pen Up)", "G0 X100.00 Y0.00 "], codes[4:6])
+        self.assertIn("saved", context.dwell_summary())
@@ -0,0 +1,14 @@
+from unittest import TestCase
+from simplify import simplify_points
+
+
+class Test(TestCase):
+    def test_drops_collinear_points(self):
+        points = [(0.0, 0.0), (1.0, 0.01), (2.0, 0.0), (3.0, 0.0), (3.0, 5.0)]
+        self.assertEqual([(0.0, 0.0), (3.0, 0.0), (3.0, 5.0)], simplify_points(points, 0.05))
+        self.assertEqual(points, simplify_points(points, 0.001))
+
+    def test_keeps_closed_path_closed(self):
+        square = [(0.0, 0.0), (5.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0), (0.0, 5.0), (0.0, 0.0)]
+        self.assertEqual([(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0), (0.0, 0.0)],
+                         simplify_points(square, 0.1))
@@ -0,0 +1,95 @@
+import os
+import tempfile
+from unittest import TestCase
+from lxml import etree
+from style import MARK, SCORE, THROUGH, StyleResolver, StyleSheet, normalize_color, parse_declarations
+from svg_parser import SvgParser
+
+SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="100mm" height="100mm">
+<style>
+  /* cut styles by class */
+  .score { stroke: #FF0000 }
+  path.mark, #special { stroke: blue }
+  g > path { stroke: #ff0000 }
+</style>
+<path id="bare" d="M 0,0 L 1,1"/>
+<path id="attribute" stroke="#ff0000" d="M 0,0 L 1,1"/>
+<path id="classed" class="score" d="M 0,0 L 1,1"/>
+<path id="overridden" class="score" style="fill:none;stroke:#000000" d="M 0,0 L 1,1"/>
+<g stroke="#0000ff">
+  <path id="inherited" d="M 0,0 L 1,1"/>
+  <path id="marked" class="mark" d="M 0,0 L 1,1"/>
+  <rect id="special" class="score" x="0" y="0" width="1" height="1"/>
+</g>
+<ellipse id="empty" rx="0" ry="3"/>
+</svg>
+"""
+
+ROOT = """<svg xmlns="http://www.w3.org/2000/svg" width="100mm" height="100mm" stroke="#ff0000" style="%s">
+<path id="inherited" d="M 0,0 L 1,1"/>
+<g><path id="nested" d="M 0,0 L 1,1"/></g>
+<path id="own" stroke="#0000ff" d="M 0,0 L 1,1"/>
+</svg>
+"""
+
+
+class Test(TestCase):
+    def test_normalize_color(self):
+        self.assertEqual("#ff0000", normalize_color(" #F00"))
+        self.assertEqual("#0000ff", normalize_color("rgb(0, 0, 255)"))
+        self.assertEqual("#ff0000", normalize_color("Red"))
+        self.assertEqual("none", normalize_color("none"))
+
+    def test_parse_declarations(self):
+        self.assertEqual({'stroke': '#ff0000', 'display': 'none'},
+                         parse_declarations("fill:none; Stroke : #ff0000 !important;display:none;;bogus"))
+
+    def test_sheet_specificity_and_order(self):
+        sheet = StyleSheet(["path { stroke: red } .a { stroke: blue } #x { stroke: green } .a { stroke: black }"])
+        self.assertEqual({'stroke': 'red'}, sheet.match('path', None, None))
+        self.assertEqual({'stroke': 'black'}, sheet.match('path', None, 'a b'))
+        self.assertEqual({'stroke': 'green'}, sheet.match('path', 'x', 'a'))
+        self.assertEqual({}, sheet.match('rect', None, 'b'))
+
+    def test_computed_styles_are_shared(self):
+        resolver = StyleResolver(StyleSheet([".cut { stroke: #ff0000 }"]))
+        group = resolver.compute(etree.Element('g', style="display:inline"))
+        plain = etree.Element('path')
+        self.assertIs(group, resolver.compute(plain, group))
+        first = resolver.compute(etree.Element('path', {'class': 'cut'}), group)
+        second = resolver.compute(etree.Element('path', {'class': 'cut'}), group)
+        self.assertIs(first, second)
+        self.assertEqual(SCORE, first.cut_style)
+
+    def test_display_and_visibility(self):
+        resolver = StyleResolver()
+        hidden = resolver.compute(etree.Element('g', style="display:none"))
+        child = resolver.compute(etree.Element('path', style="display:inline"), hidden)
+        self.assertFalse(child.visible)
+        invisible = resolver.compute(etree.Element('g', visibility="hidden"))
+        shown = resolver.compute(etree.Element('path', visibility="visible"), invisible)
+        self.assertFalse(invisible.visible)
+        self.assertTrue(shown.visible)
+
+    def test_parser_cut_styles(self):
+        parser = SvgParser(etree.fromstring(SVG))
+        parser.parse()
+        styles = {entity.id: entity.cut_style for entity in parser.entities if hasattr(entity, 'cut_style')}
+        self.assertEqual({'bare': THROUGH, 'attribute': SCORE, 'classed': SCORE, 'overridden': THROUGH,
+                          'inherited': MARK, 'marked': MARK, None: MARK, 'empty': THROUGH}, styles)
+
+    def test_root_element_style_is_inherited(self):
+        for lean in (False, True):
+            parsers = []
+            for style in ('fill:none', 'display:none'):
+                with tempfile.TemporaryDirectory() as temp:
+                    path = os.path.join(temp, 'root.svg')
+                    with open(path, 'w') as f:
+                        f.write(ROOT % style)
+                    parser = SvgParser.stream(path) if lean else SvgParser(etree.parse(path).getroot())
+                    parser.parse()
+                    parsers.append(parser)
+            drawn, hidden = parsers
+            self.assertEqual({'inherited': SCORE, 'nested': SCORE, 'own': MARK},
+                             {entity.id: entity.cut_style for entity in drawn.entities}, msg=lean)
+            self.assertEqual(([], 1), (hidden.entities, hidden.hidden), msg=lean)
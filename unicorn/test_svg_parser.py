@@ -1,5 +1,49 @@
-from unittest import TestCase
-from svg_parser import parse_length_with_units
+import concurrent.futures
+from unittest import TestCase, mock
+import numpy
+from lxml import etree
+from context import GCodeContext
+from svg_parser import SvgParser, parse_length_with_units
+
+HIDDEN = """<svg xmlns="http://www.w3.org/2000/svg" width="100mm" height="100mm">
+<g style="display:none"><path id="reference" d="M 10,10 L 20,20"/></g>
+<g visibility="hidden"><path id="hidden" d="M 10,10 L 20,20"/><path id="shown" visibility="visible" d="M 1,1 L 2,2"/></g>
+<clipPath id="clip"><rect id="mask" x="0" y="0" width="5" height="5"/></clipPath>
+<path id="scratch" d="M 150,150 C 160,150 170,160 170,170"/>
+<path id="across" d="M 50,50 L 150,50"/>
+</svg>
+"""
+
+PATHS = """<svg xmlns="http://www.w3.org/2000/svg" width="100mm" height="100mm">
+%s
+<text id="label">not drawn</text>
+</svg>
+"""
+
+CLONES = """<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink"
+     width="100mm" height="100mm">
+<defs><path id="shape" d="M 0,0 C 10,30 30,-10 40,10"/></defs>
+<use id="half" xlink:href="#shape" transform="translate(5,5) scale(0.5)"/>
+<use id="same" xlink:href="#shape" transform="translate(5,30)"/>
+<use id="double" xlink:href="#shape" transform="translate(5,50) scale(2)"/>
+</svg>
+"""
+
+
+def distances(points, polyline):
+    """Distance of every point to the nearest segment of polyline."""
+    a, b = polyline[:-1], polyline[1:]
+    ab = b - a
+    ap = points[:, None, :] - a[None, :, :]
+    t = numpy.clip((ap * ab).sum(axis=2) / (ab * ab).sum(axis=1), 0.0, 1.0)
+    return numpy.linalg.norm(ap - t[:, :, None] * ab, axis=2).min(axis=1)
+
+
+def gcode(entities):
+    context = GCodeContext(3500.0, 6000.0, 0.5, 0.25, "M5", "M3", 90.0, 45.0, 10.0, "test.svg")
+    for entity in entities:
+        entity.get_gcode(context)
+    return list(context.codes)
 
 
 class Test(TestCase):
@@ -23,3 +67,60 @@ class Test(TestCase):
         v, u = parse_length_with_units("30%")
         self.assertEqual(v, 30)
         self.assertEqual("%", u)
+
+    def test_hidden_and_out_of_bounds_geometry(self):
+        parser = SvgParser(etree.fromstring(HIDDEN), clip='page')
+        parser.parse()
+        drawn = {entity.id: [points.tolist() for points in entity.segments] for entity in parser.entities
+                 if entity.segments}
+        self.assertEqual({'shown': [[[1.0, 99.0], [2.0, 98.0]]], 'across': [[[50.0, 50.0], [100.0, 50.0]]]}, drawn)
+        self.assertEqual(2, parser.hidden)
+        self.assertEqual(1, parser.outside)
+
+        parser = SvgParser(etree.fromstring(HIDDEN), skip_hidden=False)
+        parser.parse()
+        self.assertEqual(['reference', 'hidden', 'shown', 'scratch', 'across'], [entity.id for entity in parser.entities])
+
+    def test_process_pool_matches_serial_flattening(self):
+        paths = ['<path id="p%d" transform="rotate(%d 50 50)" d="M %d,10 C 20,%d 60,90 %d,40 L 70,%d Z"/>'
+                 % (i, i * 7, i, 20 + i, 90 - i, i + 5) for i in range(40)]
+        svg = PATHS % '\n'.join(paths[:20] + ['<g transform="scale(0.5)">'] + paths[20:] + ['</g>'])
+        serial = SvgParser(etree.fromstring(svg), flatness=0.05, workers=1)
+        serial.parse()
+        pooled = SvgParser(etree.fromstring(svg), flatness=0.05, workers=2)
+        pooled.parallel_threshold = 8
+        with mock.patch('concurrent.futures.ProcessPoolExecutor', wraps=concurrent.futures.ProcessPoolExecutor) as pool:
+            pooled.parse()
+        pool.assert_called_once_with(2)
+
+        self.assertEqual([entity.id for entity in serial.entities], [entity.id for entity in pooled.entities])
+        for expected, entity in zip(serial.entities, pooled.entities):
+            self.assertEqual([points.tolist() for points in getattr(expected, 'segments', None) or ()],
+                             [points.tolist() for points in getattr(entity, 'segments', None) or ()])
+        self.assertEqual(gcode(serial.entities), gcode(pooled.entities))
+
+    def test_instanced_clones_keep_flatness_at_every_scale(self):
+        flatness = 0.1
+        drawn = {}
+        for instance_clones in (False, True):
+            parser = SvgParser(etree.fromstring(CLONES), flatness=flatness, instance_clones=instance_clones)
+            parser.parse()
+            drawn[instance_clones] = [entity.segments[0] for entity in parser.entities
+                                      if getattr(entity, 'segments', None)]
+        # one cache entry per scale, each flattened finer the larger its instances are drawn
+        self.assertEqual(3, len({key[1] for key in parser.clones}))
+
+        t = numpy.linspace(0.0, 1.0, 2001)[:, None]
+        control = numpy.array([[0.0, 0.0], [10.0, 30.0], [30.0, -10.0], [40.0, 10.0]])
+        curve = ((1 - t) ** 3 * control[0] + 3 * (1 - t) ** 2 * t * control[1] +
+                 3 * (1 - t) * t ** 2 * control[2] + t ** 3 * control[3])
+        self.assertEqual(3, len(drawn[True]))
+        for (dx, dy, scale), tree, instanced in zip(((5, 5, 0.5), (5, 30, 1), (5, 50, 2)), drawn[False], drawn[True]):
+            # document space: user units are mm and y points up from the bottom of the page
+            exact = curve * scale + (dx, dy)
+            exact[:, 1] = 100 - exact[:, 1]
+            for points in (tree, instanced):
+                self.assertLessEqual(distances(exact, points).max(), flatness + 1e-9)
+                self.assertLessEqual(distances(points, exact).max(), flatness + 1e-9)
+            self.assertLessEqual(distances(instanced, tree).max(), flatness + 1e-9)
+            numpy.testing.assert_allclose(tree[[0, -1]], instanced[[0, -1]], atol=1e-9)
@@ -0,0 +1,78 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy
+
+from cli import main as convert
+from toolpath import Toolpath, ToolpathError, main as post
+
+SVG = """<svg xmlns="http://www.w3.org/2000/svg" width="100mm" height="100mm">
+<g id="outline" style="stroke:#000000">
+  <path id="p1" d="M 10,10 L 60,10 L 60,60 L 10,60 Z M 20,20 L 30,20 L 30,30 Z"/>
+  <path id="p2" style="stroke:#ff0000" d="M 40,40 C 45,50 50,30 55,45"/>
+</g>
+<circle id="c" style="stroke:#0000ff" cx="80" cy="80" r="5"/>
+<text id="t">label</text>
+</svg>
+"""
+
+
+class Test(TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp.cleanup)
+        self.svg = self.path('drawing.svg')
+        with open(self.svg, 'w') as f:
+            f.write(SVG)
+        self.toolpath = self.path('drawing.utp')
+
+    def path(self, name):
+        return os.path.join(self.temp.name, name)
+
+    def read(self, name):
+        with open(self.path(name)) as f:
+            return f.read()
+
+    def test_post_matches_direct_conversion(self):
+        prepare = ['--optimize-travel=true', '--simplify-tolerance=0.05']
+        self.assertEqual(0, convert([self.svg, '-o', self.path('direct.gcode'), '--toolpath-file', self.toolpath]
+                                    + prepare))
+        self.assertEqual(0, post([self.toolpath, '-o', self.path('posted.gcode')]))
+        self.assertEqual(self.read('direct.gcode'), self.read('posted.gcode'))
+
+        machine = ['--xy-feedrate', '1500', '--pen-score-angle', '40', '--compact=true', '--pen-schedule=true']
+        self.assertEqual(0, convert([self.svg, '-o', self.path('direct.gcode')] + prepare + machine))
+        self.assertEqual(0, post([self.toolpath, '-o', self.path('posted.gcode')] + machine))
+        self.assertEqual(self.read('direct.gcode'), self.read('posted.gcode'))
+
+    def test_load_maps_points(self):
+        self.assertEqual(0, convert([self.svg, '-o', self.path('direct.gcode'), '--toolpath-file', self.toolpath]))
+        toolpath = Toolpath.load(self.toolpath)
+        entities = toolpath.entities()
+        self.assertEqual(4, len(entities))
+        self.assertEqual(['p1', 'p2', 't'], [entities[i].id for i in (0, 1, 3)])
+        self.assertEqual([1, 2, 3], [entity.cut_style for entity in entities[:3]])
+        self.assertEqual('outline', entities[0].group)
+        self.assertEqual(2, len(entities[0].segments))
+        self.assertTrue(numpy.shares_memory(entities[0].segments[1], toolpath.points))
+        self.assertEqual([20.0, 80.0], entities[0].segments[1][0].tolist())
+
+        with open(self.path('direct.gcode'), 'wb') as f:
+            f.write(b'G21\n' * 10)
+        with self.assertRaises(ToolpathError):
+            Toolpath.load(self.path('direct.gcode'))
+
+    def test_damaged_files_raise_toolpath_error(self):
+        self.assertEqual(0, convert([self.svg, '-o', self.path('direct.gcode'), '--toolpath-file', self.toolpath]))
+        with open(self.toolpath, 'rb') as f:
+            data = f.read()
+        header = data.index(b'{')
+        damaged = [b'', data[:5], data[:header + 10], data[:-1], data[:len(data) // 2],
+                   data[:header] + b'[' + data[header + 1:]]
+        for index, content in enumerate(damaged):
+            with open(self.path('damaged.utp'), 'wb') as f:
+                f.write(content)
+            with self.assertRaises(ToolpathError, msg=index):
+                Toolpath.load(self.path('damaged.utp'))
+        self.assertEqual(1, post([self.path('damaged.utp'), '-o', self.path('posted.gcode')]))
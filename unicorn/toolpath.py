@@ -0,0 +1,265 @@
+"""
+Save the toolpath between parsing and G-code emission, and post it to G-code
+again later with different machine settings.
+
+    python -m unicorn drawing.svg -o drawing.gcode --toolpath-file drawing.utp
+    python -m unicorn.toolpath drawing.utp -o slow.gcode --xy-feedrate 1500 --pen-schedule true
+
+The toolpath is saved after the optional simplify, join and ordering stages,
+so posting it only emits and writes.  The file is a small JSON header (the
+summary lines of those stages and a table of ids, layers, groups and tags)
+followed by three little-endian arrays: every point of every subpath as one
+contiguous float64 buffer, the offset of each subpath into it, and one
+record per entity with its kind, cut style, subpaths and string table
+indexes.  Loading maps the file and the subpaths of the rebuilt entities
+are views of the mapped buffer, so nothing is parsed or copied per point.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+import numpy
+
+from unicorn.entities import PolyLine
+from unicorn.options import add_arguments
+
+MAGIC = b'UNTP'
+VERSION = 1
+# magic, version, length of the JSON header
+PREAMBLE = struct.Struct('<4sII')
+
+PATH = 0
+IGNORED = 1
+
+ITEM = numpy.dtype([
+    ('kind', '<u1'),
+    ('cut_style', '<u1'),
+    ('first', '<i8'),
+    ('count', '<i8'),
+    ('id', '<i4'),
+    ('layer', '<i4'),
+    ('group', '<i4'),
+    ('tag', '<i4'),
+    # points before and after simplification, -1 when not simplified
+    ('before', '<i8'),
+    ('after', '<i8'),
+])
+
+
+class ToolpathError(Exception):
+    pass
+
+
+class IgnoredElement:
+    """An element the parser skipped, posted as the same comment SvgIgnoredEntity emits."""
+    __slots__ = ('tag', 'id')
+
+    def __init__(self, tag, element_id):
+        self.tag = tag
+        self.id = element_id
+
+    def __str__(self):
+        return "Ignored '%s' tag" % self.tag
+
+    def get_gcode(self, context):
+        context.codes.append("( tag " + str(self.tag) + " id " + str(self.id) + ")")
+        context.codes.append("")
+
+
+class Toolpath:
+    def __init__(self, points, offsets, items, strings, summary=(), source=None):
+        # (n, 2) float64, every subpath one after the other
+        self.points = points
+        # subpath i is points[offsets[i]:offsets[i + 1]]
+        self.offsets = offsets
+        self.items = items
+        self.strings = strings
+        self.summary = list(summary)
+        self.source = source
+        # the mmap the arrays are views of, kept open while they are in use
+        self.buffer = None
+
+    @classmethod
+    def from_entities(cls, entities, summary=(), source=None):
+        strings = []
+        indexes = {}
+
+        def intern(value):
+            if value is None:
+                return -1
+            value = str(value)
+            index = indexes.get(value)
+            if index is None:
+                index = indexes[value] = len(strings)
+                strings.append(value)
+            return index
+
+        items = numpy.zeros(len(entities), dtype=ITEM)
+        buffers = []
+        offsets = [0]
+        for item, entity in zip(items, entities):
+            item['id'] = intern(entity.id)
+            item['before'] = item['after'] = -1
+            if isinstance(entity, PolyLine):
+                item['kind'] = PATH
+                item['cut_style'] = entity.cut_style or 0
+                item['layer'] = intern(entity.layer)
+                item['group'] = intern(entity.group)
+                item['tag'] = -1
+                item['first'] = len(offsets) - 1
+                for points in entity.segments or ():
+                    points = numpy.asarray(points, dtype=float).reshape(-1, 2)
+                    buffers.append(points)
+                    offsets.append(offsets[-1] + len(points))
+                item['count'] = len(offsets) - 1 - item['first']
+                if entity.simplified:
+                    item['before'], item['after'] = entity.simplified
+            elif hasattr(entity, 'tag'):
+                item['kind'] = IGNORED
+                item['layer'] = item['group'] = -1
+                item['tag'] = intern(entity.tag)
+            else:
+                raise ToolpathError("cannot save %s in a toolpath" % type(entity).__name__)
+        points = numpy.concatenate(buffers) if buffers else numpy.zeros((0, 2))
+        return cls(numpy.ascontiguousarray(points, dtype='<f8'), numpy.array(offsets, dtype='<i8'),
+                   items, strings, summary, source)
+
+    def save(self, path):
+        header = json.dumps({
+            'points': len(self.points),
+            'subpaths': len(self.offsets) - 1,
+            'items': len(self.items),
+            'strings': self.strings,
+            'summary': self.summary,
+            'source': self.source,
+        }).encode('utf-8')
+        # pad the header so the point buffer starts 8 byte aligned
+        header += b' ' * (-(PREAMBLE.size + len(header)) % 8)
+        with open(path, 'wb') as f:
+            f.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            f.write(self.points.tobytes())
+            f.write(self.offsets.tobytes())
+            f.write(self.items.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < PREAMBLE.size:
+                raise ToolpathError("%s is not a toolpath file" % path)
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            toolpath = cls.from_buffer(buffer, path)
+        except ToolpathError:
+            buffer.close()
+            raise
+        toolpath.buffer = buffer
+        return toolpath
+
+    @classmethod
+    def from_buffer(cls, buffer, path):
+        """The Toolpath stored in buffer, its arrays views of it; path is only used in errors."""
+        magic, version, length = PREAMBLE.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ToolpathError("%s is not a toolpath file" % path)
+        if version != VERSION:
+            raise ToolpathError("%s is toolpath version %d, expected %d" % (path, version, VERSION))
+        offset = PREAMBLE.size + length
+        if offset > len(buffer):
+            raise ToolpathError("%s is truncated" % path)
+        try:
+            header = json.loads(buffer[PREAMBLE.size:offset].decode('utf-8'))
+            counts = [int(header[name]) for name in ('points', 'subpaths', 'items')]
+            strings, summary, source = list(header['strings']), list(header['summary']), header['source']
+        except (ValueError, KeyError, TypeError) as error:
+            raise ToolpathError("%s has a damaged header: %s" % (path, error))
+        points, subpaths, items = counts
+        if min(counts) < 0:
+            raise ToolpathError("%s has a damaged header" % path)
+        if offset + points * 16 + (subpaths + 1) * 8 + items * ITEM.itemsize > len(buffer):
+            raise ToolpathError("%s is truncated" % path)
+        offsets = numpy.frombuffer(buffer, '<i8', subpaths + 1, offset + points * 16)
+        records = numpy.frombuffer(buffer, ITEM, items, offset + points * 16 + offsets.nbytes)
+        damaged = offsets[0] != 0 or offsets[-1] != points or bool(numpy.any(numpy.diff(offsets) < 0)) or \
+            bool(numpy.any((records['first'] < 0) | (records['count'] < 0) |
+                           (records['first'] + records['count'] > subpaths)))
+        for name in ('id', 'layer', 'group', 'tag'):
+            damaged = damaged or bool(numpy.any(records[name] >= len(strings)))
+        if damaged:
+            # no views of the buffer may be left for load() to close it
+            del offsets, records
+            raise ToolpathError("%s has damaged records" % path)
+        points = numpy.frombuffer(buffer, '<f8', points * 2, offset).reshape(-1, 2)
+        return cls(points, offsets, records, strings, summary, source)
+
+    def string(self, index):
+        return None if index < 0 else self.strings[index]
+
+    def entities(self):
+        """Rebuild the entities, their subpaths being views of the point buffer."""
+        points = self.points
+        bounds = self.offsets.tolist()
+        string = self.string
+        result = []
+        for kind, cut_style, first, count, element_id, layer, group, tag, before, after in self.items.tolist():
+            if kind == IGNORED:
+                result.append(IgnoredElement(string(tag), string(element_id)))
+                continue
+            entity = PolyLine()
+            entity.id = string(element_id)
+            entity.layer = string(layer)
+            entity.group = string(group)
+            entity.cut_style = cut_style or None
+            entity.segments = [points[bounds[i]:bounds[i + 1]] for i in range(first, first + count)]
+            if before >= 0:
+                entity.simplified = (before, after)
+            result.append(entity)
+        return result
+
+
+def build_arg_parser():
+    arg_parser = argparse.ArgumentParser(prog='python -m unicorn.toolpath', description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('toolpath', help="toolpath file saved with --toolpath-file")
+    arg_parser.add_argument('-o', '--output', default='-',
+                            help="G-code file to write, - (the default) writes stdout")
+    arg_parser.add_argument('--timing', action='store_true',
+                            help="Print load, post and write times to stderr")
+    add_arguments(arg_parser)
+    return arg_parser
+
+
+def main(args=None):
+    from unicorn import pipeline
+    started = time.perf_counter()
+    options = build_arg_parser().parse_args(args)
+    try:
+        toolpath = Toolpath.load(options.toolpath)
+    except (OSError, ToolpathError) as error:
+        sys.stderr.write('%s\n' % error)
+        return 1
+    loaded = time.perf_counter()
+
+    context = pipeline.create_context(options, toolpath.source)
+    pipeline.post(toolpath, context)
+    posted = time.perf_counter()
+
+    if options.output == '-':
+        pipeline.write(options, context, sys.stdout)
+        sys.stdout.flush()
+    else:
+        with open(options.output, 'w') as out:
+            pipeline.write(options, context, out)
+    finished = time.perf_counter()
+
+    if options.timing:
+        sys.stderr.write("load %.3f s, post %.3f s, write %.3f s\n" % (
+            loaded - started, posted - loaded, finished - posted))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())